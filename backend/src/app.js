@@ -24,7 +24,8 @@ app.use(
 app.use(helmet());
 
 // Middleware para parsear el cuerpo de las peticiones
-app.use(express.json());
+//? Límite ampliado para admitir los lotes de mensajes enviados por los clientes MQTT
+app.use(express.json({ limit: "10mb" }));
 
 // Configuración de rutas
 app.use("/servers", serverRoutes);
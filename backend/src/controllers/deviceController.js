@@ -5,11 +5,13 @@ const {
   validatePartialDevice,
   validateSerial,
   validateActivityReportParams,
+  validateDeviceListParams,
 } = require("../schemas/deviceSchema.js");
 
 // Obtener todos los dispositivos
-exports.getAllDevices = async (_req, res) => {
-  const devices = await deviceService.getAllDevices();
+exports.getAllDevices = async (req, res) => {
+  const { serverId } = validateDeviceListParams(req.query); //* Validación
+  const devices = await deviceService.getAllDevices(serverId);
   res.json(devices);
 };
 
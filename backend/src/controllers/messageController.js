@@ -2,6 +2,7 @@ const messageService = require("../services/messageService.js");
 const {
   validateMessageId,
   validateMessage,
+  validateMessageBatch,
   validateSearchParams,
   validateStatsParams,
 } = require("../schemas/messageSchema.js");
@@ -26,6 +27,13 @@ exports.createMessage = async (req, res) => {
   res.status(201).json(message);
 };
 
+// Crear varios mensajes en lote
+exports.createMessagesBulk = async (req, res) => {
+  const data = validateMessageBatch(req.body); //* Validación
+  const result = await messageService.createMessagesBulk(data);
+  res.status(201).json(result);
+};
+
 // Actualizar un mensaje existente
 exports.updateMessage = async (req, res) => {
   const id = validateMessageId(req.params.id); //* Validación
@@ -16,6 +16,12 @@ const router = express.Router();
  *   get:
  *     summary: Obtiene todos los dispositivos
  *     tags: [Devices]
+ *     parameters:
+ *       - in: query
+ *         name: serverId
+ *         schema:
+ *           type: integer
+ *         description: Filtra los dispositivos asociados a un servidor
  *     responses:
  *       200:
  *         description: Lista de dispositivos
@@ -25,6 +31,8 @@ const router = express.Router();
  *               type: array
  *               items:
  *                 $ref: '#/components/schemas/Device'
+ *       400:
+ *         description: Parámetros inválidos
  *       401:
  *         description: Token no proporcionado o inválido
  */
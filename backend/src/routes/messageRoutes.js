@@ -259,6 +259,50 @@ router.get("/:id", authMiddleware(), messageController.getMessageById);
  */
 router.post("/", authMiddleware(ROLES.ADMIN), messageController.createMessage);
 
+/**
+ * @swagger
+ * /messages/bulk:
+ *   post:
+ *     summary: Crea varios mensajes en una sola operación
+ *     tags: [Messages]
+ *     description: |
+ *       Inserta un lote de mensajes con una única consulta.
+ *       Los mensajes cuyo serial no corresponde a ningún dispositivo se descartan y se contabilizan en "rejected".
+ *     requestBody:
+ *       required: true
+ *       content:
+ *         application/json:
+ *           schema:
+ *             type: array
+ *             items:
+ *               $ref: '#/components/schemas/Message'
+ *     responses:
+ *       201:
+ *         description: Lote procesado exitosamente
+ *         content:
+ *           application/json:
+ *             schema:
+ *               type: object
+ *               properties:
+ *                 created:
+ *                   type: integer
+ *                   description: Número de mensajes creados
+ *                 rejected:
+ *                   type: integer
+ *                   description: Número de mensajes descartados por no existir el dispositivo
+ *       400:
+ *         description: Error en la solicitud
+ *       401:
+ *         description: Token no proporcionado o inválido
+ *       403:
+ *         description: No tiene permisos para crear mensajes
+ */
+router.post(
+  "/bulk",
+  authMiddleware(ROLES.ADMIN),
+  messageController.createMessagesBulk
+);
+
 /**
  * @swagger
  * /messages/{id}:
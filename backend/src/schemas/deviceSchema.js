@@ -39,6 +39,15 @@ const partialDeviceSchema = deviceSchema
     "object.min": "Se requiere al menos un campo para actualizar.",
   });
 
+// Esquema para el listado de dispositivos
+const deviceListSchema = Joi.object({
+  serverId: Joi.number().integer().positive().messages({
+    "number.base": 'El campo "serverId" debe ser un número.',
+    "number.integer": 'El campo "serverId" debe ser un número entero.',
+    "number.positive": 'El campo "serverId" debe ser un número positivo.',
+  }),
+});
+
 // Esquema para reporte de actividad de dispositivos
 const deviceActivityReportSchema = Joi.object({
   serverIds: Joi.array()
@@ -108,10 +117,20 @@ function validateActivityReportParams(data) {
   return value;
 }
 
+//* Función para validar los parámetros del listado de dispositivos
+function validateDeviceListParams(data) {
+  const { error, value } = deviceListSchema.validate(data);
+  if (error) {
+    throw new BadRequestError(error.details[0].message);
+  }
+  return value;
+}
+
 module.exports = {
   validateDevice,
   validateDeviceId,
   validatePartialDevice,
   validateSerial,
   validateActivityReportParams,
+  validateDeviceListParams,
 };
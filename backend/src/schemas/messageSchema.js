@@ -27,6 +27,19 @@ const messageSchema = Joi.object({
   }),
 });
 
+// Esquema para lote de mensajes
+const messageBatchSchema = Joi.array()
+  .items(messageSchema)
+  .min(1)
+  .max(5000)
+  .required()
+  .messages({
+    "array.base": "El cuerpo de la petición debe ser un array de mensajes.",
+    "array.min": "El lote debe contener al menos un mensaje.",
+    "array.max": "El lote no puede contener más de 5000 mensajes.",
+    "any.required": "El lote de mensajes es obligatorio.",
+  });
+
 // Esquema base para búsqueda de mensajes
 const baseSearchSchema = Joi.object({
   serial: Joi.string(),
@@ -69,6 +82,15 @@ function validateMessage(data) {
   return value;
 }
 
+//* Función para validar un lote de mensajes
+function validateMessageBatch(data) {
+  const { error, value } = messageBatchSchema.validate(data);
+  if (error) {
+    throw new BadRequestError(error.details[0].message);
+  }
+  return value;
+}
+
 //* Función para validar solo el ID del mensaje
 function validateMessageId(id) {
   return validateId(id);
@@ -94,6 +116,7 @@ function validateStatsParams(data) {
 module.exports = {
   validateMessageId,
   validateMessage,
+  validateMessageBatch,
   validateSearchParams,
   validateStatsParams,
 };
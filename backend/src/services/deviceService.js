@@ -9,8 +9,11 @@ const { Op } = require("sequelize");
 const { buildBaseWhere } = require("../utils/queryUtils.js");
 
 class DeviceService {
-  //* Obtener todos los dispositivos
-  async getAllDevices() {
+  //* Obtener todos los dispositivos (opcionalmente de un único servidor)
+  async getAllDevices(serverId) {
+    if (serverId) {
+      return await Device.findAll({ where: { serverId } });
+    }
     return await Device.findAll();
   }
 
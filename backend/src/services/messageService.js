@@ -32,6 +32,35 @@ class MessageService {
     return message;
   }
 
+  //* Crear varios mensajes en una sola operación
+  async createMessagesBulk(messages) {
+    // Comprobar qué dispositivos existen con una única consulta
+    const serials = [...new Set(messages.map((m) => m.serial))];
+    const devices = await Device.findAll({
+      where: { serial: { [Op.in]: serials } },
+      attributes: ["serial"],
+    });
+    const knownSerials = new Set(devices.map((d) => d.serial));
+
+    const validMessages = messages
+      .filter((m) => knownSerials.has(m.serial))
+      .map(({ serial, timestamp, topic, content }) => ({
+        serial,
+        timestamp,
+        topic,
+        content,
+      }));
+
+    if (validMessages.length > 0) {
+      await Message.bulkCreate(validMessages);
+    }
+
+    return {
+      created: validMessages.length,
+      rejected: messages.length - validMessages.length,
+    };
+  }
+
   //* Actualizar un mensaje existente
   async updateMessage(id, data) {
     const message = await this.getMessageById(id);
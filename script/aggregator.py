@@ -0,0 +1,197 @@
+# Importaciones de la biblioteca estándar
+import math
+import time
+import logging
+import threading
+from array import array
+from datetime import datetime, timezone
+
+# Importaciones de terceros
+import paho.mqtt.client as mqtt
+try:
+    import numpy as np
+except ImportError:  # Dependencia opcional, solo necesaria con la agregación activada
+    np = None
+
+# Importaciones locales
+from change_filter import as_number
+
+
+def parse_topic_patterns(spec):
+    """
+    Parsea una lista de filtros de topic MQTT separados por comas (admiten + y #).
+    Ejemplo: '/+/+/cmd,/alarms/#' -> ['/+/+/cmd', '/alarms/#']
+    """
+    return [pattern.strip() for pattern in spec.split(',') if pattern.strip()]
+
+
+def isoformat(timestamp):
+    """Fecha ISO 8601 en UTC con sufijo Z, como el resto de mensajes."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+class SeriesGroup:
+    """
+    Lecturas de un (serial, topic) en la ventana actual: una columna array('d') por campo numérico
+    y el último valor de cada campo no numérico.
+    """
+    __slots__ = ('apikey', 'server_id', 'columns', 'fields', 'last_seen')
+
+    def __init__(self, apikey, server_id):
+        self.apikey = apikey
+        self.server_id = server_id
+        self.columns = {}   # campo -> array('d') con sus lecturas
+        self.fields = {}    # campo -> último valor no numérico recibido en la ventana
+        self.last_seen = 0.0
+
+
+class EdgeAggregator:
+    """
+    Agregación por ventanas de las lecturas numéricas antes de enviarlas a la API.
+    Guarda los campos numéricos de primer nivel de cada mensaje en columnas por (serial, topic, campo)
+    y, al cerrar cada ventana (alineada con el reloj), calcula con NumPy en una sola pasada vectorizada
+    el mínimo, máximo, media, número de lecturas y último valor de todas las columnas, y entrega un
+    mensaje agregado por (serial, topic), que conserva el último valor de los campos no numéricos
+    (unidades, estados...). Los valores no finitos (NaN, infinito) no se agregan y se tratan como
+    campos no numéricos. Los topics que coinciden con los filtros de passthrough y los
+    mensajes sin campos numéricos se reenvían sin agregar.
+    """
+
+    def __init__(self, window, passthrough=None, max_series=100000):
+        if np is None:
+            raise ValueError("la agregación requiere el paquete numpy (pip install numpy)")
+        if window <= 0:
+            raise ValueError("la ventana de agregación debe ser mayor que 0")
+        self.window = window
+        self.passthrough = passthrough or []
+        self.max_series = max_series
+        self.emit = None          # Función que recibe la lista de elementos (mensaje, apikey, server_id) agregados
+        self.aggregated = 0       # Lecturas absorbidas por la agregación
+        self.emitted = 0          # Mensajes agregados entregados
+
+        self._groups = {}         # (serial, topic) -> SeriesGroup
+        self._series = 0
+        self._window_start = self._align(time.time())
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='aggregator', daemon=True)
+
+    def __len__(self):
+        return self._series
+
+    def _align(self, now):
+        return now - now % self.window
+
+    def start(self, emit):
+        """Inicia el cierre periódico de ventanas entregando los agregados a emit."""
+        self.emit = emit
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo y entrega la ventana en curso."""
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+
+    def is_passthrough(self, topic):
+        return any(mqtt.topic_matches_sub(pattern, topic) for pattern in self.passthrough)
+
+    def add(self, serial, topic, content, apikey, server_id):
+        """
+        Añade las lecturas numéricas de un mensaje (content es su RawJSON validado) a la ventana actual.
+        Devuelve False si el mensaje debe reenviarse sin agregar (passthrough, sin campos numéricos
+        o límite de series alcanzado).
+        """
+        if self.passthrough and self.is_passthrough(topic):
+            return False
+        readings = []
+        fields = {}
+        for field, value in content.value().items():
+            number = as_number(value)
+            if number is not None and math.isfinite(number):
+                readings.append((field, number))
+            else:
+                fields[field] = value  # Texto, objeto, NaN o infinito: se conserva su último valor
+        if not readings:
+            return False
+
+        key = (serial, topic)
+        with self._lock:
+            group = self._groups.get(key)
+            # Cada campo numérico nuevo es una serie más, también en un grupo ya existente
+            new_series = len(readings) if group is None else sum(field not in group.columns for field, _ in readings)
+            if self._series + new_series > self.max_series:
+                return False
+            if group is None:
+                group = self._groups[key] = SeriesGroup(apikey, server_id)
+            for field, number in readings:
+                column = group.columns.get(field)
+                if column is None:
+                    column = group.columns[field] = array('d')
+                    self._series += 1
+                column.append(number)
+            group.fields.update(fields)
+            group.last_seen = time.time()
+            self.aggregated += 1
+        return True
+
+    def flush(self):
+        """Cierra la ventana en curso y entrega sus agregados."""
+        now = time.time()
+        with self._lock:
+            groups, self._groups = self._groups, {}
+            self._series = 0
+            start, self._window_start = self._window_start, self._align(now)
+        if not groups:
+            return
+        items = self._summarize(groups, start, min(start + self.window, now))
+        self.emitted += len(items)
+        if self.emit:
+            self.emit(items)
+
+    def _summarize(self, groups, start, end):
+        """Calcula las estadísticas de todas las columnas de la ventana con una pasada vectorizada."""
+        columns = [column for group in groups.values() for column in group.columns.values()]
+        counts = np.fromiter((len(column) for column in columns), dtype=np.int64, count=len(columns))
+        values = np.concatenate([np.frombuffer(column, dtype=np.float64) for column in columns])
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        minimums = np.minimum.reduceat(values, starts).tolist()
+        maximums = np.maximum.reduceat(values, starts).tolist()
+        means = (np.add.reduceat(values, starts) / counts).tolist()
+        lasts = values[ends - 1].tolist()
+        counts = counts.tolist()
+
+        window = {'start': isoformat(start), 'end': isoformat(end), 'seconds': self.window}
+        items = []
+        index = 0
+        for (serial, topic), group in groups.items():
+            content = {field: value for field, value in group.fields.items() if field not in group.columns}
+            content['window'] = window
+            for field in group.columns:
+                content[field] = {
+                    'min': minimums[index],
+                    'max': maximums[index],
+                    'mean': means[index],
+                    'count': counts[index],
+                    'last': lasts[index]
+                }
+                index += 1
+            message = {
+                'serial': serial,
+                'timestamp': isoformat(group.last_seen),
+                'topic': topic,
+                'content': content
+            }
+            items.append((message, group.apikey, group.server_id))
+        return items
+
+    def _run(self):
+        while not self._stopping.wait(max(self._window_start + self.window - time.time(), 0)):
+            if time.time() < self._window_start + self.window:
+                continue  # Despertado antes del cierre de la ventana
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error al cerrar la ventana de agregación: {e}")
@@ -0,0 +1,366 @@
+# Importaciones de la biblioteca estándar
+import os
+import time
+import signal
+import asyncio
+import logging
+
+# Importaciones de terceros
+import paho.mqtt.client as mqtt
+try:
+    import aiohttp
+except ImportError:  # Dependencia opcional, solo necesaria en modo asyncio
+    aiohttp = None
+
+# Importaciones locales
+from spool import is_transient_error
+from json_utils import encode_messages
+
+# Constantes internas
+MISC_INTERVAL = 1       # Intervalo de mantenimiento de la conexión MQTT (segundos)
+MAX_RECONNECT_DELAY = 120  # Espera máxima entre reintentos de reconexión (segundos)
+FLUSH_TIMEOUT = 10      # Tiempo máximo para terminar el trabajo pendiente al cerrar (segundos)
+HTTP_TIMEOUT = 30       # Tiempo máximo por petición a la API (segundos)
+
+
+class AsyncioHelper:
+    """
+    Integra el bucle de red de paho en un bucle de eventos asyncio.
+    El socket MQTT se registra como lector/escritor del bucle en lugar de usar
+    loop_forever, y las tareas periódicas (keepalive, reconexión) corren como una tarea más.
+    """
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.stopping = False
+        self.paused = False
+        self.sock = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+        # Se inicia antes de conectar para reintentar también si falla la primera conexión
+        self.misc = loop.create_task(self.misc_loop())
+
+    def on_socket_open(self, client, userdata, sock):
+        self.sock = sock
+        if not self.paused:
+            self.loop.add_reader(sock, client.loop_read)
+
+    def on_socket_close(self, client, userdata, sock):
+        self.sock = None
+        self.loop.remove_reader(sock)
+
+    def pause(self):
+        """Deja de leer del socket: el broker retiene los mensajes (backpressure)."""
+        self.paused = True
+        if self.sock is not None:
+            self.loop.remove_reader(self.sock)
+
+    def resume(self):
+        """Vuelve a leer del socket."""
+        self.paused = False
+        if self.sock is not None:
+            self.loop.add_reader(self.sock, self.client.loop_read)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def misc_loop(self):
+        """Mantiene la conexión viva y reconecta con espera exponencial si se pierde."""
+        delay = MISC_INTERVAL
+        while not self.stopping:
+            if self.client.loop_misc() == mqtt.MQTT_ERR_NO_CONN:
+                try:
+                    self.client.reconnect()
+                    delay = MISC_INTERVAL
+                except OSError as e:
+                    logging.error(f"Error al reconectar con {self.client._host}: {e}")
+                    delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            await asyncio.sleep(delay)
+
+
+class DeviceDispatcher:
+    """
+    Reparte los mensajes en colas por dispositivo.
+    Los mensajes de un mismo dispositivo se procesan en orden, mientras que dispositivos
+    distintos avanzan en paralelo hasta max_concurrency a la vez. Cada ronda procesa
+    juntos todos los mensajes acumulados de un dispositivo.
+    """
+
+    def __init__(self, loop, process, max_concurrency, max_pending, metrics):
+        self.loop = loop
+        self.process = process
+        self.metrics = metrics
+        self.max_pending = max_pending
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.queues = {}    # serial -> lista de (instante de encolado, mensaje, entrega) pendientes
+        self.tasks = set()
+        self.pending = 0
+        self.dropped = 0
+
+    def submit(self, serial, item, delivery=None):
+        """
+        Encola un mensaje de un dispositivo. Devuelve False si se supera el límite de mensajes pendientes.
+        delivery (opcional) se libera cuando el mensaje se ha procesado.
+        """
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            return False
+        self.pending += 1
+
+        entry = (time.monotonic(), item, delivery)
+        items = self.queues.get(serial)
+        if items is not None:
+            items.append(entry)
+            return True
+
+        self.queues[serial] = [entry]
+        task = self.loop.create_task(self._drain(serial))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def _drain(self, serial):
+        """Procesa por rondas los mensajes de un dispositivo hasta que su cola queda vacía."""
+        while True:
+            async with self.semaphore:
+                items = self.queues[serial]
+                if not items:
+                    del self.queues[serial]
+                    return
+                self.queues[serial] = []
+                now = time.monotonic()
+                for enqueued_at, _, _ in items:
+                    self.metrics.observe('queue', now - enqueued_at)
+                deliveries = [delivery for _, _, delivery in items if delivery is not None]
+                items = [item for _, item, _ in items]
+                durable = False
+                try:
+                    durable = await self.process(serial, items)
+                except Exception as e:
+                    logging.error(f"Error inesperado al procesar {len(items)} mensajes del dispositivo {serial}: {e}")
+                finally:
+                    self.pending -= len(items)
+                    for delivery in deliveries:
+                        delivery.done(durable)
+
+    async def join(self, timeout):
+        """Espera a que terminen los dispositivos en curso."""
+        if self.tasks:
+            await asyncio.wait(set(self.tasks), timeout=timeout)
+
+
+async def run_async(servers, token, config, registry, spools, setup_client, prepare_message, metrics, control=None, aggregator=None, inflight=None, store=None, apply_servers=None):
+    """
+    Ejecuta el cliente MQTT sobre asyncio.
+    Un único bucle de eventos atiende las conexiones a todos los servidores y las peticiones
+    a la API se hacen con un pool de conexiones HTTP asíncronas, de modo que cientos de
+    peticiones pueden estar en vuelo a la vez en lugar de serializarse.
+    Args:
+        servers: Configuraciones de los servidores obtenidas de la API
+        token: Token de autenticación para la API
+        config: Configuración validada de variables de entorno
+        registry: Caché de dispositivos compartida con el modo síncrono
+        spools: Spool en disco por servidor para los mensajes no entregados (vacío si está desactivado)
+        setup_client: Función que configura y conecta el cliente MQTT
+        prepare_message: Función que parsea un mensaje MQTT
+        metrics: Registro de métricas compartido con el modo síncrono
+        control: Canal de control con el gestor, para recibir el token renovado y los cambios de los servidores (None si no se usa)
+        aggregator: Agregación por ventanas de las lecturas numéricas (None si está desactivada)
+        inflight: Ventana de mensajes en curso para el backpressure (None si no hay límite, confirmación manual ni deduplicación)
+        store: Función que guarda un lote directamente en la base de datos (None para usar la API)
+        apply_servers: Función que aplica los cambios de configuración de los servidores (se llama desde el bucle)
+    """
+    if aiohttp is None:
+        logging.error("El modo asyncio requiere el paquete aiohttp (pip install aiohttp)")
+        return
+
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+
+    # Cierre limpio ante señales
+    if os.name == 'posix':
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    connector = aiohttp.TCPConnector(
+        limit=int(config['HTTP_POOL_SIZE']),
+        ttl_dns_cache=300,
+        keepalive_timeout=60
+    )
+    metrics.gauge(
+        'mqtt_client_http_connections', 'Conexiones HTTP a la API en uso en modo asyncio',
+        lambda: len(getattr(connector, '_acquired', ()))
+    )
+    http = aiohttp.ClientSession(
+        connector=connector,
+        headers={'Authorization': f"Bearer {token}"},
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+    )
+    if control:
+        # El canal de control corre en otro hilo; las cabeceras y los clientes MQTT se cambian desde el bucle,
+        # ya que paho registra el socket en el bucle (add_writer) al suscribirse o reconectar
+        control.on('token', lambda message: loop.call_soon_threadsafe(
+            http.headers.update, {'Authorization': f"Bearer {message['token']}"}
+        ))
+        if apply_servers is not None:
+            control.on('servers', lambda message: loop.call_soon_threadsafe(apply_servers, message))
+        control.start()
+
+    async def process(serial, items):
+        """
+        Entrega los mensajes acumulados a la API o, si no es posible, al spool en disco.
+        Devuelve True si quedaron entregados de forma duradera (en la API o en el spool).
+        """
+        spool = spools.get(items[0][2])
+        if spool is None:
+            return await send(serial, items)
+        if spool.has_pending() or not await send(serial, items):
+            return not spool.append(items)
+        return True
+
+    async def send(serial, items):
+        """
+        Actualiza el dispositivo y guarda en bloque los mensajes acumulados.
+        Devuelve False si el envío falló por un error transitorio y debe reintentarse.
+        """
+        if store is not None:
+            # El controlador de base de datos es bloqueante: se ejecuta en el pool de hilos del bucle
+            return await asyncio.to_thread(store, items)
+        message, apikey, server_id = items[-1]
+        started = time.perf_counter()
+        if registry.is_cached(serial):
+            # Sin E/S: solo anota lastCommunication para la escritura diferida
+            registry.update_or_create(serial, apikey, message['timestamp'], server_id)
+        else:
+            await asyncio.to_thread(registry.update_or_create, serial, apikey, message['timestamp'], server_id)
+        metrics.observe('device', time.perf_counter() - started)
+
+        messages = [message for message, _, _ in items]
+        started = time.perf_counter()
+        try:
+            async with http.post(
+                f"{config['API_URL']}/messages/bulk",
+                data=encode_messages(messages),
+                headers={'Content-Type': 'application/json'}
+            ) as response:
+                if response.status == 201:
+                    result = await response.json()
+                    metrics.observe('api_post', time.perf_counter() - started)
+                    metrics.stored.inc(result['created'], result='created')
+                    metrics.stored.inc(result['rejected'], result='rejected')
+                    logging.debug(f"Lote guardado en la base de datos: {result['created']} mensajes creados, {result['rejected']} rechazados")
+                    return True
+                metrics.observe('api_post', time.perf_counter() - started)
+                logging.error(f"Error al guardar el lote de {len(messages)} mensajes en la base de datos: {response.status} - {await response.text()}")
+                transient = is_transient_error(response.status)
+                metrics.batch_errors.inc(kind='transient' if transient else 'permanent')
+                return not transient
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.observe('api_post', time.perf_counter() - started)
+            metrics.batch_errors.inc(kind='transient')
+            logging.error(f"Excepción al enviar lote de {len(messages)} mensajes a la API: {e}")
+            return False
+
+    dispatcher = DeviceDispatcher(
+        loop,
+        process,
+        max_concurrency=int(config['ASYNC_MAX_CONCURRENCY']),
+        max_pending=int(config['QUEUE_MAX_SIZE']),
+        metrics=metrics
+    )
+    metrics.gauge(
+        'mqtt_client_queue_depth', 'Mensajes en cola pendientes de envío',
+        lambda: dispatcher.pending
+    )
+
+    def on_message(client, userdata, msg):
+        """Procesa los mensajes MQTT recibidos y los reparte por dispositivo."""
+        # Sin bloquear el bucle: al llenarse la ventana se retiran los sockets del bucle
+        delivery = inflight.track(client, msg, block=False) if inflight is not None else None
+        prepared = prepare_message(client, userdata, msg, delivery)
+        if prepared is None:
+            if delivery is not None:
+                delivery.done()
+            return
+        message, apikey = prepared
+        item = (message, apikey, userdata["server_id"])
+        if not dispatcher.submit(message['serial'], item, delivery):
+            if spools:
+                durable = not spools[userdata["server_id"]].append([item])
+            else:
+                durable = False
+                topic_matcher = userdata["topic_matcher"]
+                shape = topic_matcher.shape(topic_matcher.match(message['topic']))
+                metrics.dropped.inc(server=userdata["server_id"], shape=shape, reason='queue_full')
+                logging.warning(f"Cola de mensajes llena, mensaje descartado ({dispatcher.dropped} descartados en total)")
+            if delivery is not None:
+                delivery.done(durable)
+
+    def submit_aggregates(items):
+        """Reparte los mensajes agregados al cerrar una ventana, como on_message con los mensajes sueltos."""
+        for item in items:
+            if not dispatcher.submit(item[0]['serial'], item):
+                if spools:
+                    spools[item[2]].append([item])
+                else:
+                    metrics.dropped.inc(server=item[2], shape='aggregate', reason='queue_full')
+                    logging.warning(f"Cola de mensajes llena, mensaje agregado descartado ({dispatcher.dropped} descartados en total)")
+
+    if aggregator is not None:
+        # Las ventanas se cierran en el hilo del agregador; los mensajes se reparten en el bucle de eventos
+        aggregator.start(lambda items: loop.call_soon_threadsafe(submit_aggregates, items))
+
+    helpers = []
+    clients = []
+    if inflight is not None:
+        def pause_reading():
+            for helper in helpers:
+                helper.pause()
+            # Una pausa nunca dura más de max_pause, para que el keepalive no cierre la conexión
+            loop.call_later(inflight.max_pause, inflight.force_resume)
+
+        def resume_reading():
+            for helper in helpers:
+                helper.resume()
+
+        inflight.on_pause = pause_reading
+        inflight.on_resume = resume_reading
+    for server in servers:
+        client = setup_client(
+            server,
+            message_callback=on_message,
+            before_connect=lambda c: helpers.append(AsyncioHelper(loop, c)),
+            exit_on_error=len(servers) == 1
+        )
+        if client:
+            clients.append(client)
+    if not clients:
+        logging.error("No se pudo configurar ningún cliente MQTT")
+        await http.close()
+        return
+    logging.info(f"Cliente MQTT iniciado correctamente en modo asyncio para {len(clients)} servidor(es)...")
+
+    try:
+        await stop_event.wait()
+    finally:
+        for helper in helpers:
+            helper.stopping = True
+        for client in clients:
+            logging.info(f"Cerrando cliente MQTT de {client._host}...")
+            client.disconnect()
+        if aggregator is not None:
+            # La ventana en curso se entrega antes de esperar a que se vacíe la cola
+            aggregator.stop()
+            await asyncio.sleep(0)
+        logging.info("Enviando mensajes pendientes...")
+        await dispatcher.join(FLUSH_TIMEOUT)
+        await http.close()
+        for spool in spools.values():
+            spool.stop()
+        registry.stop()
@@ -0,0 +1,645 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Importaciones de terceros
+import psutil
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives import padding
+
+# Importaciones locales
+from json_utils import loads
+from metrics import LatencyHistogram
+
+# Constantes internas
+CLIENT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mqtt_client.py')
+SERVER_ID = 1
+APIKEY = 'bench'
+TICK = 0.005                # Intervalo del generador de tráfico con tasa limitada (segundos)
+CHUNK_SIZE = 1000           # Mensajes máximos por escritura en el socket
+SAMPLE_INTERVAL = 0.5       # Intervalo de muestreo de CPU y memoria del cliente (segundos)
+SUBSCRIBE_TIMEOUT = 30      # Tiempo máximo para que el cliente se suscriba (segundos)
+STOP_TIMEOUT = 20           # Tiempo máximo para que el cliente termine tras SIGTERM (segundos)
+
+# Tipos de paquete MQTT
+CONNECT, CONNACK, PUBLISH, SUBSCRIBE, SUBACK = 1, 2, 3, 8, 9
+UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 10, 11, 12, 13, 14
+
+
+# Funciones de configuración y argumentos
+def parse_arguments():
+    """Procesa los argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark de extremo a extremo del cliente MQTT con broker y API simulados',
+        epilog='Ejemplo: python benchmark.py --devices 5000 --rate 20000 --duration 60 --output resultados.json'
+    )
+    parser.add_argument('--devices', type=int, default=1000,
+                        help='Número de dispositivos (seriales) de la flota sintética')
+    parser.add_argument('--topic-format', default='/{apikey}/{serial}/{type}',
+                        help='Formato de topic del servidor simulado')
+    parser.add_argument('--topic-values', default='attrs',
+                        help='Valores, separados por comas, para los campos del topic distintos de serial y apikey')
+    parser.add_argument('--payload-size', type=int, default=64,
+                        help='Tamaño aproximado del payload JSON (bytes)')
+    parser.add_argument('--rate', type=float, default=1000,
+                        help='Mensajes por segundo publicados (0 para publicar tan rápido como sea posible)')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='Duración de la medición (segundos)')
+    parser.add_argument('--warmup', type=float, default=5,
+                        help='Calentamiento previo a la medición (segundos)')
+    parser.add_argument('--drain-timeout', type=float, default=10,
+                        help='Tiempo máximo para que lleguen a la API los mensajes pendientes al terminar (segundos)')
+    parser.add_argument('--api-latency', type=float, default=0.0,
+                        help='Latencia añadida a cada petición a la API simulada (segundos)')
+    parser.add_argument('--cold-cache', action='store_true',
+                        help='Arranca sin dispositivos registrados, de modo que el cliente debe crearlos')
+    parser.add_argument('--replicas', type=int, default=1,
+                        help='Número de procesos cliente; con más de uno se lanzan como réplicas con suscripción compartida')
+    parser.add_argument('--client-args', default='',
+                        help='Argumentos adicionales para mqtt_client.py (ej: "--asyncio")')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='Fichero JSON en el que se guardan los resultados')
+    parser.add_argument('--baseline',
+                        help='Resultados previos con los que comparar; termina con error si hay regresión')
+    parser.add_argument('--max-regression', type=float, default=10,
+                        help='Porcentaje máximo de empeoramiento de throughput o p99 admitido frente a la referencia')
+    return parser.parse_args()
+
+
+# Utilidades MQTT
+def encode_length(length):
+    """Codifica la longitud restante de un paquete MQTT (entero de longitud variable)."""
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def encode_string(value):
+    data = value.encode('utf-8')
+    return len(data).to_bytes(2, 'big') + data
+
+
+def decode_length(data, position):
+    """Decodifica un entero de longitud variable. Devuelve (valor, siguiente posición)."""
+    multiplier, value = 1, 0
+    while True:
+        byte = data[position]
+        position += 1
+        value += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            return value, position
+        multiplier *= 128
+
+
+def topic_matches(topic_filter, topic):
+    """Indica si un topic encaja con un filtro de suscripción (con comodines + y #)."""
+    filter_parts = topic_filter.split('/')
+    topic_parts = topic.split('/')
+    for index, part in enumerate(filter_parts):
+        if part == '#':
+            return True
+        if index >= len(topic_parts) or (part != '+' and part != topic_parts[index]):
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+class Fleet:
+    """Flota sintética de dispositivos: genera los topics y payloads de los mensajes publicados."""
+
+    def __init__(self, devices, topic_format, topic_values, payload_size):
+        self.serials = [f"dev{index:06d}" for index in range(devices)]
+        values = topic_values.split(',')
+        parts = topic_format.split('/')
+        self.topics = []
+        for index, serial in enumerate(self.serials):
+            topic_parts = []
+            for part in parts:
+                if part == '{serial}':
+                    topic_parts.append(serial)
+                elif part == '{apikey}':
+                    topic_parts.append(APIKEY)
+                elif part.startswith('{') or part in ('+', '#'):
+                    topic_parts.append(values[index % len(values)])
+                else:
+                    topic_parts.append(part)
+            self.topics.append('/'.join(topic_parts))
+        # Relleno para aproximar el tamaño de payload pedido
+        self.padding = 'x' * max(0, payload_size - len('{"ts":0000000000.000000,"seq":0000000,"pad":""}'))
+        self.sequence = 0
+
+    def next_message(self):
+        """Devuelve (topic, payload) del siguiente mensaje, repartidos por turnos entre los dispositivos."""
+        index = self.sequence % len(self.topics)
+        payload = f'{{"ts":{time.time():.6f},"seq":{self.sequence},"pad":"{self.padding}"}}'.encode('utf-8')
+        self.sequence += 1
+        return self.topics[index], payload
+
+
+class BrokerSession:
+    """Conexión de un cliente al broker simulado."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.protocol = 4       # 4: MQTT 3.1.1, 5: MQTT 5
+        self.filters = []       # Suscripciones normales
+        self.shared = []        # Suscripciones compartidas: (grupo, filtro)
+
+    def publish_packet(self, topic, payload):
+        """Construye un PUBLISH con QoS 0."""
+        body = encode_string(topic) + (b'\x00' if self.protocol == 5 else b'') + payload
+        return bytes([PUBLISH << 4]) + encode_length(len(body)) + body
+
+    def subscribe(self, topic_filter):
+        if topic_filter.startswith('$share/'):
+            _, group, topic_filter = topic_filter.split('/', 2)
+            self.shared.append((group, topic_filter))
+        else:
+            self.filters.append(topic_filter)
+
+    def matches(self, topic):
+        return any(topic_matches(topic_filter, topic) for topic_filter in self.filters)
+
+    def shared_groups(self, topic):
+        return {group for group, topic_filter in self.shared if topic_matches(topic_filter, topic)}
+
+
+class StubBroker:
+    """
+    Broker MQTT mínimo (3.1.1 y 5, QoS 0) para el benchmark.
+    No reenvía lo que publican los clientes: es él quien genera el tráfico de la flota sintética
+    y lo entrega a las sesiones suscritas, sin que un publicador externo limite la tasa alcanzable.
+    Las suscripciones compartidas ($share/<grupo>/<filtro>) reciben cada mensaje en una sola
+    sesión del grupo, por turnos.
+    """
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+        self.sessions = set()
+        self.subscribed = asyncio.Event()
+        self.subscribers = 0
+        self.sent = 0
+        self._handlers = set()
+        self._recipients = {}   # topic -> (sesiones, {grupo: sesiones}) (se invalida al cambiar las suscripciones)
+        self._turns = {}        # grupo -> turno de reparto
+
+    async def start(self, host='127.0.0.1'):
+        self.server = await asyncio.start_server(self.handle, host, 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        for session in list(self.sessions):
+            session.writer.close()
+        if self._handlers:
+            await asyncio.wait(set(self._handlers), timeout=STOP_TIMEOUT)
+
+    async def _read_packet(self, reader):
+        header = await reader.readexactly(1)
+        multiplier, length = 1, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return header[0] >> 4, await reader.readexactly(length)
+
+    async def handle(self, reader, writer):
+        session = BrokerSession(writer)
+        self.sessions.add(session)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                packet_type, body = await self._read_packet(reader)
+                if packet_type == CONNECT:
+                    # Nivel de protocolo tras el nombre "MQTT"
+                    session.protocol = body[6]
+                    writer.write(b'\x20\x03\x00\x00\x00' if session.protocol == 5 else b'\x20\x02\x00\x00')
+                elif packet_type == SUBSCRIBE:
+                    packet_id, position = body[:2], 2
+                    if session.protocol == 5:
+                        properties_length, position = decode_length(body, position)
+                        position += properties_length
+                    granted = bytearray()
+                    while position < len(body):
+                        length = int.from_bytes(body[position:position + 2], 'big')
+                        session.subscribe(body[position + 2:position + 2 + length].decode('utf-8'))
+                        position += 2 + length + 1
+                        granted.append(0)
+                    reply = packet_id + (b'\x00' if session.protocol == 5 else b'') + bytes(granted)
+                    writer.write(bytes([SUBACK << 4]) + encode_length(len(reply)) + reply)
+                    self._recipients.clear()
+                    self.subscribers += 1
+                    self.subscribed.set()
+                elif packet_type == UNSUBSCRIBE:
+                    reply = body[:2] + (b'\x00' if session.protocol == 5 else b'')
+                    writer.write(bytes([UNSUBACK << 4]) + encode_length(len(reply)) + reply)
+                elif packet_type == PINGREQ:
+                    writer.write(bytes([PINGRESP << 4, 0]))
+                elif packet_type == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.sessions.discard(session)
+            self._handlers.discard(asyncio.current_task())
+            self._recipients.clear()
+            writer.close()
+
+    def _sessions_for(self, topic):
+        recipients = self._recipients.get(topic)
+        if recipients is None:
+            groups = {}
+            for session in self.sessions:
+                for group in session.shared_groups(topic):
+                    groups.setdefault(group, []).append(session)
+            recipients = self._recipients[topic] = ([s for s in self.sessions if s.matches(topic)], groups)
+        direct, groups = recipients
+        if not groups:
+            return direct
+        selected = list(direct)
+        for group, members in groups.items():
+            turn = self._turns.get(group, 0)
+            self._turns[group] = turn + 1
+            selected.append(members[turn % len(members)])
+        return selected
+
+    async def wait_subscribers(self, count, timeout):
+        """Espera a que se hayan suscrito count sesiones."""
+        deadline = time.monotonic() + timeout
+        while self.subscribers < count:
+            self.subscribed.clear()
+            await asyncio.wait_for(self.subscribed.wait(), max(0, deadline - time.monotonic()))
+
+    async def publish(self, count):
+        """Publica los siguientes count mensajes de la flota a las sesiones suscritas."""
+        outgoing = {}
+        for _ in range(count):
+            topic, payload = self.fleet.next_message()
+            for session in self._sessions_for(topic):
+                outgoing.setdefault(session, []).append(session.publish_packet(topic, payload))
+        self.sent += count
+        for session, packets in outgoing.items():
+            session.writer.write(b''.join(packets))
+        for session in outgoing:
+            try:
+                await session.writer.drain()
+            except ConnectionError:
+                self.sessions.discard(session)
+
+    async def run(self, rate, duration):
+        """Genera tráfico durante duration segundos a rate mensajes por segundo (0 sin límite)."""
+        started = time.monotonic()
+        end = started + duration
+        offset = self.sent
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                return
+            if rate > 0:
+                due = min(int((now - started) * rate) - (self.sent - offset), CHUNK_SIZE)
+                if due <= 0:
+                    await asyncio.sleep(TICK)
+                    continue
+            else:
+                due = CHUNK_SIZE
+            await self.publish(due)
+
+
+class StubApi:
+    """
+    API REST simulada con latencia configurable.
+    Implementa los endpoints que usa el cliente y mide la latencia de ingesta de cada mensaje
+    a partir de la marca de tiempo que lleva su payload.
+    """
+
+    def __init__(self, server, devices, latency):
+        self.server = server
+        self.latency = latency
+        self.devices = {serial: index + 1 for index, serial in enumerate(devices)}
+        self.next_device_id = len(self.devices) + 1
+        self.requests = {}
+        self.received = 0
+        self.window = None          # (inicio, fin) de la medición en tiempo de reloj
+        self.window_received = 0
+        self.histogram = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def start(self, host='127.0.0.1'):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def _handle(self, method):
+                path, _, query = self.path.partition('?')
+                body = self._body() if method in ('POST', 'PATCH') else b''
+                if api.latency:
+                    time.sleep(api.latency)
+                status, reply = api.route(method, path.rstrip('/'), query, body)
+                self._reply(status, reply)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PATCH(self):
+                self._handle('PATCH')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, name='stub-api', daemon=True).start()
+        return self.httpd.server_address[1]
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, name):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def _record(self, messages):
+        now = time.time()
+        with self._lock:
+            self.received += len(messages)
+            if self.window and self.window[0] <= now <= self.window[1]:
+                self.window_received += len(messages)
+                for message in messages:
+                    self.histogram.record(now - message['content']['ts'])
+
+    def route(self, method, path, query, body):
+        """Atiende una petición. Devuelve (código de estado, cuerpo)."""
+        parts = path.strip('/').split('/')
+        if method == 'GET' and parts == ['servers', str(SERVER_ID)]:
+            self._count('GET /servers/:id')
+            return 200, self.server
+        if method == 'GET' and parts == ['devices']:
+            self._count('GET /devices')
+            return 200, [{'id': device_id, 'serial': serial} for serial, device_id in self.devices.items()]
+        if method == 'GET' and len(parts) == 3 and parts[:2] == ['devices', 'serial']:
+            self._count('GET /devices/serial/:serial')
+            device_id = self.devices.get(parts[2])
+            return 200, {'id': device_id, 'serial': parts[2]} if device_id else None
+        if method == 'POST' and parts == ['devices']:
+            self._count('POST /devices')
+            device = loads(body)
+            with self._lock:
+                if device['serial'] in self.devices:
+                    return 409, {'message': 'El dispositivo ya existe'}
+                self.devices[device['serial']] = self.next_device_id
+                self.next_device_id += 1
+            return 201, {'id': self.devices[device['serial']], 'serial': device['serial']}
+        if method == 'PATCH' and len(parts) == 2 and parts[0] == 'devices':
+            self._count('PATCH /devices/:id')
+            return 200, {'id': int(parts[1])}
+        if method == 'POST' and parts == ['messages']:
+            self._count('POST /messages')
+            self._record([loads(body)])
+            return 201, {}
+        if method == 'POST' and parts == ['messages', 'bulk']:
+            self._count('POST /messages/bulk')
+            messages = loads(body)
+            self._record(messages)
+            return 201, {'created': len(messages), 'rejected': 0}
+        self._count('otros')
+        return 404, {'message': 'No encontrado'}
+
+
+class ResourceSampler:
+    """Muestrea periódicamente el uso de CPU y memoria de los procesos cliente (sumados)."""
+
+    def __init__(self, pids):
+        self.processes = [psutil.Process(pid) for pid in pids]
+        self.samples = []   # (instante, % CPU, RSS en bytes)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            for process in self.processes:
+                process.cpu_percent(None)
+            while not self._stopping.wait(SAMPLE_INTERVAL):
+                cpu, rss = 0.0, 0
+                for process in self.processes:
+                    with process.oneshot():
+                        cpu += process.cpu_percent(None)
+                        rss += process.memory_info().rss
+                self.samples.append((time.time(), cpu, rss))
+        except psutil.Error:
+            pass
+
+    def summary(self, start, end):
+        window = [(cpu, rss) for timestamp, cpu, rss in self.samples if start <= timestamp <= end]
+        if not window:
+            return {'cpu_percent_mean': None, 'cpu_percent_max': None, 'rss_bytes_mean': None, 'rss_bytes_max': None}
+        cpu = [sample[0] for sample in window]
+        rss = [sample[1] for sample in window]
+        return {
+            'cpu_percent_mean': round(sum(cpu) / len(cpu), 1),
+            'cpu_percent_max': round(max(cpu), 1),
+            'rss_bytes_mean': int(sum(rss) / len(rss)),
+            'rss_bytes_max': max(rss)
+        }
+
+
+def encrypt(text, key_hex):
+    """Cifra un texto con AES-CBC en el formato que descifra el cliente (cifrado:iv en hexadecimal)."""
+    iv = os.urandom(16)
+    padder = padding.PKCS7(128).padder()
+    data = padder.update(text.encode('utf-8')) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(bytes.fromhex(key_hex)), modes.CBC(iv)).encryptor()
+    return (encryptor.update(data) + encryptor.finalize()).hex() + ':' + iv.hex()
+
+
+def start_client(api_port, key_hex, work_dir, client_args, replica=None):
+    """Lanza mqtt_client.py contra la API simulada con su log en el directorio de trabajo."""
+    env = dict(os.environ)
+    env.update({
+        'API_URL': f"http://127.0.0.1:{api_port}",
+        'ENCRYPTION_KEY': key_hex,
+        'SPOOL_DIR': os.path.join(work_dir, 'spool'),
+        'PYTHONUNBUFFERED': '1'
+    })
+    command = [sys.executable, CLIENT_SCRIPT, str(SERVER_ID), 'benchmark-token', *shlex.split(client_args)]
+    if replica is not None:
+        command += ['--replica', str(replica)]
+    log_path = os.path.join(work_dir, 'client.log' if replica is None else f"client_r{replica}.log")
+    with open(log_path, 'a', encoding='utf-8') as log_file:
+        process = subprocess.Popen(
+            command,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            env=env
+        )
+    return process, log_path
+
+
+def stop_client(process):
+    """Detiene el cliente con SIGTERM, como el gestor, y lo mata si no termina a tiempo."""
+    if process.poll() is not None:
+        return process.returncode
+    process.send_signal(signal.SIGTERM)
+    try:
+        return process.wait(STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        return process.wait()
+
+
+def compare_with_baseline(results, baseline_path, max_regression):
+    """Compara con unos resultados previos. Devuelve la lista de regresiones detectadas."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    limit = max_regression / 100
+    if baseline['throughput'] and results['throughput'] < baseline['throughput'] * (1 - limit):
+        regressions.append(f"throughput {results['throughput']:.0f} msg/s frente a {baseline['throughput']:.0f} msg/s")
+    base_p99 = baseline['latency']['p99']
+    if base_p99 and results['latency']['p99'] > base_p99 * (1 + limit):
+        regressions.append(f"latencia p99 {results['latency']['p99'] * 1000:.1f} ms frente a {base_p99 * 1000:.1f} ms")
+    return regressions
+
+
+async def run_benchmark(args, work_dir):
+    """Ejecuta el benchmark completo y devuelve los resultados."""
+    key_hex = os.urandom(32).hex()
+    fleet = Fleet(args.devices, args.topic_format, args.topic_values, args.payload_size)
+
+    broker = StubBroker(fleet)
+    broker_port = await broker.start()
+    server = {
+        'id': SERVER_ID,
+        'name': 'benchmark',
+        'endpoint': f"127.0.0.1:{broker_port}",
+        'username': 'benchmark',
+        'password': encrypt('benchmark', key_hex),
+        'topicFormat': args.topic_format
+    }
+    api = StubApi(server, [] if args.cold_cache else fleet.serials, args.api_latency)
+    api_port = api.start()
+
+    clients = [
+        start_client(api_port, key_hex, work_dir, args.client_args, replica if args.replicas > 1 else None)
+        for replica in range(args.replicas)
+    ]
+    sampler = ResourceSampler([process.pid for process, _ in clients])
+    sampler.start()
+    try:
+        try:
+            await broker.wait_subscribers(len(clients), SUBSCRIBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Los clientes no se suscribieron en {SUBSCRIBE_TIMEOUT} s (ver {work_dir})")
+
+        print(f"Calentamiento: {args.warmup:g} s...")
+        await broker.run(args.rate, args.warmup)
+        window_start = time.time()
+        api.window = (window_start, window_start + args.duration)
+        print(f"Midiendo: {args.duration:g} s...")
+        await broker.run(args.rate, args.duration)
+        window_end = time.time()
+
+        # Esperar a que la API reciba lo pendiente para contar los mensajes perdidos
+        deadline = time.monotonic() + args.drain_timeout
+        while api.received < broker.sent and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+    finally:
+        sampler.stop()
+        exit_codes = [stop_client(process) for process, _ in clients]
+        await broker.stop()
+        api.stop()
+
+    histogram = api.histogram
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        'config': vars(args),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'sent': broker.sent,
+        'received': api.received,
+        'lost': broker.sent - api.received,
+        'offered_rate': args.rate,
+        'throughput': round(api.window_received / (window_end - window_start), 1),
+        'latency': {
+            'p50': round(histogram.percentile(50), 6),
+            'p90': round(histogram.percentile(90), 6),
+            'p99': round(histogram.percentile(99), 6),
+            'max': round(histogram.max, 6),
+            'mean': round(histogram.sum / histogram.count, 6) if histogram.count else 0.0
+        },
+        'resources': sampler.summary(window_start, window_end),
+        'api_requests': api.requests,
+        'client_exit_codes': exit_codes,
+        'client_logs': [log_path for _, log_path in clients]
+    }
+
+
+def main():
+    args = parse_arguments()
+    work_dir = tempfile.mkdtemp(prefix='mqtt_benchmark_')
+    try:
+        results = asyncio.run(run_benchmark(args, work_dir))
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    latency = results['latency']
+    resources = results['resources']
+    print(f"Throughput sostenido: {results['throughput']:.0f} msg/s (ofrecido: {args.rate:g} msg/s)")
+    print(f"Latencia de ingesta: p50 {latency['p50'] * 1000:.1f} ms, p99 {latency['p99'] * 1000:.1f} ms")
+    if resources['cpu_percent_mean'] is not None:
+        print(f"CPU media: {resources['cpu_percent_mean']}%, RSS máxima: {resources['rss_bytes_max'] / 1048576:.1f} MB")
+    print(f"Enviados: {results['sent']}, recibidos por la API: {results['received']}, perdidos: {results['lost']}")
+    print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            print(f"Regresión frente a {args.baseline}: {'; '.join(regressions)}")
+            sys.exit(1)
+        print(f"Sin regresiones frente a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
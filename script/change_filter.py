@@ -0,0 +1,113 @@
+# Importaciones de la biblioteca estándar
+import time
+import threading
+from collections import OrderedDict
+
+# Importaciones locales
+from json_utils import loads
+
+
+def parse_field_deadbands(spec):
+    """
+    Parsea los márgenes por campo con el formato 'campo=margen,campo=margen'.
+    Ejemplo: 'temperature=0.5,humidity=2' -> {'temperature': 0.5, 'humidity': 2.0}
+    """
+    deadbands = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        field, separator, value = item.partition('=')
+        if not separator or not field:
+            raise ValueError(f"Margen inválido: {item} (formato esperado: campo=margen)")
+        deadbands[field.strip()] = float(value)
+    return deadbands
+
+
+def as_number(value):
+    """Devuelve el valor como número si es numérico (incluidos los textos numéricos) o None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class ChangeFilter:
+    """
+    Filtro de cambios por (serial, topic).
+    Guarda el último contenido reenviado de cada topic de cada dispositivo y descarta los mensajes
+    cuyo contenido es idéntico o cuyos campos numéricos se han movido menos que su margen (deadband).
+    Los márgenes se comparan siempre con el último valor reenviado, de modo que una deriva lenta
+    acaba reenviándose. Cada heartbeat segundos (0 para nunca) se reenvía el mensaje aunque no haya cambiado.
+    Solo se comparan los campos de primer nivel; los objetos anidados deben ser idénticos.
+    """
+
+    def __init__(self, heartbeat, deadband=0.0, field_deadbands=None, max_entries=200000):
+        self.heartbeat = heartbeat
+        self.deadband = deadband
+        self.field_deadbands = field_deadbands or {}
+        self.max_entries = max_entries
+        self.use_deadband = deadband > 0 or any(margin > 0 for margin in self.field_deadbands.values())
+
+        self._last = OrderedDict()  # (serial, topic) -> [bytes, contenido parseado o None, instante de reenvío]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._last)
+
+    def _store(self, key, data, value, now):
+        """Guarda el último contenido reenviado desalojando el menos usado si está lleno. Requiere el lock."""
+        self._last[key] = [data, value, now]
+        self._last.move_to_end(key)
+        while len(self._last) > self.max_entries:
+            self._last.popitem(last=False)
+
+    def _within_deadband(self, previous, current):
+        """Indica si dos contenidos solo difieren en campos numéricos dentro de su margen."""
+        if not isinstance(previous, dict) or previous.keys() != current.keys():
+            return False
+        for field, value in current.items():
+            old = previous[field]
+            if value == old:
+                continue
+            margin = self.field_deadbands.get(field, self.deadband)
+            new_number, old_number = as_number(value), as_number(old)
+            if margin <= 0 or new_number is None or old_number is None or abs(new_number - old_number) >= margin:
+                return False
+        return True
+
+    def should_forward(self, serial, topic, content):
+        """
+        Decide si un mensaje debe reenviarse y, en ese caso, lo anota como último reenviado.
+        content es el RawJSON validado del mensaje.
+        """
+        key = (serial, topic)
+        data = content.data
+        now = time.monotonic()
+        with self._lock:
+            entry = self._last.get(key)
+            if entry is None or (self.heartbeat > 0 and now - entry[2] >= self.heartbeat):
+                self._store(key, data, None, now)
+                return True
+            if data == entry[0]:
+                self._last.move_to_end(key)
+                return False
+            if not self.use_deadband:
+                self._store(key, data, None, now)
+                return True
+            previous_data, previous = entry[0], entry[1]
+
+        # Parsear fuera del lock solo cuando el contenido ha cambiado y hay márgenes configurados
+        if previous is None:
+            previous = loads(previous_data)
+        current = content.value()
+        forward = not self._within_deadband(previous, current)
+        with self._lock:
+            if forward:
+                self._store(key, data, current, now)
+            elif key in self._last and self._last[key][0] is previous_data:
+                self._last[key][1] = previous
+        return forward
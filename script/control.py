@@ -0,0 +1,121 @@
+# Importaciones de la biblioteca estándar
+import os
+import json
+import logging
+import threading
+
+# Constantes internas
+STATUS_FD_VARIABLE = 'MQTT_STATUS_FD'  # Variable de entorno con el descriptor del canal de estado
+READY = b'ready\n'
+
+
+def report_ready():
+    """
+    Avisa al gestor de que el cliente está conectado y suscrito, escribiendo en el descriptor
+    heredado del canal de estado. Solo se avisa una vez; sin canal de estado no hace nada.
+    """
+    fd = os.environ.pop(STATUS_FD_VARIABLE, None)
+    if fd is None:
+        return
+    try:
+        os.write(int(fd), READY)
+        os.close(int(fd))
+    except (OSError, ValueError) as e:
+        logging.warning(f"No se pudo avisar al gestor del arranque: {e}")
+
+
+def send_command(stream, command, **fields):
+    """
+    Envía una orden de control a un proceso cliente como una línea JSON por su stdin.
+    Devuelve False si el proceso ya no atiende el canal (tubería cerrada).
+    """
+    try:
+        stream.write(json.dumps(dict(fields, command=command)) + '\n')
+        stream.flush()
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+class ControlStream:
+    """
+    Extremo del gestor del canal de control de un proceso cliente (su stdin).
+    Varios hilos del gestor pueden enviar órdenes al mismo proceso a la vez (temporizador, arranques
+    en paralelo, menú); el lock hace que cada línea se escriba completa antes de la siguiente.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def send(self, command, **fields):
+        """Envía una orden como send_command. Devuelve False si el proceso ya no atiende el canal."""
+        with self._lock:
+            return send_command(self.stream, command, **fields)
+
+    def close(self):
+        with self._lock:
+            self.stream.close()
+
+
+class ControlChannel:
+    """
+    Canal de control del gestor hacia un proceso cliente.
+    Lee de stdin una orden por línea en JSON ({"command": ..., ...}) y la entrega
+    a los manejadores registrados para esa orden, en un hilo en segundo plano.
+    Si el gestor cierra la tubería, el cliente sigue funcionando con la última configuración.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.handlers = {}  # orden -> lista de funciones que reciben el mensaje
+        self._thread = threading.Thread(target=self._run, name='control', daemon=True)
+
+    def on(self, command, handler):
+        """Registra una función que se llama con el mensaje cada vez que llega la orden."""
+        self.handlers.setdefault(command, []).append(handler)
+
+    def start(self):
+        self._thread.start()
+
+    def read(self):
+        """
+        Lee la siguiente orden de forma síncrona, sin entregarla a los manejadores.
+        Se usa al arrancar, antes de iniciar el hilo. Devuelve None si el canal está cerrado.
+        """
+        for line in self.stream:
+            message = self._parse(line)
+            if message is not None:
+                return message
+        return None
+
+    def dispatch(self, message):
+        """Entrega una orden a sus manejadores."""
+        command = message['command']
+        handlers = self.handlers.get(command)
+        if not handlers:
+            logging.warning(f"Orden de control desconocida: {command}")
+            return
+        for handler in handlers:
+            try:
+                handler(message)
+            except Exception as e:
+                logging.error(f"Error al aplicar la orden de control {command}: {e}")
+
+    def _parse(self, line):
+        if not line.strip():
+            return None
+        try:
+            message = json.loads(line)
+            message['command']
+        except (ValueError, KeyError, TypeError):
+            logging.error("Orden de control inválida ignorada")
+            return None
+        return message
+
+    def _run(self):
+        for line in self.stream:
+            message = self._parse(line)
+            if message is not None:
+                self.dispatch(message)
+        logging.warning("Canal de control cerrado; se mantiene la configuración actual")
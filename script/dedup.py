@@ -0,0 +1,172 @@
+# Importaciones de la biblioteca estándar
+import os
+import time
+import struct
+import bisect
+import hashlib
+import logging
+import threading
+from array import array
+
+# Constantes internas
+GENERATIONS = 4                 # Generaciones en las que se divide la ventana (se descarta la más antigua al rotar)
+SNAPSHOT_MAGIC = b'MQTTDDP1'    # Cabecera del fichero de instantánea
+GENERATION_HEADER = struct.Struct('<dQ')  # Inicio de la generación y número de claves
+
+
+def message_key(serial, topic, payload):
+    """Clave de 64 bits de un mensaje: hash de (serial, topic, payload)."""
+    digest = hashlib.blake2b(serial.encode('utf-8'), digest_size=8)
+    digest.update(b'\0')
+    digest.update(topic.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(payload)
+    return int.from_bytes(digest.digest(), 'little')
+
+
+class DedupIndex:
+    """
+    Índice de mensajes vistos en los últimos window segundos, para descartar las reentregas del broker
+    (QoS 1/2 tras reconectar con sesión persistente, mensajes retenidos al volver a suscribirse).
+    La ventana se divide en GENERATIONS generaciones: la actual es un conjunto de claves y, al rotar,
+    se congela en un array ordenado de enteros de 64 bits (8 bytes por mensaje) en el que se busca por
+    bisección; la generación más antigua se descarta entera. Es exacto salvo colisiones del hash de 64 bits.
+    Con max_entries se acota la memoria: si se supera, se descartan generaciones antes de tiempo.
+    El índice se guarda en snapshot_path en cada rotación y al detenerlo, y se recarga al arrancar.
+    """
+
+    def __init__(self, window, max_entries=1000000, snapshot_path=None):
+        if window <= 0:
+            raise ValueError(f"La ventana de deduplicación debe ser positiva: {window}")
+        self.window = window
+        self.max_entries = max_entries
+        self.snapshot_path = snapshot_path
+        self.slice = window / GENERATIONS  # Duración de cada generación
+        self.evicted = 0  # Generaciones descartadas antes de cumplir la ventana por max_entries
+
+        self._current = set()
+        self._current_started = time.time()
+        self._frozen = []  # [(inicio, array ordenado de claves)] de más antigua a más reciente
+        self._frozen_size = 0
+        self._forgotten = {}  # clave -> instante de caducidad; claves olvidadas que siguen en generaciones congeladas
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='dedup-rotation', daemon=True)
+        if snapshot_path:
+            self._load()
+
+    def __len__(self):
+        return len(self._current) + self._frozen_size
+
+    def seen(self, key):
+        """Devuelve True si la clave ya se vio dentro de la ventana. En ambos casos queda registrada."""
+        with self._lock:
+            if key in self._current:
+                return True
+            if key not in self._forgotten:
+                for _, keys in self._frozen:
+                    index = bisect.bisect_left(keys, key)
+                    if index < len(keys) and keys[index] == key:
+                        # Se renueva en la generación actual: un mensaje retenido que se repite en cada
+                        # reconexión sigue reconociéndose aunque se recibiera por primera vez hace más de la ventana
+                        self._current.add(key)
+                        return True
+            else:
+                del self._forgotten[key]
+            self._current.add(key)
+            if len(self._current) >= self.max_entries // GENERATIONS:
+                # Generación llena antes de tiempo: se congela para acotar la memoria
+                self._rotate(time.time())
+            return False
+
+    def forget(self, key):
+        """Olvida una clave registrada (mensaje que no se pudo entregar y que el broker volverá a enviar)."""
+        with self._lock:
+            if key in self._current:
+                self._current.discard(key)
+            else:
+                self._forgotten[key] = time.time() + self.window + self.slice
+
+    # Rotación
+    def _rotate(self, now):
+        """Congela la generación actual y descarta las que han salido de la ventana. Requiere el lock."""
+        if self._current:
+            self._frozen.append((self._current_started, array('Q', sorted(self._current))))
+            self._frozen_size += len(self._current)
+        self._current = set()
+        self._current_started = now
+        while self._frozen and self._frozen[0][0] + self.slice <= now - self.window:
+            self._frozen_size -= len(self._frozen.pop(0)[1])
+        while len(self._frozen) > 1 and self._frozen_size > self.max_entries:
+            self._frozen_size -= len(self._frozen.pop(0)[1])
+            self.evicted += 1
+            logging.warning(f"Índice de deduplicación lleno ({self.max_entries} mensajes): se descarta una generación antes de cumplir la ventana de {self.window:g} s")
+        self._forgotten = {key: expires for key, expires in self._forgotten.items() if expires > now}
+
+    def _run(self):
+        while not self._stopping.wait(self.slice):
+            with self._lock:
+                self._rotate(time.time())
+            self._save()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Detiene la rotación y guarda el índice."""
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            self._rotate(time.time())
+        self._save()
+
+    # Instantánea en disco
+    def _save(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            generations = list(self._frozen)
+        directory = os.path.dirname(self.snapshot_path)
+        temporary = self.snapshot_path + '.tmp'
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temporary, 'wb') as f:
+                f.write(SNAPSHOT_MAGIC)
+                for started, keys in generations:
+                    f.write(GENERATION_HEADER.pack(started, len(keys)))
+                    keys.tofile(f)
+            os.replace(temporary, self.snapshot_path)
+        except OSError as e:
+            logging.error(f"No se pudo guardar el índice de deduplicación en {self.snapshot_path}: {e}")
+
+    def _load(self):
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logging.warning(f"No se pudo leer el índice de deduplicación {self.snapshot_path}: {e}")
+            return
+        if not data.startswith(SNAPSHOT_MAGIC):
+            logging.warning(f"Índice de deduplicación {self.snapshot_path} con formato desconocido; se empieza vacío")
+            return
+        now = time.time()
+        offset = len(SNAPSHOT_MAGIC)
+        try:
+            while offset < len(data):
+                started, count = GENERATION_HEADER.unpack_from(data, offset)
+                offset += GENERATION_HEADER.size
+                keys = array('Q')
+                keys.frombytes(data[offset:offset + count * keys.itemsize])
+                offset += count * keys.itemsize
+                if len(keys) != count:
+                    raise ValueError("fichero truncado")
+                if started + self.slice > now - self.window:
+                    self._frozen.append((started, keys))
+                    self._frozen_size += count
+        except (struct.error, ValueError) as e:
+            logging.warning(f"Índice de deduplicación {self.snapshot_path} dañado ({e}); se conservan {self._frozen_size} mensajes")
+        logging.info(f"Índice de deduplicación cargado: {self._frozen_size} mensajes de los últimos {self.window:g} s")
@@ -0,0 +1,209 @@
+# Importaciones de la biblioteca estándar
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+# Importaciones de terceros
+import requests
+
+
+class DeviceRegistry:
+    """
+    Índice en memoria de dispositivos por serial.
+    Evita consultar la API en cada mensaje: las entradas caducan tras ttl segundos
+    y, al superar max_size, se desaloja la menos usada recientemente (LRU).
+    Las actualizaciones de lastCommunication se acumulan y se escriben como mucho
+    una vez por dispositivo cada flush_interval segundos.
+    """
+
+    def __init__(self, session, api_url, ttl, max_size, flush_interval):
+        self.session = session
+        self.api_url = api_url
+        self.ttl = ttl
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+
+        self._devices = OrderedDict()   # serial -> (id, instante de caducidad)
+        self._pending = {}              # serial -> (id, lastCommunication) pendiente de escribir
+        self._last_write = {}           # serial -> instante de la última escritura (solo dispositivos en caché)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='device-flusher', daemon=True)
+
+    # Ciclo de vida
+    def start(self):
+        """Inicia el hilo de escritura diferida."""
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de escritura diferida y escribe los cambios pendientes."""
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush(force=True)
+
+    def warm_up(self, server_id):
+        """
+        Carga en bloque los dispositivos conocidos del servidor con una única petición.
+        Devuelve el número de dispositivos cacheados (como mucho max_size).
+        """
+        try:
+            response = self.session.get(f"{self.api_url}/devices", params={'serverId': server_id})
+            if response.status_code != 200:
+                logging.error(f"Error al precargar los dispositivos del servidor {server_id}: {response.status_code}")
+                return 0
+            devices = response.json()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Excepción al precargar los dispositivos del servidor {server_id}: {e}")
+            return 0
+
+        cached = devices[-self.max_size:]
+        with self._lock:
+            for device in cached:
+                self._store(device['serial'], device['id'])
+        logging.info(f"Caché de dispositivos precargada con {len(cached)} de {len(devices)} dispositivos")
+        return len(cached)
+
+    # Caché
+    def _store(self, serial, device_id):
+        """Guarda una entrada en la caché desalojando la menos usada si está llena. Requiere el lock."""
+        self._devices[serial] = (device_id, time.monotonic() + self.ttl)
+        self._devices.move_to_end(serial)
+        while len(self._devices) > self.max_size:
+            evicted, _ = self._devices.popitem(last=False)
+            self._last_write.pop(evicted, None)
+
+    def _lookup(self, serial):
+        """Devuelve el ID cacheado de un dispositivo o None si no existe o ha caducado."""
+        with self._lock:
+            entry = self._devices.get(serial)
+            if entry is None:
+                return None
+            device_id, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._devices[serial]
+                self._last_write.pop(serial, None)
+                return None
+            self._devices.move_to_end(serial)
+            return device_id
+
+    def __len__(self):
+        return len(self._devices)
+
+    def is_cached(self, serial):
+        """Indica si un dispositivo está en caché, es decir, si registrarlo no requiere peticiones a la API."""
+        return self._lookup(serial) is not None
+
+    def invalidate(self, serial):
+        """Elimina un dispositivo de la caché."""
+        with self._lock:
+            self._devices.pop(serial, None)
+            self._last_write.pop(serial, None)
+
+    # Funciones de API
+    def _fetch(self, serial):
+        """Consulta un dispositivo por serial en la API. Devuelve su ID o None si no existe."""
+        response = self.session.get(f"{self.api_url}/devices/serial/{serial}")
+        if response.status_code == 200 and response.json():
+            return response.json()['id']
+        return None
+
+    def _create(self, serial, apikey, last_communication, server_id):
+        """Crea un dispositivo en la API. Devuelve su ID o None si no se pudo crear."""
+        new_device = {
+            "serial": serial,
+            "apikey": apikey,
+            "lastCommunication": last_communication,
+            "serverId": server_id
+        }
+        response = self.session.post(f"{self.api_url}/devices", json=new_device)
+        if response.status_code == 201:
+            logging.info(f"Dispositivo {serial} guardado en la base de datos")
+            return response.json()['id']
+        if response.status_code == 409:
+            # Otro proceso lo ha creado entre la consulta y la creación
+            return self._fetch(serial)
+        logging.error(f"Error al guardar el dispositivo {serial} en la base de datos: {response.status_code} - {response.text}")
+        return None
+
+    def ensure(self, serial, apikey, last_communication, server_id):
+        """
+        Devuelve el ID de un dispositivo, creándolo si no existe (con last_communication).
+        Devuelve (ID, creado); el ID es None si no se pudo consultar ni crear.
+        """
+        device_id = self._lookup(serial)
+        if device_id is not None:
+            return device_id, False
+        try:
+            device_id = self._fetch(serial)
+            created = False
+            if device_id is None:
+                device_id = self._create(serial, apikey, last_communication, server_id)
+                created = True
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Excepción al actualizar/crear dispositivo {serial}: {e}")
+            return None, False
+        if device_id is None:
+            return None, False
+        with self._lock:
+            self._store(serial, device_id)
+            if created:
+                self._last_write[serial] = time.monotonic()
+        return device_id, created
+
+    def update_or_create(self, serial, apikey, last_communication, server_id):
+        """
+        Registra una comunicación de un dispositivo.
+        Los dispositivos nuevos se crean al momento para que sus mensajes puedan guardarse;
+        para los existentes solo se anota lastCommunication, que se escribe de forma diferida.
+        """
+        device_id, created = self.ensure(serial, apikey, last_communication, server_id)
+        if device_id is None or created:
+            return
+
+        with self._lock:
+            self._pending[serial] = (device_id, last_communication)
+
+    def flush(self, force=False):
+        """
+        Escribe los lastCommunication pendientes cuya última escritura tiene más de flush_interval segundos.
+        Con force=True se escriben todos.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = {
+                serial: pending
+                for serial, pending in self._pending.items()
+                if force or serial not in self._last_write or now - self._last_write[serial] >= self.flush_interval
+            }
+            for serial in due:
+                del self._pending[serial]
+                # Solo se recuerda para los dispositivos en caché, que acotan su tamaño
+                if serial in self._devices:
+                    self._last_write[serial] = now
+
+        for serial, (device_id, last_communication) in due.items():
+            try:
+                response = self.session.patch(
+                    f"{self.api_url}/devices/{device_id}",
+                    json={"lastCommunication": last_communication}
+                )
+                if response.status_code == 200:
+                    logging.debug(f"Dispositivo {serial} actualizado en la base de datos")
+                elif response.status_code == 404:
+                    self.invalidate(serial)
+                    logging.warning(f"El dispositivo {serial} ya no existe en la base de datos")
+                else:
+                    logging.error(f"Error al actualizar el dispositivo {serial} en la base de datos: {response.status_code} - {response.text}")
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Excepción al actualizar dispositivo {serial}: {e}")
+        return len(due)
+
+    def _run(self):
+        """Bucle del hilo de escritura diferida."""
+        while not self._stopping.wait(min(self.flush_interval, 1.0)):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error inesperado al actualizar dispositivos: {e}")
@@ -0,0 +1,105 @@
+# Importaciones de la biblioteca estándar
+import logging
+import threading
+
+# Constantes internas
+RESUME_RATIO = 0.5  # Fracción de la ventana por debajo de la cual se reanuda la lectura en modo asyncio
+
+
+class Delivery:
+    """
+    Mensaje recibido del broker que ocupa un hueco de la ventana hasta que se entrega.
+    done() se llama una sola vez, al entregarlo a la API o al spool (o al descartarlo a propósito).
+    key es la clave del mensaje en el índice de deduplicación, si se ha registrado en él.
+    """
+    __slots__ = ('window', 'client', 'mid', 'qos', 'key')
+
+    def __init__(self, window, client, mid, qos):
+        self.window = window
+        self.client = client
+        self.mid = mid
+        self.qos = qos
+        self.key = None
+
+    def done(self, durable=True):
+        """
+        Libera el hueco del mensaje. Con confirmación manual, solo si se entregó de forma duradera
+        se confirma al broker; si no, queda sin confirmar y el broker lo reenvía al reconectar.
+        """
+        if self.window.manual_ack and self.qos:
+            if durable:
+                self.client.ack(self.mid, self.qos)
+            else:
+                self.window.unacked += 1
+        if not durable and self.key is not None and self.window.on_undelivered:
+            # La reentrega del broker no debe tomarse por un duplicado
+            self.window.on_undelivered(self.key)
+        self.window.release()
+
+
+class InflightWindow:
+    """
+    Ventana de mensajes recibidos del broker que aún no se han entregado.
+    Al llenarse se deja de leer del socket para que el broker retenga los mensajes (backpressure):
+    en modo síncrono on_message espera a que haya hueco, ya que mientras tanto paho no lee más;
+    en modo asyncio se avisa a on_pause para retirar el socket del bucle y a on_resume cuando la ventana
+    baja de la mitad. Ninguna pausa dura más de max_pause segundos, para no perder la conexión por keepalive.
+    Con manual_ack, los mensajes QoS 1/2 se confirman al broker solo al entregarse.
+    """
+
+    def __init__(self, limit, manual_ack=False, max_pause=30):
+        self.limit = limit          # Mensajes en curso como máximo (0 sin límite)
+        self.manual_ack = manual_ack
+        self.max_pause = max_pause
+        self.inflight = 0
+        self.pauses = 0             # Veces que se ha dejado de leer del socket
+        self.unacked = 0            # Mensajes no confirmados por no poder entregarse
+        self.paused = False
+        self.on_pause = None
+        self.on_resume = None
+        self.on_undelivered = None  # Recibe la clave de deduplicación de los mensajes no entregados
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return self.inflight
+
+    def track(self, client, msg, block=True):
+        """
+        Ocupa un hueco para un mensaje recibido y devuelve su Delivery.
+        Con block, espera (sin leer del socket) mientras la ventana está llena.
+        """
+        pause = False
+        with self._condition:
+            if self.limit and self.inflight >= self.limit:
+                if block:
+                    self.pauses += 1
+                    if not self._condition.wait_for(lambda: self.inflight < self.limit, self.max_pause):
+                        logging.warning(f"Ventana de {self.limit} mensajes llena durante {self.max_pause} s; se sigue leyendo para mantener la conexión")
+            self.inflight += 1
+            if not block and self.limit and self.inflight >= self.limit and not self.paused:
+                self.paused = pause = True
+                self.pauses += 1
+        if pause and self.on_pause:
+            self.on_pause()
+        return Delivery(self, client, msg.mid, msg.qos)
+
+    def release(self, count=1):
+        resume = False
+        with self._condition:
+            self.inflight -= count
+            self._condition.notify_all()
+            if self.paused and self.inflight <= self.limit * RESUME_RATIO:
+                self.paused = False
+                resume = True
+        if resume and self.on_resume:
+            self.on_resume()
+
+    def force_resume(self):
+        """Reanuda la lectura aunque la ventana siga llena (pausa demasiado larga)."""
+        with self._condition:
+            if not self.paused:
+                return
+            self.paused = False
+        logging.warning(f"Ventana de {self.limit} mensajes llena durante {self.max_pause} s; se reanuda la lectura para mantener la conexión")
+        if self.on_resume:
+            self.on_resume()
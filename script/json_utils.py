@@ -0,0 +1,88 @@
+# Importaciones de la biblioteca estándar
+import json
+
+# Importaciones de terceros
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: sin ella se usa el módulo json estándar
+    orjson = None
+
+
+if orjson is not None:
+    def loads(data):
+        """Parsea JSON desde bytes o str."""
+        return orjson.loads(data)
+
+    def dumps(value):
+        """Serializa un valor a JSON en bytes (UTF-8)."""
+        return orjson.dumps(value)
+else:
+    def _reject_constant(name):
+        # json.loads acepta NaN e Infinity, que la API rechazaría con un 400 para todo el lote
+        raise ValueError(f"valor no permitido en JSON: {name}")
+
+    def loads(data):
+        """Parsea JSON desde bytes o str."""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            # Exigir UTF-8: json.loads aceptaría también UTF-16/32, que no se pueden insertar tal cual
+            data = bytes(data).decode('utf-8')
+        return json.loads(data, parse_constant=_reject_constant)
+
+    def dumps(value):
+        """Serializa un valor a JSON en bytes (UTF-8)."""
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+
+
+class RawJSON:
+    """
+    Documento JSON ya validado que se conserva en sus bytes originales.
+    Al serializar el mensaje, los bytes se insertan directamente en el cuerpo
+    de la petición en lugar de volver a codificar el objeto.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def value(self):
+        """Devuelve el documento parseado (solo para las etapas que necesitan su contenido)."""
+        return loads(self.data)
+
+
+def validate_json_object(payload):
+    """
+    Valida que un payload sea un objeto JSON en UTF-8.
+    Devuelve un RawJSON que referencia los bytes originales o lanza ValueError.
+    """
+    if not isinstance(loads(payload), dict):
+        raise ValueError("el contenido debe ser un objeto JSON")
+    return RawJSON(payload)
+
+
+def encode_value(value):
+    """Serializa un valor a bytes, insertando tal cual los RawJSON."""
+    if isinstance(value, RawJSON):
+        return bytes(value.data)
+    return dumps(value)
+
+
+def encode_message(message):
+    """Serializa un mensaje ({serial, timestamp, topic, content}) sin re-codificar su contenido."""
+    return b''.join((
+        b'{"serial":', dumps(message['serial']),
+        b',"timestamp":', dumps(message['timestamp']),
+        b',"topic":', dumps(message['topic']),
+        b',"content":', encode_value(message['content']),
+        b'}'
+    ))
+
+
+def encode_messages(messages):
+    """Serializa una lista de mensajes como array JSON."""
+    return b'[' + b','.join(encode_message(message) for message in messages) + b']'
+
+
+def encode_item(item):
+    """Serializa un elemento de la cola (mensaje, apikey, server_id)."""
+    message, apikey, server_id = item
+    return b''.join((b'[', encode_message(message), b',', dumps(apikey), b',', dumps(server_id), b']'))
@@ -0,0 +1,247 @@
+# Importaciones de la biblioteca estándar
+import os
+import gzip
+import time
+import shutil
+import threading
+from datetime import datetime, date, timedelta
+
+# Constantes internas
+LOG_PREFIX = 'mqtt_client_'
+LOG_DATE_FORMAT = '%Y%m%d'  # Formato de fecha para archivos de log
+
+
+def parse_log_name(filename):
+    """
+    Descompone el nombre de un segmento de log: mqtt_client_<nombre>_<fecha>[.<n>].log[.gz].
+    Devuelve (nombre, fecha, n) con n = 0 para el segmento final del día, o None si no es un log de cliente.
+    """
+    if not filename.startswith(LOG_PREFIX):
+        return None
+    name, separator, rest = filename[len(LOG_PREFIX):].rpartition('_')
+    parts = rest.split('.')
+    if not separator or 'log' not in parts:
+        return None
+    try:
+        day = datetime.strptime(parts[0], LOG_DATE_FORMAT).date()
+    except ValueError:
+        return None
+    number = int(parts[1]) if parts[1].isdigit() else 0
+    return name, day, number
+
+
+def next_midnight():
+    """Instante (time.time) de la próxima medianoche local."""
+    tomorrow = date.today() + timedelta(days=1)
+    return time.mktime(tomorrow.timetuple())
+
+
+class LogSegment:
+    """Un fichero de log de un cliente: el activo del día o uno ya rotado (comprimido o no)."""
+
+    def __init__(self, path, day, number=0):
+        self.path = path
+        self.day = day
+        self.number = number  # Orden de las rotaciones por tamaño dentro del día (0 = segmento final)
+
+
+class ClientLog:
+    """
+    Log de un cliente escrito por el gestor a partir de la salida del proceso.
+    Escribe en el segmento del día y rota al cambiar de día o al superar max_bytes.
+    Lo comparten los procesos sucesivos de un mismo nombre (reinicios, procesos que aún vacían su salida).
+    """
+
+    def __init__(self, pipeline, name):
+        self.pipeline = pipeline
+        self.name = name
+        self.readers = 0
+        self.file = None
+        self.segment = None
+        self.size = 0
+        self.rotate_at = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Abre (o continúa) el segmento activo del día. Requiere el lock."""
+        today = date.today()
+        path = os.path.join(self.pipeline.directory, f"{LOG_PREFIX}{self.name}_{today.strftime(LOG_DATE_FORMAT)}.log")
+        self.file = open(path, 'ab')
+        self.size = self.file.tell()
+        self.rotate_at = next_midnight()
+        self.segment = self.pipeline._activate(self.name, path, today)
+
+    def write(self, data):
+        """Escribe un bloque de salida del proceso (abriendo el segmento si hace falta), rotando antes si toca."""
+        with self._lock:
+            if self.file is None:
+                self._open()
+            elif time.time() >= self.rotate_at:
+                self._rotate()
+            self.file.write(data)
+            self.file.flush()
+            self.size += len(data)
+            if self.size >= self.pipeline.max_bytes:
+                self._rotate(by_size=True)
+
+    def roll_over(self):
+        """Rota el log si ha cambiado el día aunque el proceso no haya escrito nada."""
+        with self._lock:
+            if self.file is not None and time.time() >= self.rotate_at:
+                self._rotate()
+                self._open()
+
+    def _rotate(self, by_size=False):
+        """Cierra el segmento activo y lo entrega para comprimir. Requiere el lock."""
+        self.file.close()
+        self.file = None
+        segment = self.segment
+        if by_size:
+            # El segmento completo pasa a numerarse y el del día vuelve a empezar vacío
+            number = self.pipeline._next_number(self.name, segment.day)
+            rotated = segment.path[:-len('.log')] + f".{number}.log"
+            os.replace(segment.path, rotated)
+            segment.path = rotated
+            segment.number = number
+        self.pipeline._closed(segment)
+        if not by_size:
+            self._open()
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class LogPipeline:
+    """
+    Logs de los procesos cliente gestionados por el gestor.
+    Lee la salida de cada proceso por una tubería y la escribe en ficheros que rotan por día y por tamaño,
+    comprimiendo con gzip en segundo plano los segmentos cerrados. Guarda en memoria un índice de los
+    segmentos de cada log, de modo que consultar el último log o aplicar la retención no recorre el directorio.
+    """
+
+    def __init__(self, directory, max_bytes, compress=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.index = {}  # nombre -> segmentos de más antiguo a más reciente
+        self.logs = {}   # nombre -> ClientLog con procesos escribiendo
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Construye el índice con los segmentos existentes (una sola vez, al arrancar)."""
+        uncompressed = []
+        for filename in os.listdir(self.directory):
+            parsed = parse_log_name(filename)
+            if parsed is None:
+                continue
+            name, day, number = parsed
+            segment = LogSegment(os.path.join(self.directory, filename), day, number)
+            self.index.setdefault(name, []).append(segment)
+            if not filename.endswith('.gz') and day < date.today():
+                uncompressed.append(segment)
+        for segments in self.index.values():
+            segments.sort(key=lambda s: (s.day, s.number or float('inf')))
+        # Comprimir los segmentos de días anteriores que quedaron sin comprimir
+        for segment in uncompressed:
+            self._closed(segment)
+
+    # Índice
+    def _activate(self, name, path, day):
+        """Registra (si no lo estaba) el segmento activo de un log y lo devuelve."""
+        with self._lock:
+            segments = self.index.setdefault(name, [])
+            if segments and segments[-1].path == path:
+                return segments[-1]
+            segment = LogSegment(path, day)
+            segments.append(segment)
+            return segment
+
+    def _next_number(self, name, day):
+        """Siguiente número de rotación por tamaño del día."""
+        with self._lock:
+            return 1 + max((s.number for s in self.index.get(name, []) if s.day == day), default=0)
+
+    def _closed(self, segment):
+        """Comprime en segundo plano un segmento que ya no se escribe."""
+        if self.compress and not segment.path.endswith('.gz'):
+            threading.Thread(target=self._compress, args=(segment,), name='log-compress', daemon=True).start()
+
+    def _compress(self, segment):
+        source = segment.path
+        target = source + '.gz'
+        try:
+            with open(source, 'rb') as f_in, gzip.open(target, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            with self._lock:
+                segment.path = target
+            os.remove(source)
+        except OSError as e:
+            print(f"Error al comprimir el log {source}: {e}")
+
+    def current(self, name):
+        """Ruta del segmento más reciente de un log, o None si no existe."""
+        segments = self.index.get(name)
+        return segments[-1].path if segments else None
+
+    # Procesos
+    def attach(self, name, stream, header=None):
+        """
+        Escribe en el log indicado la salida de un proceso (tubería binaria) desde un hilo en segundo plano.
+        Varios procesos pueden escribir a la vez en el mismo log. Devuelve la ruta del segmento activo.
+        """
+        with self._lock:
+            log = self.logs.get(name)
+            if log is None:
+                log = self.logs[name] = ClientLog(self, name)
+            log.readers += 1
+        log.write(header.encode('utf-8') if header else b'')
+        threading.Thread(target=self._pump, args=(log, stream), name=f"log-{name}", daemon=True).start()
+        return log.segment.path
+
+    def _pump(self, log, stream):
+        """Copia la salida del proceso al log hasta que el proceso cierra la tubería."""
+        try:
+            for line in iter(stream.readline, b''):
+                try:
+                    log.write(line)
+                except OSError as e:
+                    # Seguir leyendo aunque no se pueda escribir, para no bloquear al proceso
+                    print(f"Error al escribir el log {log.name}: {e}")
+        finally:
+            stream.close()
+            with self._lock:
+                log.readers -= 1
+                finished = log.readers == 0
+                if finished:
+                    del self.logs[log.name]
+            # Fuera del lock del índice: el log lo toma a su vez al rotar
+            if finished:
+                log.close()
+
+    # Mantenimiento
+    def roll_over(self):
+        """Rota los logs abiertos que siguen en el segmento de un día anterior."""
+        with self._lock:
+            logs = list(self.logs.values())
+        for log in logs:
+            log.roll_over()
+
+    def cleanup(self, cutoff):
+        """Elimina los segmentos anteriores a la fecha cutoff, sin tocar los que se están escribiendo."""
+        with self._lock:
+            active = {log.segment.path for log in self.logs.values() if log.segment}
+            for name in list(self.index):
+                segments = self.index[name]
+                while segments and segments[0].day < cutoff and segments[0].path not in active:
+                    segment = segments.pop(0)
+                    try:
+                        os.remove(segment.path)
+                    except OSError:
+                        pass
+                if not segments:
+                    del self.index[name]
@@ -0,0 +1,209 @@
+# Importaciones de la biblioteca estándar
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Constantes internas
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+TEXT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+LOG_FORMATS = ('json', 'text')
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON con los campos extra que se le pasen."""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        if record.name != 'root':
+            entry['logger'] = record.name
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato de texto clásico, indicando cuántos registros similares se suprimieron."""
+
+    def format(self, record):
+        text = super().format(record)
+        if getattr(record, 'suppressed', 0):
+            text += f" ({record.suppressed} registros similares suprimidos)"
+        return text
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limita cuántos registros emite cada punto del código (fichero y línea) por ventana de tiempo.
+    Los que superan el límite se descartan y el primer registro de la siguiente ventana
+    indica cuántos se suprimieron, de modo que un error repetido en bucle no inunda el log.
+    """
+
+    def __init__(self, limit, interval):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self._windows = {}  # (fichero, línea) -> [inicio de la ventana, emitidos, suprimidos]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Entrega los registros a una cola acotada sin bloquear nunca al hilo que registra.
+    La escritura a disco la hace el hilo del QueueListener; si la cola se llena, el registro se descarta.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolver el mensaje y la traza en el hilo de origen, sin copiar el registro
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener que, al parar, espera a tener hueco en la cola en lugar de fallar si está llena."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class MessageSampler:
+    """Devuelve True una de cada every llamadas, para registrar solo una muestra de los mensajes."""
+
+    def __init__(self, every):
+        self.every = every
+        self._count = 0
+
+    def __call__(self):
+        if self.every <= 0:
+            return False
+        self._count += 1
+        return (self._count - 1) % self.every == 0
+
+
+class SummaryReporter:
+    """Registra cada interval segundos un resumen agregado de los contadores de métricas."""
+
+    def __init__(self, metrics, interval):
+        self.metrics = metrics
+        self.interval = interval
+        self._previous = {}
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log-summary', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _totals(self):
+        return {name: sum(value for _, value in counter.samples()) for name, counter in self.metrics.counters.items()}
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            totals = self._totals()
+            delta = {name: value - self._previous.get(name, 0) for name, value in totals.items()}
+            self._previous = totals
+            received = delta.get('mqtt_client_messages_received_total', 0)
+            extra = {
+                'summary': True,
+                'interval': self.interval,
+                'received': received,
+                'stored': delta.get('mqtt_client_messages_stored_total', 0),
+                'invalid': delta.get('mqtt_client_messages_invalid_total', 0),
+                'suppressed': delta.get('mqtt_client_messages_suppressed_total', 0),
+                'duplicates': delta.get('mqtt_client_messages_duplicate_total', 0),
+                'dropped': delta.get('mqtt_client_messages_dropped_total', 0),
+                'batch_errors': delta.get('mqtt_client_batch_errors_total', 0)
+            }
+            queue_depth = self.metrics.gauges.get('mqtt_client_queue_depth')
+            if queue_depth:
+                extra['queue_depth'] = queue_depth[1]()
+            logging.info(
+                f"Resumen de los últimos {self.interval:g} s: {received} mensajes recibidos "
+                f"({received / self.interval:.1f}/s), {extra['stored']} guardados, "
+                f"{extra['suppressed']} sin cambios, {extra['duplicates']} duplicados, {extra['invalid']} inválidos, "
+                f"{extra['dropped']} descartados",
+                extra=extra
+            )
+
+
+def setup_logging(level, log_format='json', queue_size=10000, rate_limit=20, rate_interval=60):
+    """
+    Configura el logging del proceso: los registros pasan por una cola acotada a un hilo
+    que los escribe en stdout, con límite de frecuencia por punto del código.
+    Devuelve el QueueHandler, que lleva la cuenta de los registros descartados.
+    """
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Formato de log inválido: {log_format} (valores admitidos: {', '.join(LOG_FORMATS)})")
+
+    # Handler de salida con UTF-8, atendido por el hilo del listener
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.stream.reconfigure(encoding='utf-8')
+    if log_format == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(TextFormatter(TEXT_FORMAT, datefmt=TEXT_DATE_FORMAT))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    if rate_limit > 0:
+        queue_handler.addFilter(RateLimitFilter(rate_limit, rate_interval))
+
+    listener = DrainingQueueListener(queue_handler.queue, stream_handler)
+    listener.start()
+    # Al salir se escriben los registros que queden en la cola
+    atexit.register(listener.stop)
+
+    # Configurar logger raíz
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, level))
+    root_logger.addHandler(queue_handler)
+    return queue_handler
@@ -0,0 +1,311 @@
+# Importaciones de la biblioteca estándar
+import os
+import json
+import time
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Constantes internas
+SUB_BUCKET_BITS = 3                     # 8 sub-intervalos por potencia de 2 (error relativo < 12.5%)
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE_BITS = 32                     # Latencias de hasta 2^32 µs (~71 minutos); las mayores se acotan
+BUCKET_COUNT = 2 * SUB_BUCKETS + (MAX_VALUE_BITS - SUB_BUCKET_BITS - 1) * SUB_BUCKETS
+EXPORT_BOUNDARIES = range(4, 27)        # Límites exportados a Prometheus: 2^4 µs (16 µs) a 2^26 µs (~67 s)
+PERCENTILES = (50, 90, 99, 99.9)
+MAX_SERIES = 1000                       # Series por contador; las siguientes se agrupan en 'other'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _bucket_index(value):
+    """Índice del intervalo de un valor en microsegundos (escala log-lineal, estilo HDR)."""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return 2 * SUB_BUCKETS + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_upper_bound(index):
+    """Límite superior (exclusivo) en microsegundos del intervalo de un índice."""
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    shift, offset = divmod(index - 2 * SUB_BUCKETS, SUB_BUCKETS)
+    return (SUB_BUCKETS + offset + 1) << (shift + 1)
+
+
+def _format_labels(labels):
+    """Formatea las etiquetas de una serie en la sintaxis de Prometheus."""
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con intervalos log-lineales (estilo HDR).
+    Cada potencia de 2 se divide en 8 intervalos iguales, de modo que registrar
+    un valor es un cálculo de índice y un incremento, con precisión relativa constante
+    desde microsegundos hasta minutos.
+    """
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Registra una latencia en segundos."""
+        index = _bucket_index(max(0, int(seconds * 1_000_000)))
+        with self._lock:
+            self.counts[min(index, BUCKET_COUNT - 1)] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, percent):
+        """Devuelve el percentil indicado en segundos (límite superior de su intervalo)."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        target = total * percent / 100
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if count and seen >= target:
+                return min(_bucket_upper_bound(index) / 1_000_000, self.max)
+        return self.max
+
+    def cumulative(self):
+        """Devuelve [(límite en segundos, recuento acumulado)] en los límites exportados, más el total."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        result = []
+        seen = 0
+        index = 0
+        for bits in EXPORT_BOUNDARIES:
+            boundary = 1 << bits
+            while index < BUCKET_COUNT and _bucket_upper_bound(index) <= boundary:
+                seen += counts[index]
+                index += 1
+            result.append((boundary / 1_000_000, seen))
+        return result, total
+
+    def summary(self):
+        """Resumen del histograma para el fichero de instantáneas."""
+        summary = {'count': self.count, 'sum': round(self.sum, 6), 'max': round(self.max, 6)}
+        for percent in PERCENTILES:
+            summary[f'p{percent:g}'] = round(self.percentile(percent), 6)
+        return summary
+
+
+class Counter:
+    """Contador monótono con etiquetas. El número de series está acotado para no crecer sin límite."""
+
+    def __init__(self, name, help_text, max_series=MAX_SERIES):
+        self.name = name
+        self.help_text = help_text
+        self.max_series = max_series
+        self.series = {}    # tupla de (etiqueta, valor) -> recuento
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Incrementa la serie con las etiquetas indicadas."""
+        key = tuple(labels.items())
+        with self._lock:
+            if key not in self.series and len(self.series) >= self.max_series:
+                key = tuple((label, 'other') for label in labels)
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return list(self.series.items())
+
+
+class Metrics:
+    """
+    Registro de métricas del cliente MQTT: histogramas de latencia por etapa,
+    contadores y medidores (gauges) calculados en el momento de consultarlos.
+    Se exponen en formato Prometheus por HTTP y/o como instantánea JSON periódica en un fichero.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.stages = {}    # etapa -> LatencyHistogram
+        self.counters = {}  # nombre -> Counter
+        self.gauges = {}    # nombre -> (ayuda, función)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._server = None
+        self._snapshot_path = None
+        self._snapshot_thread = None
+
+        # Contadores del procesamiento de mensajes
+        self.received = self.counter('mqtt_client_messages_received_total', 'Mensajes MQTT recibidos por forma de topic')
+        self.invalid = self.counter('mqtt_client_messages_invalid_total', 'Mensajes descartados por topic o JSON inválido')
+        self.suppressed = self.counter('mqtt_client_messages_suppressed_total', 'Mensajes no reenviados por no haber cambiado')
+        self.duplicates = self.counter('mqtt_client_messages_duplicate_total', 'Mensajes descartados por ser reentregas ya recibidas')
+        self.dropped = self.counter('mqtt_client_messages_dropped_total', 'Mensajes descartados por tener la cola llena')
+        self.aggregated = self.counter('mqtt_client_messages_aggregated_total', 'Lecturas absorbidas por la agregación por ventanas')
+        self.stored = self.counter('mqtt_client_messages_stored_total', 'Mensajes guardados o rechazados por la API')
+        self.batch_errors = self.counter('mqtt_client_batch_errors_total', 'Lotes que la API no pudo guardar')
+        self.connects = self.counter('mqtt_client_connections_total', 'Conexiones establecidas con el broker')
+
+    # Registro
+    def observe(self, stage, seconds):
+        """Registra la latencia de una etapa del procesamiento."""
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(stage, LatencyHistogram())
+        histogram.record(seconds)
+
+    def counter(self, name, help_text):
+        """Devuelve el contador con ese nombre, creándolo si no existe."""
+        with self._lock:
+            if name not in self.counters:
+                self.counters[name] = Counter(name, help_text)
+            return self.counters[name]
+
+    def gauge(self, name, help_text, func):
+        """
+        Registra un medidor. func se evalúa al consultar las métricas y devuelve un número
+        o un diccionario {tupla de (etiqueta, valor): número}.
+        """
+        self.gauges[name] = (help_text, func)
+
+    def gauge_values(self, name):
+        """Devuelve las muestras actuales de un medidor como lista de (etiquetas, valor)."""
+        if name not in self.gauges:
+            return []
+        return self._gauge_samples(self.gauges[name][1])
+
+    def _gauge_samples(self, func):
+        try:
+            value = func()
+        except Exception as e:
+            logging.debug(f"Error al calcular un medidor: {e}")
+            return []
+        if isinstance(value, dict):
+            return list(value.items())
+        return [((), value)]
+
+    # Exportación
+    def render_prometheus(self):
+        """Devuelve todas las métricas en el formato de texto de Prometheus."""
+        lines = [
+            '# HELP mqtt_client_stage_latency_seconds Latencia de cada etapa del procesamiento de mensajes',
+            '# TYPE mqtt_client_stage_latency_seconds histogram'
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            buckets, total = histogram.cumulative()
+            for boundary, count in buckets:
+                lines.append(f'mqtt_client_stage_latency_seconds_bucket{{stage="{stage}",le="{boundary:g}"}} {count}')
+            lines.append(f'mqtt_client_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'mqtt_client_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'mqtt_client_stage_latency_seconds_count{{stage="{stage}"}} {total}')
+
+        for name, counter in sorted(self.counters.items()):
+            lines.append(f'# HELP {name} {counter.help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in counter.samples():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        for name, (help_text, func) in sorted(self.gauges.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in self._gauge_samples(func):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        lines.append('# HELP mqtt_client_uptime_seconds Segundos desde el arranque del cliente')
+        lines.append('# TYPE mqtt_client_uptime_seconds gauge')
+        lines.append(f'mqtt_client_uptime_seconds {time.time() - self.started_at:.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Devuelve todas las métricas como diccionario serializable a JSON."""
+        return {
+            'timestamp': time.time(),
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.started_at, 1),
+            'stages': {stage: histogram.summary() for stage, histogram in sorted(self.stages.items())},
+            'counters': {
+                name: [dict(labels, value=value) for labels, value in counter.samples()]
+                for name, counter in sorted(self.counters.items())
+            },
+            'gauges': {
+                name: [dict(labels, value=value) for labels, value in self._gauge_samples(func)]
+                for name, (_, func) in sorted(self.gauges.items())
+            }
+        }
+
+    def write_snapshot(self):
+        """Escribe la instantánea en el fichero de forma atómica (fichero temporal + rename)."""
+        tmp_path = self._snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self._snapshot_path)
+        except OSError as e:
+            logging.error(f"Error al escribir las métricas en {self._snapshot_path}: {e}")
+
+    # Ciclo de vida
+    def start_http_server(self, host, port):
+        """Sirve las métricas en http://host:port/metrics desde un hilo en segundo plano."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logging.error(f"No se pudo iniciar el endpoint de métricas en {host}:{port}: {e}")
+            return False
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        logging.info(f"Métricas disponibles en http://{host}:{port}/metrics")
+        return True
+
+    def start_snapshot_file(self, path, interval):
+        """Escribe una instantánea JSON de las métricas cada interval segundos."""
+        self._snapshot_path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        def run():
+            while not self._stopping.wait(interval):
+                self.write_snapshot()
+
+        self._snapshot_thread = threading.Thread(target=run, name='metrics-snapshot', daemon=True)
+        self._snapshot_thread.start()
+
+    def stop(self):
+        """Detiene el endpoint HTTP y escribe la última instantánea."""
+        self._stopping.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._snapshot_thread:
+            self._snapshot_thread.join()
+            self.write_snapshot()
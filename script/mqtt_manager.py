@@ -1,23 +1,60 @@
 # Importaciones de la biblioteca estándar
 import os
 import sys
+import json
+import math
+import time
+import random
+import select
 import signal
 import argparse
+import functools
 import threading
 import subprocess
-from typing import Dict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 from datetime import datetime, timedelta
 
 # Importaciones de terceros
 import psutil
 import requests
 
+# Importaciones locales
+from control import ControlStream, STATUS_FD_VARIABLE, READY
+from log_pipeline import LogPipeline
+from telemetry import TelemetryBoard, TELEMETRY_VARIABLE, SLOTS_VARIABLE, default_path, format_slots
+from profiling import Profiler
+
 # Variables de entorno y valores por defecto
 ENV_VARS = {
     'API_URL': 'http://localhost:3000',
     'LOGS_DIR': 'logs',
     'REFRESH_INTERVAL': '60',  # Segundos de refresco automático
     'LOG_RETENTION_DAYS': '7',  # Días a mantener logs
+    'LOG_MAX_BYTES': '104857600',  # Tamaño a partir del cual se rota el log de un cliente (bytes)
+    'LOG_COMPRESS': 'true',     # Comprimir con gzip los segmentos de log rotados
+    'TELEMETRY_FILE': '',       # Tablero de telemetría compartido con los clientes (vacío: /dev/shm o el directorio temporal)
+    'TELEMETRY_SLOTS': '4096',  # Casillas del tablero (una por servidor y proceso)
+    'SERVERS_PER_WORKER': '1',  # Servidores atendidos por cada proceso cliente
+    'MIN_REPLICAS': '1',        # Réplicas mínimas por servidor
+    'MAX_REPLICAS': '1',        # Réplicas máximas por servidor; con más de 1 se usan suscripciones compartidas
+    'REPLICA_TARGET_RATE': '2000',   # Mensajes/s que debe atender cada réplica antes de añadir otra
+    'REPLICA_MAX_BACKLOG': '5000',   # Mensajes pendientes en una réplica que fuerzan a añadir otra
+    'SCALE_COOLDOWN': '120',    # Segundos mínimos entre cambios en el número de réplicas de un servidor
+    'METRICS_DIR': 'client_metrics',  # Directorio de las instantáneas de métricas de los clientes
+    'RESTART_PARALLELISM': '8', # Procesos que se arrancan o reinician a la vez
+    'RESTART_JITTER': '2',      # Retardo aleatorio máximo antes de cada arranque o reinicio (segundos)
+    'READY_TIMEOUT': '30',      # Tiempo máximo de espera a que un cliente confirme que está suscrito (segundos)
+    'RESTART_BACKOFF_BASE': '0.5',   # Espera antes de reiniciar un cliente caído; se duplica con cada caída seguida (segundos)
+    'RESTART_BACKOFF_MAX': '60',     # Espera máxima entre reinicios de un cliente caído (segundos)
+    'CRASH_LOOP_LIMIT': '5',         # Caídas dentro de CRASH_LOOP_WINDOW que se consideran un bucle de caídas
+    'CRASH_LOOP_WINDOW': '300',      # Ventana para contar las caídas de un servidor (segundos)
+    'CRASH_LOOP_HOLD': '600',        # Espera antes de volver a intentar un servidor en bucle de caídas (segundos)
+    'PROFILE_DIR': 'profiles',       # Directorio de los perfiles y volcados (SIGUSR1 activa el perfilado, SIGUSR2 vuelca los hilos)
+    'PROFILE_ON_START': 'false',     # Perfilar desde el arranque hasta recibir SIGUSR1 (true/false)
+    'PROFILE_SAMPLE_INTERVAL': '0.01',  # Segundos entre muestras de las pilas durante el perfilado
+    'PROFILE_MEMORY_INTERVAL': '60', # Segundos entre comparaciones de memoria con tracemalloc (0 para no seguir la memoria)
     'KEYCLOAK_URL': None,       # URL de Keycloak
     'KEYCLOAK_REALM': None,     # Realm de Keycloak
     'MQTT_KEYCLOAK_CLIENT_ID': None,    # ID de cliente MQTT en Keycloak
@@ -25,12 +62,25 @@ ENV_VARS = {
 }
 
 # Constantes internas
-PROCESS_WAIT_TIME = 1       # Tiempo de espera para verificación de arranque de proceso (segundos)
+PROCESS_WAIT_TIME = 1       # Tiempo de espera para verificación de arranque de proceso sin canal de estado (segundos)
 TIMEOUT = 5                 # Tiempo de espera para comprobar si el proceso se detiene (segundos)
-LOG_DATE_FORMAT = '%Y%m%d'  # Formato de fecha para archivos de log
+METRICS_INTERVAL = 10       # Segundos entre instantáneas de métricas de los clientes con réplicas
+SCALE_DOWN_MARGIN = 0.7     # Fracción de la capacidad de una réplica menos por debajo de la cual se retira una
+PROGRESS_INTERVAL = 5       # Segundos entre informes de progreso de los arranques y reinicios en paralelo
+STABLE_RUNTIME = 60         # Segundos en ejecución tras los que una caída ya no cuenta como caída seguida
 
 
 # Funciones de configuración y argumentos
+def diff_catalogs(old, new):
+    """
+    Compara dos instantáneas del catálogo de servidores ({id: servidor}).
+    Devuelve las listas de IDs añadidos, eliminados y modificados.
+    """
+    added = [server_id for server_id in new if server_id not in old]
+    removed = [server_id for server_id in old if server_id not in new]
+    changed = [server_id for server_id in new if server_id in old and new[server_id] != old[server_id]]
+    return added, removed, changed
+
 def validate_environment():
     """Valida y devuelve la configuración de variables de entorno"""
     config = {}
@@ -59,6 +109,14 @@ def parse_arguments():
                        type=int,
                        metavar='<días>',
                        help='Días a mantener los logs')
+    parser.add_argument('-w', '--servers-per-worker',
+                       type=int,
+                       metavar='<servidores>',
+                       help='Servidores atendidos por cada proceso cliente')
+    parser.add_argument('-n', '--replicas',
+                       type=int,
+                       metavar='<réplicas>',
+                       help='Número fijo de réplicas por servidor (desactiva el escalado automático)')
     return parser.parse_args()
 
 # Clase principal del gestor
@@ -66,31 +124,105 @@ class MQTTManager:
     """Gestor de procesos para clientes MQTT"""
     
     # Inicialización y configuración básica
-    def __init__(self, refresh_interval, retention_days):
+    def __init__(self, refresh_interval, retention_days, servers_per_worker=None, replicas=None):
         # Cargar configuración de entorno
         self.config = validate_environment()
         
         # Variables de entorno
         self.refresh_interval = refresh_interval or int(self.config['REFRESH_INTERVAL'])
         self.retention_days = retention_days or int(self.config['LOG_RETENTION_DAYS'])
+        self.servers_per_worker = servers_per_worker or int(self.config['SERVERS_PER_WORKER'])
+        self.min_replicas = replicas or int(self.config['MIN_REPLICAS'])
+        self.max_replicas = replicas or max(int(self.config['MAX_REPLICAS']), self.min_replicas)
+        # Con más de una réplica posible, cada servidor tiene sus propios procesos con suscripción compartida
+        self.sharded = self.max_replicas > 1
+        self.replica_target_rate = float(self.config['REPLICA_TARGET_RATE'])
+        self.replica_max_backlog = int(self.config['REPLICA_MAX_BACKLOG'])
+        self.scale_cooldown = float(self.config['SCALE_COOLDOWN'])
+        self.restart_parallelism = int(self.config['RESTART_PARALLELISM'])
+        self.restart_jitter = float(self.config['RESTART_JITTER'])
+        self.ready_timeout = float(self.config['READY_TIMEOUT'])
+        self.backoff_base = float(self.config['RESTART_BACKOFF_BASE'])
+        self.backoff_max = float(self.config['RESTART_BACKOFF_MAX'])
+        self.crash_loop_limit = int(self.config['CRASH_LOOP_LIMIT'])
+        self.crash_loop_window = float(self.config['CRASH_LOOP_WINDOW'])
+        self.crash_loop_hold = float(self.config['CRASH_LOOP_HOLD'])
         self.keycloak_url = self.config['KEYCLOAK_URL']
         self.keycloak_realm = self.config['KEYCLOAK_REALM']
         self.keycloak_client_id = self.config['MQTT_KEYCLOAK_CLIENT_ID']
         self.keycloak_client_secret = self.config['MQTT_KEYCLOAK_CLIENT_SECRET']
         
         # Configuración inicial
-        self.processes: Dict[str, int] = {}
+        self.processes: Dict[str, List[int]] = {}  # Servidor -> PIDs de sus réplicas; varios servidores pueden compartir un proceso
+        self.replicas: Dict[int, int] = {}  # PID -> índice de réplica (solo procesos con suscripción compartida)
+        self.load_samples: Dict[int, tuple] = {}  # PID -> (instante, mensajes recibidos) de la última instantánea leída
+        self.last_scaled: Dict[str, float] = {}  # Servidor -> instante del último cambio de réplicas
+        self.scaling: Dict[str, set] = {}  # Servidor -> índices de las réplicas que se están añadiendo
+        self.controls: Dict[int, ControlStream] = {}  # PID -> canal de control (stdin del proceso)
+        self.handles: Dict[int, subprocess.Popen] = {}  # PID -> proceso lanzado por el gestor
+        self.stopping = set()  # PIDs detenidos a propósito, que no se deben reiniciar
+        self.failures: Dict[str, int] = {}  # Servidor -> caídas seguidas (para la espera exponencial)
+        self.crashes: Dict[str, List[float]] = {}  # Servidor -> instantes de las caídas recientes
+        self.restarting = set()  # Servidores con un reinicio programado
+        self.crash_looping = set()  # Servidores en bucle de caídas, en espera de CRASH_LOOP_HOLD
+        self.catalog: Dict[str, dict] = {}  # Servidor -> configuración, según la última instantánea de /servers
+        self.catalog_etag = None  # ETag de la última instantánea, para las peticiones condicionales
+        self.catalog_loaded = False
+        self.log_files: Dict[str, str] = {}  # Servidor -> nombre del log de su último proceso
         self.paused_servers = set()
+        self.telemetry_slots: Dict[int, Dict[str, int]] = {}  # PID -> casilla del tablero de cada uno de sus servidores
+        self.stats: Dict[int, psutil.Process] = {}  # PID -> proceso de psutil (para CPU y memoria)
+        self.lock = threading.RLock()  # Protege el registro de procesos frente a arranques en paralelo
         self.token = None
         self.token_expires_in = None
         
-        # Inicialización del directorio de logs y carga de procesos
-        if not os.path.exists(self.config['LOGS_DIR']):
-            os.makedirs(self.config['LOGS_DIR'])
+        # Inicialización del directorio de logs y de su índice de segmentos
+        self.logs = LogPipeline(
+            self.config['LOGS_DIR'],
+            max_bytes=int(self.config['LOG_MAX_BYTES']),
+            compress=self.config['LOG_COMPRESS'].lower() == 'true'
+        )
+        if self.sharded:
+            os.makedirs(self.config['METRICS_DIR'], exist_ok=True)
+
+        # Tablero de telemetría en memoria compartida
+        self.telemetry = TelemetryBoard(self.config['TELEMETRY_FILE'] or default_path(), int(self.config['TELEMETRY_SLOTS']))
+        self.free_slots = list(range(self.telemetry.slots - 1, -1, -1))
+
+        # Diagnóstico en caliente: SIGUSR1 activa el perfilado y SIGUSR2 vuelca los hilos y el registro de procesos
+        self.profiler = Profiler(
+            'manager',
+            self.config['PROFILE_DIR'],
+            sample_interval=float(self.config['PROFILE_SAMPLE_INTERVAL']),
+            memory_interval=float(self.config['PROFILE_MEMORY_INTERVAL']),
+            report=print
+        )
+        self.profiler.add_state('Procesos', self._process_state)
+        self.profiler.add_state('Logs', lambda: {
+            name: f"lectores {log.readers}, segmento {log.segment.path if log.segment else '-'}, {log.size} bytes"
+            for name, log in list(self.logs.logs.items())
+        } or "sin logs abiertos")
+        self.profiler.install()
+        if self.config['PROFILE_ON_START'].lower() == 'true':
+            self.profiler.toggle()
             
         self._fetch_token()
         self._setup_auto_refresh()
 
+    def _process_state(self):
+        """Registro de procesos para el volcado de diagnóstico."""
+        with self.lock:
+            return {
+                'servidores': {server_id: list(pids) for server_id, pids in self.processes.items()},
+                'procesos vivos': [pid for pid, handle in self.handles.items() if handle.poll() is None],
+                'réplicas': dict(self.replicas),
+                'deteniéndose': sorted(self.stopping),
+                'reinicios programados': sorted(self.restarting),
+                'réplicas añadiéndose': {server_id: sorted(replicas) for server_id, replicas in self.scaling.items()},
+                'en bucle de caídas': sorted(self.crash_looping),
+                'casillas de telemetría': f"{self.telemetry.slots - len(self.free_slots)} de {self.telemetry.slots} ocupadas"
+            }
+
     def _fetch_token(self):
         """
         Obtiene un nuevo access_token desde Keycloak vía client_credentials
@@ -134,13 +266,16 @@ class MQTTManager:
         def timer_thread():
             while True:
                 self.check_status(verbose=False)
+                self.autoscale(verbose=False)
                 threading.Event().wait(self.refresh_interval)
                 
         def token_thread():
             while True:
-                threading.Event().wait(self.token_expires_in - 60)
+                # Si no se pudo obtener el token, reintentar en un minuto
+                threading.Event().wait(self.token_expires_in - 60 if self.token_expires_in else 60)
                 self._fetch_token()  # Obtener nuevo token
-                self.daily_task()    # Relanzar clientes con nuevo token
+                if self.token:
+                    self.push_token()  # Entregarlo a los clientes sin reiniciarlos
         
         # Iniciar todos los hilos
         refresh_thread = threading.Thread(target=timer_thread, daemon=True)
@@ -151,182 +286,549 @@ class MQTTManager:
         token_refresh_thread.start()
 
     def cleanup_old_logs(self):
-        """Elimina logs más antiguos que retention_days"""
-        cutoff_date = datetime.now() - timedelta(days=self.retention_days)
-        
-        log_dir = self.config['LOGS_DIR']
-        for filename in os.listdir(log_dir):
-            if not filename.startswith('mqtt_client_'):
-                continue
-            
-            try:
-                date_str = filename.split('_')[-1].split('.')[0]
-                file_date = datetime.strptime(date_str, LOG_DATE_FORMAT)
-                
-                if file_date < cutoff_date:
-                    file_path = os.path.join(log_dir, filename)
-                    os.remove(file_path)
-            except Exception:
-                continue
+        """Elimina logs más antiguos que retention_days, según el índice de segmentos"""
+        cutoff_date = (datetime.now() - timedelta(days=self.retention_days)).date()
+        self.logs.cleanup(cutoff_date)
 
     def daily_task(self):
-        """Tarea que se ejecutará diariamente a medianoche o al actualizar el token"""
-        # 1. Limpiar logs antiguos
+        """Tarea que se ejecutará diariamente a medianoche"""
+        # 1. Pasar los logs al segmento del nuevo día y limpiar los antiguos
+        self.logs.roll_over()
         self.cleanup_old_logs()
         
-        # 2. Reiniciar clientes uno a uno
-        active_servers = list(self.processes.keys())
-        for server_id in active_servers:
-            if server_id not in self.paused_servers:
-                self.stop_client(server_id, pause=False, verbose=False)
-                self.start_client(server_id, verbose=False)
+        # 2. Reiniciar procesos en paralelo, conservando los servidores de cada uno
+        jobs = []
+        for pid, server_ids in self._group_by_process().items():
+            server_ids = [s for s in server_ids if s not in self.paused_servers]
+            if server_ids:
+                jobs.append(functools.partial(self._restart, pid, server_ids, verbose=False))
+        self._run_parallel("Reinicio diario", jobs)
 
     def _get_latest_log(self, server_id):
         """Obtiene el archivo de log más reciente para un servidor específico"""
-        if not os.path.exists(self.config['LOGS_DIR']):
-            return None
-            
-        logs = [f for f in os.listdir(self.config['LOGS_DIR']) if f.startswith(f"mqtt_client_{server_id}_")]
-        if not logs:
-            return None
-            
-        return max([os.path.join(self.config['LOGS_DIR'], f) for f in logs], key=os.path.getctime)
+        return self.logs.current(self.log_files.get(server_id, server_id))
 
     # Funciones de API
     def get_servers(self):
-        """Obtiene la lista de servidores desde la API"""
+        """Devuelve la lista de servidores de la última instantánea del catálogo, descargándolo si aún no existe"""
+        if not self.catalog_loaded:
+            self.refresh_catalog()
+        return list(self.catalog.values())
+
+    def refresh_catalog(self):
+        """
+        Actualiza la instantánea del catálogo de servidores con una única petición condicional:
+        si no ha cambiado desde la anterior (If-None-Match), la API responde 304 sin cuerpo.
+        Si la petición falla se conserva la instantánea anterior.
+        Devuelve las listas de IDs añadidos, eliminados y modificados.
+        """
+        headers = {'Authorization': f'Bearer {self.token}'}
+        if self.catalog_etag:
+            headers['If-None-Match'] = self.catalog_etag
         try:
-            headers = {'Authorization': f'Bearer {self.token}'}
             response = requests.get(f"{self.config['API_URL']}/servers", headers=headers)
+            if response.status_code == 304:
+                return [], [], []
             if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Error al obtener servidores: {response.status_code} - {response.text}")
+                catalog = {str(server['id']): server for server in response.json()}
+                changes = diff_catalogs(self.catalog, catalog)
+                self.catalog = catalog
+                self.catalog_etag = response.headers.get('ETag')
+                self.catalog_loaded = True
+                return changes
+            print(f"Error al obtener servidores: {response.status_code} - {response.text}")
         except requests.exceptions.RequestException as e:
             print(f"Error al obtener servidores: {e}")
-        return []
+        return [], [], []
 
     # Funciones principales de gestión de clientes
-    def start_client(self, server_id, verbose=True):
+    def _group_by_process(self):
+        """Agrupa los servidores activos por el proceso que los atiende"""
+        groups: Dict[int, list] = {}
+        with self.lock:
+            for server_id, pids in self.processes.items():
+                for pid in pids:
+                    groups.setdefault(pid, []).append(server_id)
+        return groups
+
+    def _is_alive(self, pid):
+        """Indica si un proceso lanzado por el gestor sigue en ejecución (sin confundirlo con un PID reutilizado)"""
+        process = self.handles.get(pid)
+        return process is not None and process.poll() is None
+
+    def _is_running(self, server_id):
+        """Indica si alguno de los procesos de un servidor sigue en ejecución"""
+        return any(self._is_alive(pid) for pid in self.processes.get(server_id, []))
+
+    def _forget_process(self, pid):
+        """Elimina un proceso del registro de todos los servidores que atendía"""
+        with self.lock:
+            for server_id in [s for s, pids in self.processes.items() if pid in pids]:
+                self.processes[server_id].remove(pid)
+                if not self.processes[server_id]:
+                    del self.processes[server_id]
+                    self.log_files.pop(server_id, None)
+            self.replicas.pop(pid, None)
+            self.load_samples.pop(pid, None)
+            self.handles.pop(pid, None)
+            self.stats.pop(pid, None)
+            self._release_slots(self.telemetry_slots.pop(pid, {}))
+            control = self.controls.pop(pid, None)
+        if control is not None:
+            try:
+                control.close()
+            except OSError:
+                pass
+
+    def _allocate_slots(self, server_ids):
+        """Reserva una casilla del tablero de telemetría para cada servidor de un proceso"""
+        with self.lock:
+            return {server_id: self.free_slots.pop() for server_id in server_ids[:len(self.free_slots)]}
+
+    def _release_slots(self, slots):
+        """Vacía y devuelve las casillas de un proceso terminado"""
+        with self.lock:
+            for slot in slots.values():
+                self.telemetry.clear(slot)
+                self.free_slots.append(slot)
+
+    def _metrics_file(self, server_id, replica):
+        """Ruta de la instantánea de métricas de una réplica"""
+        return os.path.join(self.config['METRICS_DIR'], f"mqtt_client_{server_id}_{replica}.json")
+
+    def _launch(self, server_ids, verbose=True, replica=None):
         """
-        Inicia un nuevo cliente MQTT para un servidor específico.
-        Verifica la existencia del servidor y crea un archivo de log para el proceso.
+        Lanza un proceso cliente para uno o varios servidores y crea su archivo de log.
+        Devuelve False si el proceso no llegó a arrancar.
         Args:
-            server_id: ID del servidor
+            server_ids: IDs de los servidores que atenderá el proceso
             verbose (bool): Si es True, muestra mensajes en consola
+            replica: Índice de réplica si el proceso comparte la suscripción con otros del mismo servidor
         """
-        # Remover del conjunto de pausados si existe
-        self.paused_servers.discard(str(server_id))
-        
-        servers = self.get_servers()
-        server_exists = any(str(server['id']) == str(server_id) for server in servers)
-        
-        if not server_exists:
-            if verbose: print(f"Error: No existe ningún servidor con ID {server_id}")
-            return False
-
-        if server_id in self.processes and psutil.pid_exists(self.processes[server_id]):
-            if verbose: print(f"Error: El cliente para el servidor {server_id} ya está en ejecución")
-            return False
+        return self._spawn(server_ids, verbose=verbose, replica=replica) != 'failed'
 
+    def _spawn(self, server_ids, verbose=True, replica=None):
+        """
+        Lanza un proceso cliente y espera a que confirme que está conectado y suscrito.
+        Devuelve 'ready' si lo confirmó, 'timeout' si sigue en ejecución sin confirmarlo
+        en READY_TIMEOUT segundos (ej: broker caído, el cliente sigue reintentando) o 'failed'.
+        """
+        description = f"servidor {server_ids[0]}" if len(server_ids) == 1 else f"servidores {', '.join(server_ids)}"
+        if replica is not None:
+            description += f" (réplica {replica})"
+        slots = {}
         try:
-            # Crear nombre de archivo de log con timestamp
-            timestamp = datetime.now().strftime(LOG_DATE_FORMAT)
-            log_file = os.path.join(self.config['LOGS_DIR'], f"mqtt_client_{server_id}_{timestamp}.log")
+            # Nombre del log; el gestor escribe la salida del proceso en el segmento del día
+            log_name = server_ids[0] if len(server_ids) == 1 else f"worker{server_ids[0]}"
+            if replica is not None:
+                log_name = f"{log_name}_r{replica}"
             
-            # Abrir archivo de log en modo 'append' y redirigir stdout y stderr
             creationflags = 0
             if os.name == 'nt':
                 creationflags = subprocess.CREATE_NEW_PROCESS_GROUP  # Solo en Windows
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(f"\n--- Nueva sesión iniciada {datetime.now()} ---\n")
+            command = ['python', 'mqtt_client.py', *server_ids, self.token, '--control']
+            env = dict(os.environ)
+            if replica is not None:
+                # Las réplicas publican sus métricas para que el gestor pueda escalarlas
+                command += ['--replica', str(replica)]
+                env['METRICS_FILE'] = self._metrics_file(server_ids[0], replica)
+                env['METRICS_INTERVAL'] = str(METRICS_INTERVAL)
+            # Casillas del tablero de telemetría en las que el cliente publica sus contadores
+            slots = self._allocate_slots(server_ids)
+            env[TELEMETRY_VARIABLE] = self.telemetry.path
+            env[SLOTS_VARIABLE] = format_slots(slots)
+            status_fd = child_fd = None
+            pass_fds = ()
+            if os.name == 'posix':
+                # Canal de estado: el cliente avisa por aquí cuando está conectado y suscrito
+                status_fd, child_fd = os.pipe()
+                env[STATUS_FD_VARIABLE] = str(child_fd)
+                pass_fds = (child_fd,)
+            # Tubería de salida: stdout y stderr del proceso llegan al gestor, que los escribe en el log
+            output_fd, output_child_fd = os.pipe()
+            try:
                 process = subprocess.Popen(
-                    ['python', 'mqtt_client.py', str(server_id), self.token],
-                    stdout=f,
+                    command,
+                    stdin=subprocess.PIPE,      # Canal de control para enviar token y configuración
+                    stdout=output_child_fd,
                     stderr=subprocess.STDOUT,   # Redirigir stderr a stdout
                     text=True,
+                    env=env,
+                    pass_fds=pass_fds,
                     creationflags=creationflags  # Usar variable
                 )
-                
-            # Esperar y verificar el proceso
-            threading.Event().wait(PROCESS_WAIT_TIME)
-            if not psutil.pid_exists(process.pid) or process.poll() is not None:
+            except Exception:
+                os.close(output_fd)
+                if status_fd is not None:
+                    os.close(status_fd)
+                raise
+            finally:
+                os.close(output_child_fd)
+                if child_fd is not None:
+                    os.close(child_fd)
+            log_file = self.logs.attach(
+                log_name, os.fdopen(output_fd, 'rb'),
+                header=f"\n--- Nueva sesión iniciada {datetime.now()} ---\n"
+            )
+
+            # Entregar la configuración ya descargada para que el cliente no tenga que pedirla a la API
+            control = ControlStream(process.stdin)
+            control.send('servers', servers=[self.catalog[s] for s in server_ids if s in self.catalog])
+
+            # Esperar a que el cliente confirme el arranque
+            if status_fd is not None:
+                status = self._wait_ready(process, status_fd)
+            else:
+                threading.Event().wait(PROCESS_WAIT_TIME)
+                status = 'failed' if process.poll() is not None else 'timeout'
+            if status == 'failed':
                 if verbose:
-                    print(f"El cliente para servidor {server_id} falló al iniciar")
-                return False
+                    print(f"El cliente para {description} falló al iniciar")
+                process.stdin.close()
+                self._release_slots(slots)
+                return status
             
-            self.processes[server_id] = process.pid
+            with self.lock:
+                for server_id in server_ids:
+                    self.processes.setdefault(server_id, []).append(process.pid)
+                    self.log_files[server_id] = log_name
+                if replica is not None:
+                    self.replicas[process.pid] = replica
+                self.controls[process.pid] = control
+                self.handles[process.pid] = process
+                self.telemetry_slots[process.pid] = slots
+            try:
+                # La primera medida de CPU solo fija el punto de partida
+                self.stats[process.pid] = psutil.Process(process.pid)
+                self.stats[process.pid].cpu_percent()
+            except psutil.Error:
+                pass
+            # Supervisar el proceso para reiniciarlo en cuanto termine inesperadamente
+            threading.Thread(
+                target=self._watch, args=(process, server_ids, replica, time.monotonic()),
+                name=f"watch-{process.pid}", daemon=True
+            ).start()
             if verbose:
-                print(f"Cliente MQTT iniciado para servidor {server_id} con PID {process.pid}")
+                print(f"Cliente MQTT iniciado para {description} con PID {process.pid}")
+                if status == 'timeout':
+                    print("El cliente aún no ha confirmado la conexión con el broker; sigue reintentando")
                 print(f"Logs disponibles en: {log_file}")
-            return True
+            return status
         except Exception as e:
-            if verbose: print(f"Error al iniciar cliente para servidor {server_id}: {e}")
-            return False
+            self._release_slots(slots)
+            if verbose: print(f"Error al iniciar cliente para {description}: {e}")
+            return 'failed'
 
-    def stop_client(self, server_id, verbose=True, pause=True):
+    def _wait_ready(self, process, status_fd):
+        """Espera el aviso de arranque del cliente por el canal de estado. Devuelve el estado como _spawn"""
+        try:
+            readable, _, _ = select.select([status_fd], [], [], self.ready_timeout)
+            if not readable:
+                return 'timeout'
+            if os.read(status_fd, len(READY)) == READY:
+                return 'ready'
+            # Canal cerrado sin aviso: el cliente ha terminado
+            try:
+                process.wait(timeout=TIMEOUT)
+                return 'failed'
+            except subprocess.TimeoutExpired:
+                return 'timeout'
+        finally:
+            os.close(status_fd)
+
+    # Supervisión de procesos
+    def _watch(self, process, server_ids, replica, started):
+        """Espera a que termine un proceso y, si no se detuvo a propósito, programa su reinicio"""
+        returncode = process.wait()
+        with self.lock:
+            if process.pid in self.stopping:
+                self.stopping.discard(process.pid)
+                return
+            if self.handles.get(process.pid) is not process:
+                return
+        self._forget_process(process.pid)
+        runtime = time.monotonic() - started
+        print(f"El cliente de {', '.join(server_ids)} (PID {process.pid}) terminó inesperadamente "
+              f"con código {returncode} tras {runtime:.0f} s")
+        self._schedule_restart(server_ids, replica, runtime)
+
+    def _schedule_restart(self, server_ids, replica, runtime):
+        """
+        Programa el reinicio de un proceso caído con espera exponencial por servidor.
+        Tras CRASH_LOOP_LIMIT caídas en CRASH_LOOP_WINDOW segundos, el servidor se considera en bucle
+        de caídas y no se vuelve a intentar hasta pasados CRASH_LOOP_HOLD segundos.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for server_id in server_ids:
+                if runtime >= STABLE_RUNTIME:
+                    self.failures[server_id] = 0
+                self.failures[server_id] = self.failures.get(server_id, 0) + 1
+                recent = [t for t in self.crashes.get(server_id, []) if now - t < self.crash_loop_window]
+                self.crashes[server_id] = recent + [now]
+            failures = max(self.failures[server_id] for server_id in server_ids)
+            crash_loop = any(len(self.crashes[server_id]) >= self.crash_loop_limit for server_id in server_ids)
+            self.restarting.update(server_ids)
+            if crash_loop:
+                self.crash_looping.update(server_ids)
+
+        if crash_loop:
+            delay = self.crash_loop_hold
+            print(f"Bucle de caídas en {', '.join(server_ids)}: {self.crash_loop_limit} caídas en "
+                  f"{self.crash_loop_window:.0f} s, se reintentará en {delay:.0f} s")
+        else:
+            delay = min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
+        timer = threading.Timer(delay, self._revive, args=(server_ids, replica))
+        timer.daemon = True
+        timer.start()
+
+    def _revive(self, server_ids, replica):
+        """Relanza un proceso caído para los servidores que sigan necesitándolo"""
+        with self.lock:
+            self.restarting.difference_update(server_ids)
+            self.crash_looping.difference_update(server_ids)
+            if replica is not None:
+                # Réplica: relanzarla solo si su índice sigue libre
+                used = {self.replicas.get(pid) for s in server_ids for pid in self.processes.get(s, [])}
+                server_ids = [] if replica in used else server_ids
+            server_ids = [
+                s for s in server_ids
+                if s in self.catalog and s not in self.paused_servers and (replica is not None or not self._is_running(s))
+            ]
+        if not server_ids:
+            return
+        if self._spawn(server_ids, verbose=False, replica=replica) == 'failed':
+            self._schedule_restart(server_ids, replica, 0)
+
+    def _run_parallel(self, title, jobs, verbose=True):
+        """
+        Ejecuta trabajos de arranque o reinicio de procesos, hasta RESTART_PARALLELISM a la vez.
+        Cada trabajo espera antes un retardo aleatorio de hasta RESTART_JITTER segundos para que los
+        brokers no reciban todas las reconexiones a la vez, y devuelve el estado de _spawn.
+        Muestra el progreso cada PROGRESS_INTERVAL segundos y un resumen al terminar.
         """
-        Detiene un cliente MQTT específico
+        results = Counter()
+        if not jobs:
+            return results
+        lock = threading.Lock()
+        started = time.monotonic()
+        last_report = started
+
+        def report():
+            done = sum(results.values())
+            print(f"{title}: {done}/{len(jobs)} procesos ({results['ready']} listos, {results['timeout']} sin confirmar, "
+                  f"{results['failed']} fallidos) en {time.monotonic() - started:.1f} s")
+
+        def run(job):
+            nonlocal last_report
+            threading.Event().wait(random.uniform(0, self.restart_jitter))
+            try:
+                status = job()
+            except Exception as e:
+                print(f"{title}: error inesperado: {e}")
+                status = 'failed'
+            with lock:
+                results[status] += 1
+                if verbose and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    report()
+
+        with ThreadPoolExecutor(max_workers=self.restart_parallelism) as executor:
+            list(executor.map(run, jobs))
+        if verbose:
+            report()
+        return results
+
+    def _restart(self, pid, server_ids, verbose=True):
+        """Relanza un proceso para los mismos servidores y con la misma réplica. Devuelve el estado de _spawn"""
+        replica = self.replicas.get(pid)
+        if not self._terminate(pid, verbose=verbose):
+            return 'failed'
+        self._forget_process(pid)
+        return self._spawn(server_ids, verbose=verbose, replica=replica)
+
+    # Canal de control
+    def _send_control(self, pid, command, **fields):
+        """Envía una orden a un proceso cliente. Devuelve False si el proceso no la puede recibir"""
+        control = self.controls.get(pid)
+        return control is not None and control.send(command, **fields)
+
+    def push_token(self):
+        """Entrega el token renovado a todos los procesos; los que no lo reciben se reinician"""
+        jobs = [
+            functools.partial(self._restart, pid, server_ids, verbose=False)
+            for pid, server_ids in self._group_by_process().items()
+            if not self._send_control(pid, 'token', token=self.token) and self._is_alive(pid)
+        ]
+        self._run_parallel("Reinicio por token", jobs, verbose=False)
+
+    def push_server_changes(self, changed, verbose=True):
+        """
+        Envía a cada proceso la nueva configuración de sus servidores modificados en el catálogo.
+        El cliente la aplica en caliente; si no la puede recibir, el proceso se reinicia.
+        """
+        if not changed:
+            return
+
+        for pid, server_ids in self._group_by_process().items():
+            updates = [self.catalog[s] for s in server_ids if s in changed]
+            if not updates:
+                continue
+            if verbose: print(f"  → Enviando la nueva configuración de {', '.join(str(s['id']) for s in updates)} al proceso {pid}")
+            if not self._send_control(pid, 'servers', servers=updates):
+                self._restart(pid, server_ids, verbose=verbose)
+
+    def start_client(self, server_id, verbose=True):
+        """
+        Inicia un nuevo cliente MQTT para un servidor específico.
+        Verifica la existencia del servidor y crea un archivo de log para el proceso.
         Args:
             server_id: ID del servidor
             verbose (bool): Si es True, muestra mensajes en consola
-            pause (bool): Si es True, evita que el servidor se reinicie automáticamente
         """
-        if server_id not in self.processes:
-            if verbose: print(f"No se encontró cliente para el servidor {server_id}")
+        # Remover del conjunto de pausados si existe y olvidar sus caídas anteriores
+        self.paused_servers.discard(str(server_id))
+        self.failures.pop(str(server_id), None)
+        self.crashes.pop(str(server_id), None)
+        
+        # Un servidor recién creado puede no estar aún en la instantánea del catálogo
+        if str(server_id) not in self.catalog:
+            self.refresh_catalog()
+        
+        if str(server_id) not in self.catalog:
+            if verbose: print(f"Error: No existe ningún servidor con ID {server_id}")
+            return False
+
+        if self._is_running(server_id):
+            if verbose: print(f"Error: El cliente para el servidor {server_id} ya está en ejecución")
+            return False
+
+        return self._launch_server(str(server_id), verbose=verbose)
+
+    def _launch_server(self, server_id, verbose=True):
+        """Lanza el proceso de un servidor o, con réplicas, sus réplicas mínimas con suscripción compartida"""
+        if not self.sharded:
+            return self._launch([server_id], verbose=verbose)
+        self.last_scaled[server_id] = time.monotonic()
+        launched = [self._launch([server_id], verbose=verbose, replica=i) for i in range(self.min_replicas)]
+        return all(launched)
+
+    def start_worker(self, server_ids, verbose=True):
+        """
+        Inicia un único proceso cliente que atiende a varios servidores.
+        Args:
+            server_ids: IDs de los servidores
+            verbose (bool): Si es True, muestra mensajes en consola
+        """
+        server_ids = [str(server_id) for server_id in server_ids]
+        running = [s for s in server_ids if self._is_running(s)]
+        if running:
+            if verbose: print(f"Error: Ya hay clientes en ejecución para los servidores {', '.join(running)}")
             return False
+        return self._launch(server_ids, verbose=verbose)
 
-        pid = self.processes[server_id]
+    def _terminate(self, pid, verbose=True):
+        """
+        Detiene un proceso cliente, primero con una señal y, si no responde, forzosamente.
+        El proceso se marca como detenido a propósito para que su supervisor no lo reinicie.
+        Devuelve True si el proceso se detuvo o ya no existía.
+        """
+        process = self.handles.get(pid)
+        if process is None or process.poll() is not None:
+            if verbose: print(f"El proceso con PID {pid} no está activo")
+            return True
+
+        with self.lock:
+            self.stopping.add(pid)
         process_stopped = False
-        
         try:
-            process = psutil.Process(pid)
-            if process.is_running():
-                signal_sent = False
-                if os.name == 'nt':
-                    # En Windows, enviar CTRL_BREAK_EVENT
-                    process.send_signal(signal.CTRL_BREAK_EVENT)
-                    signal_sent = True
-                elif os.name == 'posix':
-                    # En Unix, enviar SIGTERM
-                    process.send_signal(signal.SIGTERM)
-                    signal_sent = True
-                else:
-                    if verbose:
-                        print(f"No se puede enviar señal para el sistema operativo {os.name}")
-                        
-                if signal_sent:
-                    try:
-                        process.wait(timeout=TIMEOUT)
-                        process_stopped = True
-                    except psutil.TimeoutExpired:
-                        if verbose: print(f"El proceso {pid} no respondió a la señal, forzando la terminación...")
-                        process.kill()  # Si no responde, se mata forzosamente
-                        process_stopped = True
-                else:
-                    # Si no se pudo enviar la señal, matar directamente
-                    if verbose: print(f"Señal no enviada para el proceso {pid}, forzando la terminación...")
-                    process.kill()
+            signal_sent = False
+            if os.name == 'nt':
+                # En Windows, enviar CTRL_BREAK_EVENT
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+                signal_sent = True
+            elif os.name == 'posix':
+                # En Unix, enviar SIGTERM
+                process.send_signal(signal.SIGTERM)
+                signal_sent = True
+            else:
+                if verbose:
+                    print(f"No se puede enviar señal para el sistema operativo {os.name}")
+
+            if signal_sent:
+                try:
+                    process.wait(timeout=TIMEOUT)
+                    process_stopped = True
+                except subprocess.TimeoutExpired:
+                    if verbose: print(f"El proceso {pid} no respondió a la señal, forzando la terminación...")
+                    process.kill()  # Si no responde, se mata forzosamente
+                    process.wait()
                     process_stopped = True
             else:
-                if verbose: print(f"El proceso con PID {pid} no está activo")
+                # Si no se pudo enviar la señal, matar directamente
+                if verbose: print(f"Señal no enviada para el proceso {pid}, forzando la terminación...")
+                process.kill()
+                process.wait()
                 process_stopped = True
-        except psutil.NoSuchProcess:
-            if verbose: print(f"El proceso con PID {pid} no existe")
-            process_stopped = True
         except Exception as e:
-            if verbose: print(f"Error al detener cliente para servidor {server_id}: {e}")
-        
-        # Siempre eliminar el proceso del diccionario si se detuvo o no existe
-        if process_stopped:
-            del self.processes[server_id]
+            if verbose: print(f"Error al detener el proceso {pid}: {e}")
+        if not process_stopped:
+            with self.lock:
+                self.stopping.discard(pid)
+        return process_stopped
+
+    def stop_client(self, server_id, verbose=True, pause=True):
+        """
+        Detiene un cliente MQTT específico con todas sus réplicas.
+        Si el proceso atendía a otros servidores, se relanza para ellos.
+        Args:
+            server_id: ID del servidor
+            verbose (bool): Si es True, muestra mensajes en consola
+            pause (bool): Si es True, evita que el servidor se reinicie automáticamente
+        """
+        if server_id not in self.processes:
+            if verbose: print(f"No se encontró cliente para el servidor {server_id}")
+            return False
+        return self.stop_clients([server_id], verbose=verbose, pause=pause)
+
+    def stop_clients(self, server_ids, verbose=True, pause=True):
+        """
+        Detiene los clientes de varios servidores. Cada proceso se detiene una sola vez y solo se
+        relanza para los servidores que atendía y que no se están deteniendo, de modo que detener todos
+        los servidores de un proceso compartido no lo relanza para los que quedan por detener.
+        Args:
+            server_ids: IDs de los servidores
+            verbose (bool): Si es True, muestra mensajes en consola
+            pause (bool): Si es True, evita que los servidores se reinicien automáticamente
+        """
+        server_ids = [str(server_id) for server_id in server_ids if str(server_id) in self.processes]
+        stopping = set(server_ids)
+        failed = set()
+        for pid, served in self._group_by_process().items():
+            if stopping.isdisjoint(served):
+                continue
+            # Siempre eliminar el proceso del diccionario si se detuvo o no existe
+            if not self._terminate(pid, verbose=verbose):
+                failed.update(stopping.intersection(served))
+                continue
+            self._forget_process(pid)
+            siblings = [s for s in served if s not in stopping]
+            if siblings:
+                if verbose: print(f"Relanzando el proceso para los servidores {', '.join(siblings)}")
+                self._launch(siblings, verbose=verbose)
+
+        for server_id in server_ids:
+            if server_id in failed:
+                continue
             if pause:
-                self.paused_servers.add(str(server_id))
+                self.paused_servers.add(server_id)
                 if verbose: print(f"Servidor {server_id} pausado para reinicios automáticos")
             if verbose: print(f"Cliente MQTT detenido para servidor {server_id}")
-            return True
-        
-        return False
+        return not failed
+
+    def stop_all(self, verbose=True):
+        """Detiene todos los clientes sin relanzar ningún proceso compartido (al salir del gestor)."""
+        return self.stop_clients(list(self.processes.keys()), verbose=verbose, pause=False)
 
     # Funciones de monitoreo y estado
     def check_status(self, verbose=True):
@@ -339,52 +841,199 @@ class MQTTManager:
             print("\nVerificando estado de los clientes MQTT...")
             print("----------------------------------------")
         
-        # Primero, limpiar procesos muertos del diccionario
-        dead_processes = [
-            server_id for server_id, pid in self.processes.items()
-            if not psutil.pid_exists(pid)
-        ]
-        for server_id in dead_processes:
-            if verbose:
-                print(f"Removiendo proceso muerto {self.processes[server_id]} del servidor {server_id}")
-            del self.processes[server_id]
+        # Los procesos que terminan se retiran y reinician al momento desde sus hilos de supervisión
         
+        # Una única petición (condicional) al catálogo por comprobación
+        added, removed, changed = self.refresh_catalog()
+        if verbose and (added or removed or changed):
+            print(f"Catálogo actualizado: {len(added)} servidores añadidos, {len(removed)} eliminados, {len(changed)} modificados")
+        self.push_server_changes(changed, verbose=verbose)
         servers = self.get_servers()
-        server_ids = {str(server['id']) for server in servers}
+        server_ids = set(self.catalog)
         
         if verbose:
             print("1. Verificando clientes que deben detenerse...")
-        for server_id in list(self.processes.keys()):
-            if server_id not in server_ids:
-                if verbose:
-                    print(f"  → Deteniendo cliente {self.processes[server_id]} (servidor {server_id} ya no existe)")
-                self.stop_client(server_id, verbose=verbose, pause=False)
+        removed_servers = [server_id for server_id in list(self.processes.keys()) if server_id not in server_ids]
+        for server_id in removed_servers:
+            if verbose:
+                print(f"  → Deteniendo cliente {', '.join(map(str, self.processes[server_id]))} (servidor {server_id} ya no existe)")
+        if removed_servers:
+            self.stop_clients(removed_servers, verbose=verbose, pause=False)
         
         if verbose:
-            print("\n2. Verificando clientes que deben iniciarse o reiniciarse...")
+            print("\n2. Verificando clientes que deben iniciarse...")
+        pending = []
         for server in servers:
             server_id = str(server['id'])
             if server_id in self.paused_servers:
                 if verbose:
                     print(f"\n  → Omitiendo servidor {server_id} (pausado por usuario)")
                 continue
+            if server_id in self.restarting:
+                if verbose:
+                    print(f"\n  → Omitiendo servidor {server_id} (reinicio tras caída programado)")
+                continue
             
             if server_id not in self.processes:
                 if verbose:
                     print(f"\n  → Iniciando nuevo cliente para servidor {server_id} ({server['name']})")
-                self.start_client(server_id, verbose=verbose)
-            elif not psutil.pid_exists(self.processes[server_id]):
+                pending.append(server_id)
+            elif self.sharded and len(self.processes[server_id]) < self.min_replicas:
+                # Reponer las réplicas caídas hasta el mínimo
                 if verbose:
-                    print(f"\n  → Reiniciando cliente caído para servidor {server_id} ({server['name']})")
-                self.stop_client(server_id, verbose=verbose, pause=False)
-                self.start_client(server_id, verbose=verbose)
+                    print(f"\n  → Reponiendo réplicas del servidor {server_id} ({server['name']})")
+                while len(self.processes[server_id]) < self.min_replicas:
+                    if not self._launch([server_id], verbose=verbose, replica=self._free_replica(server_id)):
+                        break
+
+        jobs = []
+        if self.sharded:
+            # Con réplicas cada servidor tiene sus propios procesos
+            for server_id in pending:
+                self.last_scaled[server_id] = time.monotonic()
+                jobs += [functools.partial(self._spawn, [server_id], verbose=verbose, replica=i) for i in range(self.min_replicas)]
+        else:
+            # Repartir los servidores pendientes en procesos de hasta servers_per_worker servidores
+            for i in range(0, len(pending), self.servers_per_worker):
+                jobs.append(functools.partial(self._spawn, pending[i:i + self.servers_per_worker], verbose=verbose))
+        self._run_parallel("Arranque de clientes", jobs, verbose=verbose)
         
         if verbose:
             print("\n3. Actualización completada.")
             print("----------------------------------------")
 
+    # Escalado de réplicas
+    def _free_replica(self, server_id):
+        """Devuelve el menor índice de réplica libre de un servidor (sin contar las que se están añadiendo)"""
+        with self.lock:
+            used = {self.replicas.get(pid) for pid in self.processes.get(server_id, [])} | self.scaling.get(server_id, set())
+        index = 0
+        while index in used:
+            index += 1
+        return index
+
+    def _read_load(self, server_id, pid):
+        """
+        Lee la instantánea de métricas de una réplica.
+        Devuelve (mensajes/s desde la lectura anterior, mensajes pendientes) o None si aún no hay datos.
+        """
+        path = self._metrics_file(server_id, self.replicas[pid])
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get('pid') != pid:
+            return None  # Instantánea de un proceso anterior con el mismo índice
+
+        counters, gauges = snapshot['counters'], snapshot['gauges']
+        received = sum(sample['value'] for sample in counters.get('mqtt_client_messages_received_total', []))
+        backlog = sum(
+            sample['value']
+            for name in ('mqtt_client_queue_depth', 'mqtt_client_spool_pending')
+            for sample in gauges.get(name, [])
+        )
+        previous = self.load_samples.get(pid)
+        self.load_samples[pid] = (snapshot['timestamp'], received)
+        if previous is None or snapshot['timestamp'] <= previous[0]:
+            return None
+        return (received - previous[1]) / (snapshot['timestamp'] - previous[0]), backlog
+
+    def autoscale(self, verbose=True):
+        """
+        Ajusta el número de réplicas de cada servidor según su ritmo de mensajes y su cola.
+        Se añaden réplicas hasta atender REPLICA_TARGET_RATE mensajes/s por réplica o si alguna acumula
+        más de REPLICA_MAX_BACKLOG mensajes; se retira una cuando el ritmo cabe holgadamente en una réplica menos.
+        Entre cambios de un mismo servidor se esperan al menos SCALE_COOLDOWN segundos.
+        """
+        if not self.sharded or self.min_replicas == self.max_replicas:
+            return
+
+        now = time.monotonic()
+        for server_id, pids in list(self.processes.items()):
+            if server_id in self.paused_servers or server_id in self.scaling:
+                continue
+            loads = [self._read_load(server_id, pid) for pid in pids if pid in self.replicas]
+            if not loads or None in loads or now - self.last_scaled.get(server_id, 0) < self.scale_cooldown:
+                continue
+
+            current = len(pids)
+            rate = sum(load[0] for load in loads)
+            desired = max(self.min_replicas, min(self.max_replicas, math.ceil(rate / self.replica_target_rate)))
+            if any(load[1] > self.replica_max_backlog for load in loads):
+                desired = max(desired, min(self.max_replicas, current + 1))
+            elif desired < current and rate > (current - 1) * self.replica_target_rate * SCALE_DOWN_MARGIN:
+                desired = current  # Margen para no oscilar alrededor del umbral
+
+            if desired > current:
+                if verbose: print(f"Escalando el servidor {server_id} de {current} a {desired} réplicas ({rate:.0f} mensajes/s)")
+                replicas = set()
+                with self.lock:
+                    self.scaling[server_id] = replicas
+                    for _ in range(desired - current):
+                        replicas.add(self._free_replica(server_id))
+                # Arrancar en segundo plano: la espera de confirmación no debe frenar este hilo
+                threading.Thread(
+                    target=self._scale_up, args=(server_id, sorted(replicas), verbose),
+                    name=f"scale-{server_id}", daemon=True
+                ).start()
+                self.last_scaled[server_id] = now
+            elif desired < current:
+                # Retirar de una en una la réplica de mayor índice
+                pid = max(pids, key=lambda p: self.replicas.get(p, -1))
+                if verbose: print(f"Reduciendo el servidor {server_id} a {current - 1} réplicas ({rate:.0f} mensajes/s)")
+                if self._terminate(pid, verbose=verbose):
+                    self._forget_process(pid)
+                self.last_scaled[server_id] = now
+
+    def _scale_up(self, server_id, replicas, verbose=True):
+        """Lanza las réplicas nuevas de un servidor en paralelo y espera su confirmación"""
+        try:
+            jobs = [functools.partial(self._spawn, [server_id], verbose=verbose, replica=replica) for replica in replicas]
+            self._run_parallel(f"Escalado del servidor {server_id}", jobs, verbose=verbose)
+        finally:
+            with self.lock:
+                self.scaling.pop(server_id, None)
+            # El enfriamiento cuenta desde que las réplicas nuevas están en marcha
+            self.last_scaled[server_id] = time.monotonic()
+
+    def _telemetry(self, server_id, pids):
+        """
+        Suma las casillas del tablero de telemetría de un servidor (una por réplica).
+        Devuelve None si ninguno de sus procesos ha publicado todavía.
+        """
+        readings = []
+        with self.lock:
+            slots = [self.telemetry_slots.get(pid, {}).get(server_id) for pid in pids]
+        for pid, slot in zip(pids, slots):
+            if slot is None:
+                continue
+            reading = self.telemetry.read(slot)
+            if reading and reading['pid'] == pid:
+                readings.append(reading)
+        if not readings:
+            return None
+        total = {name: sum(reading[name] for reading in readings) for name in ('rate_in', 'rate_out', 'errors')}
+        total['last_message'] = max(reading['last_message'] for reading in readings)
+        return total
+
+    def _resources(self, pids):
+        """CPU (%) y memoria residente (bytes) de los procesos indicados, según psutil"""
+        cpu = rss = 0
+        for pid in set(pids):
+            process = self.stats.get(pid)
+            if process is None:
+                continue
+            try:
+                with process.oneshot():
+                    cpu += process.cpu_percent()
+                    rss += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return cpu, rss
+
     def show_status(self):
-        """Muestra el estado actual de todos los procesos"""
+        """Muestra el estado actual de todos los procesos, con su actividad y consumo de recursos"""
         servers = self.get_servers()
         server_map = {str(server['id']): server for server in servers}
         
@@ -393,7 +1042,12 @@ class MQTTManager:
             'id': 5,
             'name': 20,
             'status': 10,
-            'pid': 10,
+            'pid': 20,
+            'rate': 13,
+            'errors': 7,
+            'last': 8,
+            'cpu': 6,
+            'rss': 8,
             'log': 30
         }
         
@@ -402,28 +1056,47 @@ class MQTTManager:
         
         print("\nEstado de los clientes MQTT:")
         print("-" * total_width)
-        print(f"{'ID':^{col_widths['id']}} | {'Nombre':^{col_widths['name']}} | {'Estado':^{col_widths['status']}} | {'PID':^{col_widths['pid']}} | {'Log':^{col_widths['log']}}")
+        print(f"{'ID':^{col_widths['id']}} | {'Nombre':^{col_widths['name']}} | {'Estado':^{col_widths['status']}} | {'PID':^{col_widths['pid']}} | {'Msg/s ent/sal':^{col_widths['rate']}} | {'Errores':^{col_widths['errors']}} | {'Últ. msg':^{col_widths['last']}} | {'CPU':^{col_widths['cpu']}} | {'Memoria':^{col_widths['rss']}} | {'Log':^{col_widths['log']}}")
         print("-" * total_width)
         
         # Mostrar servidores activos
-        for server_id, pid in self.processes.items():
+        for server_id, pids in self.processes.items():
             server = server_map.get(server_id, {'name': 'Desconocido'})
-            is_running = psutil.pid_exists(pid)
+            is_running = self._is_running(server_id)
+            pid = ','.join(map(str, pids))
             status = "Activo" if is_running else "Detenido"
             if not is_running and str(server_id) in self.paused_servers:
                 status = "Pausado"
+            elif not is_running and server_id in self.restarting:
+                status = "En bucle" if server_id in self.crash_looping else "Reinicio"
             
             log_file = self._get_latest_log(server_id)
             log_name = os.path.basename(log_file) if log_file else '-'
+
+            # Actividad según el tablero de telemetría y recursos según psutil
+            rate = errors = last = '-'
+            telemetry = self._telemetry(server_id, pids)
+            if telemetry:
+                rate = f"{telemetry['rate_in']:.0f}/{telemetry['rate_out']:.0f}"
+                errors = str(telemetry['errors'])
+                if telemetry['last_message']:
+                    last = f"{time.time() - telemetry['last_message']:.0f} s"
+            cpu, rss = self._resources(pids)
+            cpu = f"{cpu:.0f}%"
+            rss = f"{rss / 2**20:.0f} MB"
             
-            print(f"{server_id:^{col_widths['id']}} | {server['name'][:col_widths['name']]:^{col_widths['name']}} | {status:^{col_widths['status']}} | {pid:^{col_widths['pid']}} | {log_name[:col_widths['log']]:^{col_widths['log']}}")
+            print(f"{server_id:^{col_widths['id']}} | {server['name'][:col_widths['name']]:^{col_widths['name']}} | {status:^{col_widths['status']}} | {pid[:col_widths['pid']]:^{col_widths['pid']}} | {rate:^{col_widths['rate']}} | {errors:^{col_widths['errors']}} | {last:^{col_widths['last']}} | {cpu:^{col_widths['cpu']}} | {rss:^{col_widths['rss']}} | {log_name[:col_widths['log']]:^{col_widths['log']}}")
         
         # Mostrar servidores sin proceso
         for server in servers:
             server_id = str(server['id'])
             if server_id not in self.processes:
                 status = "Pausado" if server_id in self.paused_servers else "Detenido"
-                print(f"{server_id:^{col_widths['id']}} | {server['name'][:col_widths['name']]:^{col_widths['name']}} | {status:^{col_widths['status']}} | {'-':^{col_widths['pid']}} | {'-':^{col_widths['log']}}")
+                if server_id in self.crash_looping:
+                    status = "En bucle"
+                elif server_id in self.restarting:
+                    status = "Reinicio"
+                print(f"{server_id:^{col_widths['id']}} | {server['name'][:col_widths['name']]:^{col_widths['name']}} | {status:^{col_widths['status']}} | {'-':^{col_widths['pid']}} | {'-':^{col_widths['rate']}} | {'-':^{col_widths['errors']}} | {'-':^{col_widths['last']}} | {'-':^{col_widths['cpu']}} | {'-':^{col_widths['rss']}} | {'-':^{col_widths['log']}}")
         print("-" * total_width)
 
 def main():
@@ -434,7 +1107,9 @@ def main():
     # Crear y configurar el gestor
     manager = MQTTManager(
         refresh_interval=args.refresh,
-        retention_days=args.retention
+        retention_days=args.retention,
+        servers_per_worker=args.servers_per_worker,
+        replicas=args.replicas
     )
     
     # Menú principal
@@ -468,8 +1143,9 @@ def main():
             
             elif option == '5':
                 print("Deteniendo todos los clientes...")
-                for server_id in list(manager.processes.keys()):
-                    manager.stop_client(server_id, pause=False)
+                manager.stop_all()
+                manager.telemetry.close(unlink=True)
+                manager.profiler.stop()
                 break
             
             else:
@@ -477,8 +1153,9 @@ def main():
                 
         except KeyboardInterrupt:
             print("\nDeteniendo solicitada por el usuario...")
-            for server_id in list(manager.processes.keys()):
-                manager.stop_client(server_id, pause=False)
+            manager.stop_all()
+            manager.telemetry.close(unlink=True)
+            manager.profiler.stop()
             break
         except Exception as e:
             print(f"Error: {e}")
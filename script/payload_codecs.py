@@ -0,0 +1,171 @@
+# Importaciones de terceros
+import paho.mqtt.client as mqtt
+try:
+    import cbor2
+except ImportError:  # Dependencia opcional, solo necesaria con el códec cbor
+    cbor2 = None
+try:
+    import msgpack
+except ImportError:  # Dependencia opcional, solo necesaria con el códec msgpack
+    msgpack = None
+try:
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory, json_format
+except ImportError:  # Dependencia opcional, solo necesaria con el códec protobuf
+    descriptor_pool = None
+
+# Importaciones locales
+from json_utils import RawJSON, dumps, validate_json_object
+
+# Constantes internas
+TOPIC_CACHE_SIZE = 10000  # Topics recordados por selector con su códec ya resuelto
+
+
+class DecodedJSON(RawJSON):
+    """
+    Contenido decodificado desde un formato binario. Se codifica una sola vez a JSON para enviarlo
+    a la API y conserva el objeto ya decodificado para las etapas que necesitan su contenido.
+    """
+    __slots__ = ('parsed',)
+
+    def __init__(self, parsed):
+        if not isinstance(parsed, dict):
+            raise ValueError("el contenido debe ser un objeto")
+        try:
+            super().__init__(dumps(parsed))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"el contenido no se puede representar en JSON: {e}")
+        self.parsed = parsed
+
+    def value(self):
+        return self.parsed
+
+
+class Codec:
+    """Decodificador de payloads con nombre. decode devuelve un RawJSON o lanza ValueError."""
+
+    def __init__(self, name, decode):
+        self.name = name
+        self._decode = decode
+
+    def decode(self, payload):
+        try:
+            return self._decode(payload)
+        except ValueError:
+            raise
+        except Exception as e:
+            # Los errores de decodificación de cada biblioteca se tratan como contenido inválido
+            raise ValueError(str(e) or type(e).__name__)
+
+
+def _require(module, package, codec):
+    if module is None:
+        raise ValueError(f"el códec {codec} requiere el paquete {package} (pip install {package})")
+
+
+def _json_codec(options, descriptors):
+    # Camino rápido: se valida y se envían los bytes originales
+    return validate_json_object
+
+
+def _cbor_codec(options, descriptors):
+    _require(cbor2, 'cbor2', 'cbor')
+    return lambda payload: DecodedJSON(cbor2.loads(payload))
+
+
+def _msgpack_codec(options, descriptors):
+    _require(msgpack, 'msgpack', 'msgpack')
+    return lambda payload: DecodedJSON(msgpack.unpackb(payload, raw=False))
+
+
+_pools = {}  # Ruta del conjunto de descriptores -> pool de tipos de protobuf
+
+
+def _protobuf_codec(options, descriptors):
+    _require(descriptor_pool, 'protobuf', 'protobuf')
+    if not options:
+        raise ValueError("el códec protobuf necesita el tipo de mensaje (protobuf:<paquete.Mensaje>)")
+    if not descriptors:
+        raise ValueError("el códec protobuf necesita PROTOBUF_DESCRIPTORS (protoc --include_imports --descriptor_set_out)")
+    pool = _pools.get(descriptors)
+    if pool is None:
+        file_set = descriptor_pb2.FileDescriptorSet()
+        with open(descriptors, 'rb') as f:
+            file_set.ParseFromString(f.read())
+        pool = descriptor_pool.DescriptorPool()
+        for file_descriptor in file_set.file:
+            pool.Add(file_descriptor)
+        _pools[descriptors] = pool
+    try:
+        message_class = message_factory.GetMessageClass(pool.FindMessageTypeByName(options))
+    except KeyError:
+        raise ValueError(f"tipo de mensaje protobuf desconocido: {options}")
+    return lambda payload: DecodedJSON(
+        json_format.MessageToDict(message_class.FromString(payload), preserving_proto_field_name=True)
+    )
+
+
+# Registro de códecs: nombre -> función que crea el decodificador a partir de sus opciones
+CODECS = {
+    'json': _json_codec,
+    'cbor': _cbor_codec,
+    'msgpack': _msgpack_codec,
+    'protobuf': _protobuf_codec
+}
+
+_codecs = {}  # Especificación -> Codec ya creado
+
+
+def get_codec(spec, descriptors=None):
+    """
+    Devuelve el códec de una especificación 'nombre' o 'nombre:opciones' (ej: 'cbor', 'protobuf:sensores.Lectura').
+    Lanza ValueError si el códec no existe o no se puede crear.
+    """
+    spec = spec.strip()
+    codec = _codecs.get(spec)
+    if codec is None:
+        name, _, options = spec.partition(':')
+        factory = CODECS.get(name)
+        if factory is None:
+            raise ValueError(f"códec desconocido: {name} (disponibles: {', '.join(CODECS)})")
+        codec = _codecs[spec] = Codec(name, factory(options, descriptors))
+    return codec
+
+
+def parse_codec_rules(spec):
+    """
+    Parsea las reglas de códec por topic con el formato 'filtro=códec,filtro=códec'.
+    Ejemplo: '/+/+/attrs/cbor=cbor,/+/+/pb/#=protobuf:sensores.Lectura'
+    """
+    rules = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        topic_filter, separator, codec = item.rpartition('=')
+        if not separator or not topic_filter or not codec:
+            raise ValueError(f"Regla de códec inválida: {item} (formato esperado: filtro=códec)")
+        rules.append((topic_filter.strip(), codec.strip()))
+    return rules
+
+
+class CodecSelector:
+    """
+    Elige el códec de cada mensaje de un servidor: el de la primera regla cuyo filtro coincide con el topic
+    o, si ninguna coincide, el del servidor. El resultado se recuerda por topic.
+    """
+
+    def __init__(self, default, rules=(), descriptors=None):
+        self.default = get_codec(default, descriptors)
+        self.rules = [(topic_filter, get_codec(codec, descriptors)) for topic_filter, codec in rules]
+        self._topics = {}  # topic -> Codec
+
+    def for_topic(self, topic):
+        if not self.rules:
+            return self.default
+        codec = self._topics.get(topic)
+        if codec is None:
+            codec = next(
+                (rule_codec for topic_filter, rule_codec in self.rules if mqtt.topic_matches_sub(topic_filter, topic)),
+                self.default
+            )
+            if len(self._topics) >= TOPIC_CACHE_SIZE:
+                self._topics.clear()
+            self._topics[topic] = codec
+        return codec
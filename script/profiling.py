@@ -0,0 +1,218 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import time
+import signal
+import logging
+import threading
+import traceback
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# Importaciones de terceros
+import psutil
+
+# Constantes internas
+TRACE_FRAMES = 10      # Marcos de pila guardados por cada reserva de memoria con tracemalloc
+TOP_ALLOCATIONS = 25   # Líneas de código mostradas en cada comparación de instantáneas de memoria
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Herramientas de diagnóstico activables en un proceso en ejecución, sin reiniciarlo:
+    - SIGUSR1 inicia o detiene una sesión de perfilado: un hilo toma muestras de la pila de todos los hilos
+      cada sample_interval segundos (perfilador por muestreo, sin instrumentar el código) y, si
+      memory_interval > 0, tracemalloc compara cada memory_interval segundos la memoria reservada con la
+      instantánea anterior y con la del inicio. Al detenerla se escriben las pilas en formato plegado
+      (flamegraph.pl, speedscope, inferno).
+    - SIGUSR2 escribe las pilas de todos los hilos y el estado de los componentes registrados con add_state
+      (conexiones MQTT, pools HTTP, colas...).
+    Los ficheros se escriben en directory con el nombre del proceso, su PID y la fecha; report recibe
+    los avisos de cada fichero escrito.
+    """
+
+    def __init__(self, name, directory, sample_interval=0.01, memory_interval=60, report=logging.info):
+        self.name = name
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.memory_interval = memory_interval
+        self.report = report
+        self.states = {}  # nombre -> función que devuelve el estado de un componente
+        self.running = False
+        self._samples = Counter()  # tupla de (hilo, códigos de la raíz a la hoja) -> muestras
+        self._started = None
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def add_state(self, name, func):
+        """Registra un componente cuyo estado se incluye en el volcado de SIGUSR2."""
+        self.states[name] = func
+
+    def install(self):
+        """Asocia SIGUSR1 y SIGUSR2 (solo en sistemas POSIX)."""
+        if not hasattr(signal, 'SIGUSR1'):
+            return
+        # El trabajo se hace en otro hilo: el manejador solo interrumpe brevemente al hilo principal
+        signal.signal(signal.SIGUSR1, lambda sig, frame: threading.Thread(target=self.toggle, name='profiler-toggle').start())
+        signal.signal(signal.SIGUSR2, lambda sig, frame: threading.Thread(target=self.dump, name='profiler-dump').start())
+
+    def _path(self, kind, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return os.path.join(self.directory, f"{kind}_{self.name}_{os.getpid()}_{stamp}.{extension}")
+
+    # Sesión de perfilado
+    def toggle(self):
+        with self._lock:
+            if self.running:
+                self._stop()
+            else:
+                self._start()
+
+    def stop(self):
+        """Detiene la sesión de perfilado en curso, si la hay (al cerrar el proceso)."""
+        with self._lock:
+            if self.running:
+                self._stop()
+
+    def _start(self):
+        """Inicia el muestreo de pilas y, si está configurado, el seguimiento de memoria."""
+        self.running = True
+        self._samples.clear()
+        self._started = time.time()
+        self._stopping.clear()
+        self._threads = [threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)]
+        if self.memory_interval > 0:
+            self._threads.append(threading.Thread(target=self._trace_memory, name='profiler-memory', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        self.report(f"Perfilado iniciado (muestreo cada {self.sample_interval * 1000:g} ms); se detiene con SIGUSR1 (kill -USR1 {os.getpid()})")
+
+    def _stop(self):
+        """Detiene la sesión y escribe las pilas muestreadas en formato plegado."""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self.running = False
+        path = self._path('profile', 'folded')
+        samples = sum(self._samples.values())
+        with open(path, 'w', encoding='utf-8') as f:
+            for (thread_name, codes), count in self._samples.most_common():
+                f.write(';'.join([thread_name] + [_frame_label(code) for code in codes]) + f" {count}\n")
+        self.report(f"Perfilado detenido tras {time.time() - self._started:.0f} s: {samples} muestras en {path}")
+
+    def _sample(self):
+        """Toma muestras de las pilas de todos los hilos salvo los del propio perfilador."""
+        own = {threading.get_ident()}
+        while not self._stopping.wait(self.sample_interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident in own:
+                    continue
+                name = names.get(ident, str(ident))
+                if name.startswith('profiler-'):
+                    own.add(ident)
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                self._samples[(name, tuple(codes))] += 1
+
+    def _trace_memory(self):
+        """Compara periódicamente la memoria reservada con la instantánea anterior y con la inicial."""
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(TRACE_FRAMES)
+        path = self._path('memory', 'txt')
+        exclude = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        first = previous = tracemalloc.take_snapshot().filter_traces(exclude)
+        try:
+            while not self._stopping.wait(self.memory_interval):
+                snapshot = tracemalloc.take_snapshot().filter_traces(exclude)
+                self._write_memory(path, snapshot, previous, first)
+                previous = snapshot
+            snapshot = tracemalloc.take_snapshot().filter_traces(exclude)
+            self._write_memory(path, snapshot, previous, first)
+            self.report(f"Comparaciones de memoria en {path}")
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+    def _write_memory(self, path, snapshot, previous, first):
+        current, peak = tracemalloc.get_traced_memory()
+        rss = psutil.Process().memory_info().rss
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(f"=== {datetime.now().isoformat(timespec='seconds')} · RSS {rss / 1048576:.1f} MB · "
+                    f"reservado {current / 1048576:.1f} MB (máximo {peak / 1048576:.1f} MB)\n")
+            f.write(f"--- Cambios desde la instantánea anterior (top {TOP_ALLOCATIONS})\n")
+            for stat in snapshot.compare_to(previous, 'lineno')[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+            f.write(f"--- Cambios desde el inicio del perfilado (top {TOP_ALLOCATIONS})\n")
+            for stat in snapshot.compare_to(first, 'traceback')[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+                for line in stat.traceback.format()[-4:]:
+                    f.write(f"    {line}\n")
+            f.write("\n")
+
+    # Volcado de hilos y estado
+    def dump(self):
+        """Escribe las pilas de todos los hilos y el estado de los componentes registrados."""
+        path = self._path('threads', 'txt')
+        names = {thread.ident: thread for thread in threading.enumerate()}
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"Proceso {self.name} (PID {os.getpid()}) · {datetime.now().isoformat(timespec='seconds')}\n")
+            for name, func in self.states.items():
+                f.write(f"\n=== Estado: {name}\n")
+                try:
+                    state = func()
+                except Exception as e:
+                    state = f"error al obtener el estado: {e}"
+                if isinstance(state, dict):
+                    for key, value in state.items():
+                        f.write(f"{key}: {value}\n")
+                elif isinstance(state, list):
+                    for entry in state:
+                        f.write(f"{entry}\n")
+                else:
+                    f.write(f"{state}\n")
+            for ident, frame in sys._current_frames().items():
+                if ident == threading.get_ident():
+                    continue
+                thread = names.get(ident)
+                label = f"{thread.name} (daemon)" if thread is not None and thread.daemon else (thread.name if thread else str(ident))
+                f.write(f"\n=== Hilo {label} [{ident}]\n")
+                f.write(''.join(traceback.format_stack(frame)))
+        self.report(f"Pilas de los hilos y estado del proceso en {path}")
+
+
+def http_pool_state(session):
+    """Estado de los pools de conexiones de una sesión de requests (conexiones abiertas y libres por host)."""
+    state = {}
+    for prefix, adapter in session.adapters.items():
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            state[f"{prefix} {pool.host}:{pool.port}"] = (
+                f"conexiones creadas {pool.num_connections}, peticiones {pool.num_requests}, "
+                f"libres {pool.pool.qsize() if pool.pool else 0} de {pool.pool.maxsize if pool.pool else 0}"
+            )
+    return state or "sin conexiones"
+
+
+def mqtt_client_state(client):
+    """Estado interno de un cliente paho: conexión y colas de paquetes y mensajes."""
+    return (
+        f"conectado {client.is_connected()}, paquetes por escribir {len(getattr(client, '_out_packet', ()))}, "
+        f"mensajes salientes {len(getattr(client, '_out_messages', {}))}, mensajes entrantes QoS 2 {len(getattr(client, '_in_messages', {}))}, "
+        f"en vuelo {getattr(client, '_inflight_messages', 0)}/{getattr(client, '_max_inflight_messages', 0)}"
+    )
@@ -0,0 +1,465 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import gzip
+import time
+import json
+import base64
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+
+# Importaciones de terceros
+import requests
+from requests.adapters import HTTPAdapter
+
+# Importaciones locales
+import mqtt_client
+from mqtt_client import ENV_VARS, parse_topic, get_server, post_messages, write_messages, create_codecs
+from db_sink import DatabaseSink
+from device_registry import DeviceRegistry
+from payload_codecs import parse_codec_rules
+from json_utils import RawJSON, loads, dumps
+from aggregator import isoformat
+
+# Constantes internas
+PROGRESS_INTERVAL = 5      # Segundos entre líneas de progreso
+CHECKPOINT_INTERVAL = 5    # Segundos entre guardados del punto de control
+MAX_RETRY_DELAY = 60       # Espera máxima entre reintentos de un lote (segundos)
+MAX_BATCH_SIZE = 5000      # Mensajes por petición que admite /messages/bulk
+
+
+def batch_size(value):
+    """Tamaño de lote dentro del límite de /messages/bulk."""
+    size = int(value)
+    if not 1 <= size <= MAX_BATCH_SIZE:
+        raise argparse.ArgumentTypeError(f"debe estar entre 1 y {MAX_BATCH_SIZE} (límite de mensajes por petición de la API)")
+    return size
+
+
+def parse_arguments():
+    """Procesa los argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description='Importa capturas de tráfico MQTT (JSONL) a la base de datos con el mismo procesamiento que el cliente',
+        epilog='Ejemplo: python replay.py 1 <token> captura-1.jsonl captura-2.jsonl.gz --workers 16'
+    )
+    parser.add_argument('server_id', type=int,
+                        help='ID del servidor MQTT al que pertenecen los mensajes capturados')
+    parser.add_argument('token',
+                        help='Token de autenticación para la API')
+    parser.add_argument('files', nargs='+', metavar='fichero',
+                        help='Capturas JSONL (una línea {"topic", "payload", "timestamp"} por mensaje; admite .gz)')
+    parser.add_argument('--topic-format',
+                        help='Formato de topic de la captura (por defecto, el topicFormat actual del servidor)')
+    parser.add_argument('--batch-size', type=batch_size, default=MAX_BATCH_SIZE,
+                        help=f'Mensajes por petición a la API (como mucho {MAX_BATCH_SIZE})')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Lotes enviados en paralelo')
+    parser.add_argument('--checkpoint', default='replay_checkpoint.json',
+                        help='Fichero con la posición alcanzada en cada captura, para reanudar la importación')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignora el punto de control y empieza las capturas desde el principio')
+    return parser.parse_args()
+
+
+# Lectura de capturas
+def normalize_timestamp(value):
+    """
+    Convierte la marca de tiempo capturada al formato de los mensajes (ISO 8601 en UTC con sufijo Z).
+    Admite ISO 8601 (sin zona horaria se entiende UTC) y segundos o milisegundos desde epoch.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return isoformat(value / 1000 if value > 1e11 else value)
+    if isinstance(value, str):
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+    raise ValueError(f"marca de tiempo inválida: {value!r}")
+
+
+def read_lines(path, offset=0):
+    """Genera (posición tras la línea, línea) desde offset (en bytes descomprimidos para los .gz)."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        position = offset
+        for line in f:
+            position += len(line)
+            yield position, line
+
+
+class CaptureParser:
+    """Convierte las líneas de una captura en elementos (mensaje, apikey, server_id) como prepare_message."""
+
+    def __init__(self, server, topic_format):
+        self.server_id = server['id']
+        self.topic_format = topic_format
+        self.codecs = create_codecs()
+        self.invalid = {}  # Motivo -> líneas descartadas
+        self._lock = threading.Lock()
+
+    def _discard(self, reason):
+        with self._lock:
+            self.invalid[reason] = self.invalid.get(reason, 0) + 1
+
+    def parse(self, line):
+        """Devuelve el elemento de una línea, o None si se descarta."""
+        try:
+            record = loads(line)
+            topic = record['topic']
+            if not isinstance(topic, str):
+                raise TypeError(topic)
+        except (ValueError, TypeError, KeyError):
+            if line.strip():
+                self._discard('record')
+            return None
+
+        topic_data = parse_topic(topic, self.topic_format)
+        if not topic_data:
+            self._discard('topic')
+            return None
+
+        codec = self.codecs.for_topic(topic)
+        payload = record.get('payload')
+        try:
+            if 'payload_base64' in record:
+                content = codec.decode(base64.b64decode(record['payload_base64']))
+            elif isinstance(payload, dict) and codec.name == 'json':
+                # Ya es un objeto: se serializa una vez sin volver a validarlo
+                content = RawJSON(dumps(payload))
+            elif isinstance(payload, str):
+                content = codec.decode(payload.encode('utf-8'))
+            else:
+                content = codec.decode(dumps(payload))
+        except (ValueError, TypeError):
+            self._discard(codec.name)
+            return None
+
+        try:
+            timestamp = normalize_timestamp(record.get('timestamp'))
+        except (ValueError, TypeError):
+            self._discard('timestamp')
+            return None
+
+        message = {
+            "serial": topic_data['serial'],
+            "timestamp": timestamp,
+            "topic": topic,
+            "content": content
+        }
+        return message, topic_data['apikey'], self.server_id
+
+    def items(self, lines):
+        """Genera (posición, elemento o None) a partir de read_lines."""
+        for position, line in lines:
+            yield position, self.parse(line)
+
+
+def batches(items, size):
+    """Agrupa los elementos en lotes; genera (posición tras el lote, lote). El último lote puede ir vacío."""
+    batch = []
+    position = None
+    for position, item in items:
+        if item is not None:
+            batch.append(item)
+            if len(batch) >= size:
+                yield position, batch
+                batch = []
+    if position is not None:
+        yield position, batch
+
+
+# Punto de control
+class Checkpoint:
+    """
+    Posición importada de cada captura, guardada de forma atómica (fichero temporal + rename).
+    Como los lotes terminan en paralelo y en cualquier orden, la posición solo avanza hasta el final
+    del último lote cuyos anteriores también han terminado: al reanudar se repiten como mucho los lotes
+    que estaban en curso.
+    """
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.files = {}  # Ruta absoluta -> {'offset', 'size' (en disco), 'done'}
+        if not restart:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.files = json.load(f)['files']
+            except (OSError, ValueError, KeyError):
+                pass
+        self.saved_at = time.monotonic()
+
+    def start(self, path):
+        """Posición desde la que continuar una captura, o None si ya se importó entera."""
+        entry = self.files.get(os.path.abspath(path))
+        if entry is None:
+            return 0
+        size = os.path.getsize(path)
+        if size < entry['size']:
+            logging.warning(f"La captura {path} ha cambiado desde la última importación, se empieza desde el principio")
+            return 0
+        if entry['done'] and size == entry['size']:
+            return None
+        # Sin terminar, o terminada y ampliada después: se continúa desde la posición guardada
+        return entry['offset']
+
+    def advance(self, path, offset, done=False):
+        self.files[os.path.abspath(path)] = {'offset': offset, 'size': os.path.getsize(path), 'done': done}
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.saved_at = time.monotonic()
+
+
+# Envío
+class Importer:
+    """
+    Envía los lotes en paralelo: registra una vez por lote los dispositivos nuevos y guarda los mensajes
+    con una petición a /messages/bulk, reintentando los errores transitorios con espera exponencial.
+    No modifica lastCommunication de los dispositivos existentes, que refleja el tráfico en vivo.
+    Con direct, los lotes se escriben directamente en la base de datos (DB_SINK) con el upsert de dispositivos.
+    """
+
+    def __init__(self, registry, workers, direct=False):
+        self.registry = registry
+        self.direct = direct
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='replay')
+        # Pool aparte para registrar en paralelo los dispositivos nuevos de un lote
+        self.devices = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='replay-device')
+        self.stopping = threading.Event()
+        self.messages = 0   # Mensajes guardados
+        self.rejected = 0   # Mensajes que la API rechazó dentro de un lote guardado
+        self.failed = 0     # Mensajes de lotes que no se pudieron guardar por un error permanente
+        self._resolving = {}  # serial -> Event de los dispositivos que otro lote está registrando
+        self._lock = threading.Lock()
+
+    def _ensure(self, serial, apikey, last_communication, server_id):
+        """Registra un dispositivo; si otro lote ya lo está registrando, espera a que termine en lugar de repetirlo."""
+        if self.stopping.is_set():
+            return
+        with self._lock:
+            event = self._resolving.get(serial)
+            owner = event is None
+            if owner:
+                event = self._resolving[serial] = threading.Event()
+        if not owner:
+            event.wait()
+            return
+        try:
+            self.registry.ensure(serial, apikey, last_communication, server_id)
+        finally:
+            with self._lock:
+                del self._resolving[serial]
+            event.set()
+
+    def send(self, batch):
+        """Guarda un lote. Devuelve False si se interrumpió antes de conseguirlo o si el lote falló."""
+        if not batch:
+            return True
+        if self.direct:
+            return self._store(lambda: write_messages(batch))
+
+        devices = {}
+        for message, apikey, server_id in batch:
+            devices[message['serial']] = (apikey, message['timestamp'], server_id)
+        unknown = [
+            self.devices.submit(self._ensure, serial, *device)
+            for serial, device in devices.items() if not self.registry.is_cached(serial)
+        ]
+        wait(unknown)
+        if self.stopping.is_set():
+            return False
+
+        messages = [message for message, _, _ in batch]
+        return self._store(lambda: post_messages(messages))
+
+    def _store(self, store):
+        """
+        Llama a store hasta que no falla por un error transitorio, con espera exponencial entre intentos.
+        Devuelve False si se interrumpió o si el lote falló por un error permanente (no se debe dar por importado).
+        """
+        delay = 1
+        result = store()
+        while result is None:
+            if self.stopping.wait(delay):
+                return False
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+            result = store()
+        created, rejected, failed = result
+        with self._lock:
+            self.messages += created
+            self.rejected += rejected
+            self.failed += failed
+        return not failed
+
+
+class Progress:
+    """Línea de progreso periódica por captura."""
+
+    def __init__(self, importer, parser):
+        self.importer = importer
+        self.parser = parser
+        self.started = time.monotonic()
+        self.reported_at = self.started
+
+    def report(self, path, position, final=False):
+        now = time.monotonic()
+        if not final and now - self.reported_at < PROGRESS_INTERVAL:
+            return
+        self.reported_at = now
+        if path.endswith('.gz'):
+            done = f"{position / 1048576:.0f} MB descomprimidos"
+        else:
+            done = f"{100 * position / max(os.path.getsize(path), 1):.1f}%"
+        rate = self.importer.messages / max(now - self.started, 1e-9)
+        invalid = sum(self.parser.invalid.values())
+        print(f"{path}: {done} · {self.importer.messages} mensajes guardados ({rate:.0f} msg/s) · "
+              f"{self.importer.rejected} rechazados · {self.importer.failed} en lotes fallidos · {invalid} descartados", flush=True)
+
+
+def import_file(path, start, parser, importer, checkpoint, progress, batch_size, workers):
+    """
+    Importa una captura desde start con lotes en paralelo (como mucho 2 × workers en curso).
+    Devuelve False si la importación se interrumpió.
+    """
+    pending = {}     # Futuro -> número de lote
+    ends = {}        # Número de lote -> posición tras el lote
+    finished = set()
+    committed = 0    # Lotes confirmados de forma consecutiva
+    sequence = 0
+    ok = True
+
+    def collect(return_when):
+        nonlocal committed, ok
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            number = pending.pop(future)
+            try:
+                completed = future.result()
+            except Exception as e:
+                logging.error(f"Error inesperado al importar un lote de {path}: {e}")
+                completed = False
+            if completed:
+                finished.add(number)
+            else:
+                # Lote interrumpido o fallido: la posición no pasa de él y no se envían más lotes
+                ok = False
+        while committed + 1 in finished:
+            committed += 1
+            finished.discard(committed)
+            checkpoint.advance(path, ends.pop(committed))
+
+    for position, batch in batches(parser.items(read_lines(path, start)), batch_size):
+        if importer.stopping.is_set() or not ok:
+            break
+        sequence += 1
+        ends[sequence] = position
+        pending[importer.executor.submit(importer.send, batch)] = sequence
+        if len(pending) >= 2 * workers:
+            collect(FIRST_COMPLETED)
+        if time.monotonic() - checkpoint.saved_at >= CHECKPOINT_INTERVAL:
+            checkpoint.save()
+        progress.report(path, position)
+    if pending:
+        collect('ALL_COMPLETED')
+
+    complete = ok and not importer.stopping.is_set() and committed == sequence
+    if complete:
+        checkpoint.advance(path, position if sequence else start, done=True)
+    checkpoint.save()
+    progress.report(path, checkpoint.files.get(os.path.abspath(path), {}).get('offset', start), final=True)
+    return complete
+
+
+def main():
+    """Función principal"""
+    args = parse_arguments()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    # Configuración y sesión compartidas con el cliente MQTT
+    config = {name: os.getenv(name, default) for name, default in ENV_VARS.items()}
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=args.workers, pool_maxsize=args.workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Authorization': f"Bearer {args.token}"})
+    mqtt_client.config = config
+    mqtt_client.session = session
+
+    server = get_server(args.server_id)
+    if not server:
+        sys.exit(1)
+    try:
+        mqtt_client.codec_rules = parse_codec_rules(config['PAYLOAD_CODECS'])
+        parser = CaptureParser(server, args.topic_format or server['topicFormat'])
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    registry = DeviceRegistry(
+        session,
+        config['API_URL'],
+        ttl=float(config['DEVICE_CACHE_TTL']),
+        max_size=int(config['DEVICE_CACHE_SIZE']),
+        flush_interval=float(config['DEVICE_FLUSH_INTERVAL'])
+    )
+    mqtt_client.registry = registry
+    if config['DB_SINK']:
+        try:
+            mqtt_client.db_sink = DatabaseSink(config['DB_SINK'], pool_size=args.workers)
+        except Exception as e:
+            print(f"Error: no se pudo abrir la base de datos de DB_SINK: {e}")
+            sys.exit(1)
+    else:
+        registry.warm_up(server['id'])
+
+    importer = Importer(registry, args.workers, direct=mqtt_client.db_sink is not None)
+    checkpoint = Checkpoint(args.checkpoint, restart=args.restart)
+    progress = Progress(importer, parser)
+
+    # Ctrl+C o SIGTERM: terminar los lotes en curso y guardar el punto de control
+    def stop(sig, frame):
+        print("Interrumpiendo: se terminan los lotes en curso...", flush=True)
+        importer.stopping.set()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    complete = True
+    for path in args.files:
+        start = checkpoint.start(path)
+        if start is None:
+            print(f"{path}: ya importada, se omite")
+            continue
+        if start:
+            print(f"{path}: se reanuda desde el byte {start}")
+        if not import_file(path, start, parser, importer, checkpoint, progress, args.batch_size, args.workers):
+            complete = False
+            break
+    importer.executor.shutdown()
+    importer.devices.shutdown()
+
+    elapsed = time.monotonic() - progress.started
+    invalid = ', '.join(f"{reason}: {count}" for reason, count in sorted(parser.invalid.items())) or 'ninguno'
+    print(f"Mensajes guardados: {importer.messages} en {elapsed:.1f} s ({importer.messages / max(elapsed, 1e-9):.0f} msg/s)")
+    print(f"Rechazados por la API: {importer.rejected}")
+    print(f"Descartados por motivo: {invalid}")
+    if importer.failed:
+        print(f"Lotes fallidos: {importer.failed} mensajes no se pudieron guardar por un error permanente (ver el log); "
+              f"la importación se detuvo antes del primero de ellos")
+    if not complete:
+        print(f"Importación incompleta; vuelve a ejecutar el mismo comando para reanudarla desde {args.checkpoint}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
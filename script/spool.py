@@ -0,0 +1,487 @@
+# Importaciones de la biblioteca estándar
+import os
+import re
+import json
+import shutil
+import mmap
+import zlib
+import time
+import struct
+import logging
+import threading
+try:
+    import fcntl
+except ImportError:  # Solo en sistemas POSIX: sin él no se bloquean los directorios ni se adoptan spools huérfanos
+    fcntl = None
+
+# Constantes internas
+RECORD_HEADER = struct.Struct('<II')   # Longitud y CRC32 de cada registro
+SEGMENT_PREFIX = 'segment_'
+SEGMENT_SUFFIX = '.spool'
+OFFSETS_FILE = 'offsets.json'
+LOCK_FILE = '.lock'
+RETRY_MIN_DELAY = 1     # Espera inicial entre reintentos de reenvío (segundos)
+RETRY_MAX_DELAY = 60    # Espera máxima entre reintentos de reenvío (segundos)
+FSYNC_POLICIES = ('always', 'interval', 'never')
+TRANSIENT_STATUS_CODES = {401, 408, 429}  # Errores de la API que merece la pena reintentar, además de los 5xx
+
+
+def is_transient_error(status_code):
+    """Indica si un código de estado HTTP corresponde a un fallo transitorio de la API."""
+    return status_code >= 500 or status_code in TRANSIENT_STATUS_CODES
+
+
+class SpoolLocked(OSError):
+    """El directorio del spool está en uso por otro proceso."""
+
+
+def lock_directory(directory):
+    """
+    Bloquea un directorio de spool para el proceso actual mientras el descriptor devuelto siga abierto.
+    Lanza SpoolLocked si otro proceso lo tiene bloqueado. Sin fcntl no se bloquea y devuelve None.
+    """
+    os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        return None
+    path = os.path.join(directory, LOCK_FILE)
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            raise SpoolLocked(f"El spool {directory} está en uso por otro proceso")
+        # Si otro proceso borró el directorio (spool adoptado y vaciado) entre la apertura y el bloqueo,
+        # el bloqueo es sobre un fichero que ya no existe: se vuelve a crear y se reintenta
+        try:
+            if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+        os.makedirs(directory, exist_ok=True)
+
+
+class Segment:
+    """Fichero de tamaño fijo, preasignado y proyectado en memoria."""
+
+    def __init__(self, path, size=None, create=False):
+        self.path = path
+        if create:
+            self.file = open(path, 'w+b')
+            self.file.truncate(size)
+        else:
+            # Los segmentos existentes conservan su tamaño aunque cambie la configuración
+            self.file = open(path, 'r+b')
+            size = os.path.getsize(path)
+        self.size = size
+        self.map = mmap.mmap(self.file.fileno(), size)
+
+    def read_record(self, position):
+        """
+        Lee el registro en una posición.
+        Devuelve (datos, siguiente posición) o (None, posición) si no hay un registro válido.
+        """
+        if position + RECORD_HEADER.size > self.size:
+            return None, position
+        length, crc = RECORD_HEADER.unpack_from(self.map, position)
+        end = position + RECORD_HEADER.size + length
+        if length == 0 or end > self.size:
+            return None, position
+        data = self.map[position + RECORD_HEADER.size:end]
+        if zlib.crc32(data) != crc:
+            return None, position
+        return data, end
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+class Spool:
+    """
+    Cola persistente en disco para los mensajes que no se pueden entregar a la API.
+    Los mensajes se añaden al final de segmentos proyectados en memoria y un hilo
+    los reenvía en orden en cuanto la API vuelve a responder. La posición de lectura
+    se guarda de forma atómica tras cada lote reenviado, por lo que tras una caída
+    se reanuda desde el último lote confirmado (entrega al menos una vez).
+    """
+
+    def __init__(self, directory, send, batch_size, segment_size, max_bytes,
+                 fsync='interval', fsync_interval=1.0, serialize=None, deserialize=json.loads):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync inválida: {fsync} (valores admitidos: {', '.join(FSYNC_POLICIES)})")
+        if segment_size <= RECORD_HEADER.size:
+            raise ValueError(f"Tamaño de segmento del spool inválido: {segment_size} bytes")
+        if max_bytes < 2 * segment_size:
+            # Con un solo segmento el escritor nunca puede pasar al siguiente ni el lector liberar el actual:
+            # el spool quedaría lleno para siempre en cuanto se llenara el primero
+            raise ValueError(f"El espacio máximo del spool ({max_bytes} bytes) debe ser al menos dos segmentos ({2 * segment_size} bytes)")
+
+        self.directory = directory
+        self.send = send
+        self.batch_size = batch_size
+        self.segment_size = segment_size
+        self.max_segments = max_bytes // segment_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.serialize = serialize or (lambda item: json.dumps(item, separators=(',', ':')).encode('utf-8'))
+        self.deserialize = deserialize
+
+        # Métricas
+        self.appended = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.pending = 0
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._full = False
+        self._last_sync = time.monotonic()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='spool-replay', daemon=True)
+
+        self._lock_fd = lock_directory(directory)
+        try:
+            self._open()
+        except Exception:
+            self._unlock()
+            raise
+
+    # Gestión de segmentos
+    def _segment_path(self, sequence):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{sequence:012d}{SEGMENT_SUFFIX}")
+
+    def _list_segments(self):
+        sequences = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(SEGMENT_PREFIX) and filename.endswith(SEGMENT_SUFFIX):
+                sequences.append(int(filename[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(sequences)
+
+    def _open(self):
+        """Recupera el estado del spool tras un arranque: segmentos existentes, offsets y final de escritura."""
+        self.sequences = self._list_segments()
+        self.read_sequence, self.read_position = self._load_offsets()
+
+        # Descartar segmentos ya consumidos que no llegaron a borrarse
+        for sequence in [s for s in self.sequences if s < self.read_sequence]:
+            os.remove(self._segment_path(sequence))
+        self.sequences = [s for s in self.sequences if s >= self.read_sequence]
+
+        if not self.sequences:
+            self.sequences = [self.read_sequence]
+            self.read_position = 0
+            self.writer = Segment(self._segment_path(self.read_sequence), self.segment_size, create=True)
+        else:
+            self.writer = Segment(self._segment_path(self.sequences[-1]))
+        first, last = self.sequences[0], self.sequences[-1]
+        if first != self.read_sequence:
+            self.read_position = 0
+        self.read_sequence = first
+        self.reader = self.writer if first == last else Segment(self._segment_path(first))
+
+        # Recorrer los registros pendientes para contarlos y encontrar el final de escritura;
+        # un registro incompleto o corrupto (escritura interrumpida) marca el final
+        for sequence in self.sequences:
+            if sequence == last:
+                segment = self.writer
+            elif sequence == first:
+                segment = self.reader
+            else:
+                segment = Segment(self._segment_path(sequence))
+            position = self.read_position if sequence == first else 0
+            while True:
+                data, position = segment.read_record(position)
+                if data is None:
+                    break
+                self.pending += 1
+            if segment is not self.writer and segment is not self.reader:
+                segment.close()
+        self.write_position = position
+
+        if self.pending:
+            logging.info(f"Spool recuperado con {self.pending} mensajes pendientes de reenvío")
+
+    def _load_offsets(self):
+        try:
+            with open(os.path.join(self.directory, OFFSETS_FILE), encoding='utf-8') as f:
+                offsets = json.load(f)
+            return offsets['sequence'], offsets['position']
+        except (OSError, ValueError, KeyError):
+            sequences = self._list_segments()
+            return (sequences[0] if sequences else 0), 0
+
+    def _save_offsets(self):
+        """Guarda la posición de lectura de forma atómica (fichero temporal + rename)."""
+        path = os.path.join(self.directory, OFFSETS_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'sequence': self.read_sequence, 'position': self.read_position}, f)
+            if self.fsync != 'never':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _roll(self):
+        """Abre un nuevo segmento de escritura. Devuelve False si se agotaría el espacio asignado."""
+        if len(self.sequences) >= self.max_segments:
+            return False
+        self.writer.flush()
+        if self.writer is not self.reader:
+            self.writer.close()
+        sequence = self.sequences[-1] + 1
+        self.writer = Segment(self._segment_path(sequence), self.segment_size, create=True)
+        self.sequences.append(sequence)
+        self.write_position = 0
+        return True
+
+    # Escritura
+    def has_pending(self):
+        """Indica si hay mensajes en disco pendientes de reenvío."""
+        return self.pending > 0
+
+    def append(self, items):
+        """
+        Añade mensajes al final del spool.
+        Devuelve el número de mensajes que no cupieron en el espacio asignado.
+        """
+        rejected = 0
+        with self._lock:
+            for item in items:
+                data = self.serialize(item)
+                record_size = RECORD_HEADER.size + len(data)
+                if record_size > self.segment_size:
+                    logging.error(f"Mensaje de {len(data)} bytes demasiado grande para el spool")
+                    rejected += 1
+                    continue
+                if self.write_position + record_size > self.segment_size and not self._roll():
+                    rejected += 1
+                    continue
+
+                position = self.write_position
+                self.writer.map[position + RECORD_HEADER.size:position + record_size] = data
+                RECORD_HEADER.pack_into(self.writer.map, position, len(data), zlib.crc32(data))
+                self.write_position += record_size
+                self.pending += 1
+                self.appended += 1
+
+            if self.fsync == 'always':
+                self.writer.flush()
+            else:
+                self._dirty = True
+
+        # Avisar solo al llenarse, no por cada mensaje descartado
+        if rejected:
+            self.rejected += rejected
+            if not self._full:
+                logging.error(f"Spool lleno, se descartan los mensajes nuevos ({self.rejected} descartados en total)")
+            self._full = True
+        elif self._full:
+            logging.info("El spool vuelve a tener espacio")
+            self._full = False
+        return rejected
+
+    # Lectura y reenvío
+    def _read_batch(self):
+        """Lee hasta batch_size mensajes desde la posición de lectura sin confirmarlos."""
+        items = []
+        with self._lock:
+            sequence, position, reader = self.read_sequence, self.read_position, self.reader
+            while len(items) < self.batch_size:
+                # Nunca leer más allá de lo escrito en el segmento actual
+                if sequence == self.sequences[-1] and position >= self.write_position:
+                    break
+                data, next_position = reader.read_record(position)
+                if data is None:
+                    # Final del segmento: pasar al siguiente si el escritor ya no está en él
+                    if sequence == self.sequences[-1]:
+                        break
+                    if items:
+                        break
+                    self._advance_segment()
+                    sequence, position, reader = self.read_sequence, self.read_position, self.reader
+                    continue
+                items.append(self.deserialize(data))
+                position = next_position
+        return items, position
+
+    def _advance_segment(self):
+        """Cierra y borra el segmento de lectura actual, ya consumido. Requiere el lock."""
+        finished = self.read_sequence
+        if self.reader is not self.writer:
+            self.reader.close()
+        self.sequences.remove(finished)
+        os.remove(self._segment_path(finished))
+        self.read_sequence = self.sequences[0]
+        self.read_position = 0
+        self.reader = self.writer if self.read_sequence == self.sequences[-1] else \
+            Segment(self._segment_path(self.read_sequence))
+        self._save_offsets()
+
+    def _commit(self, position, count):
+        """Confirma como entregados los mensajes leídos hasta una posición."""
+        with self._lock:
+            self.read_position = position
+            self.pending -= count
+            self.replayed += count
+            self._save_offsets()
+
+    def start(self):
+        """Inicia el hilo de reenvío."""
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de reenvío, sincroniza el spool con el disco y libera el directorio."""
+        self._halt()
+        self._unlock()
+
+    def close(self, remove=False):
+        """
+        Detiene el spool y cierra sus segmentos (para descartarlo sin terminar el proceso).
+        Con remove se borra el directorio antes de liberarlo, para que nadie lo abra a medio borrar.
+        """
+        self._halt()
+        if self.reader is not self.writer:
+            self.reader.close()
+        self.writer.close()
+        if remove:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self._unlock()
+
+    def _halt(self):
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        with self._lock:
+            self.writer.flush()
+            self._save_offsets()
+        if self.pending:
+            logging.info(f"Spool cerrado con {self.pending} mensajes pendientes de reenvío")
+
+    def _unlock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self):
+        """Devuelve las métricas del spool."""
+        return {
+            'segments': len(self.sequences),
+            'bytes_on_disk': len(self.sequences) * self.segment_size,
+            'pending': self.pending,
+            'appended': self.appended,
+            'replayed': self.replayed,
+            'rejected': self.rejected
+        }
+
+    def _sync(self):
+        """Sincroniza con disco los datos escritos desde la última sincronización (política 'interval')."""
+        now = time.monotonic()
+        if now - self._last_sync < self.fsync_interval:
+            return
+        with self._lock:
+            if self._dirty and self.fsync == 'interval':
+                self.writer.flush()
+            self._dirty = False
+        self._last_sync = now
+
+    def _run(self):
+        """Bucle del hilo de reenvío: vacía el spool en orden y reintenta con espera exponencial si la API falla."""
+        delay = RETRY_MIN_DELAY
+        replaying = False
+        while not self._stopping.is_set():
+            self._sync()
+            items, position = self._read_batch()
+            if not items:
+                if replaying:
+                    logging.info(f"Spool vaciado: {self.replayed} mensajes reenviados en total")
+                    replaying = False
+                self._stopping.wait(min(self.fsync_interval, 0.5))
+                continue
+
+            if not replaying:
+                logging.info(f"Reenviando {self.pending} mensajes almacenados en el spool")
+                replaying = True
+
+            if self.send(items):
+                self._commit(position, len(items))
+                delay = RETRY_MIN_DELAY
+            else:
+                self._stopping.wait(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+
+
+class SpoolAdopter:
+    """
+    Reenvía los spools huérfanos de un servidor: los directorios <server_id> y <server_id>-* de
+    SPOOL_DIR que ningún proceso tiene bloqueados (réplicas retiradas por el escalado, procesos caídos
+    o nombres alternativos de réplicas que ya no existen). Cada interval segundos se abre cada spool
+    huérfano con factory y se vacía con su propio hilo de reenvío; una vez vacío se borra el directorio.
+    """
+
+    def __init__(self, spool_dir, server_id, factory, interval=30):
+        self.spool_dir = spool_dir
+        self.factory = factory
+        self.interval = interval
+        self.pattern = re.compile(rf"{re.escape(str(server_id))}(-\d+)?(\.\d+)?")
+        self.adopted = {}  # directorio -> Spool adoptado en reenvío
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='spool-adopter', daemon=True)
+
+    @property
+    def pending(self):
+        return sum(spool.pending for spool in list(self.adopted.values()))
+
+    def scan(self):
+        """Adopta los spools huérfanos nuevos y borra los adoptados que ya se han vaciado."""
+        for directory, spool in list(self.adopted.items()):
+            if not spool.has_pending():
+                spool.close(remove=True)
+                del self.adopted[directory]
+                logging.info(f"Spool huérfano {directory} vaciado y eliminado")
+        try:
+            names = os.listdir(self.spool_dir)
+        except OSError:
+            return
+        for name in names:
+            directory = os.path.join(self.spool_dir, name)
+            if directory in self.adopted or not self.pattern.fullmatch(name) or not os.path.isdir(directory):
+                continue
+            try:
+                spool = self.factory(directory)
+            except SpoolLocked:
+                continue  # En uso por su propia réplica o adoptado por otra
+            except (OSError, ValueError) as e:
+                logging.error(f"No se pudo abrir el spool huérfano {directory}: {e}")
+                continue
+            if not spool.has_pending():
+                spool.close(remove=True)
+                continue
+            logging.info(f"Adoptado el spool huérfano {directory} con {spool.pending} mensajes pendientes")
+            spool.start()
+            self.adopted[directory] = spool
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.scan()
+            except Exception as e:
+                logging.error(f"Error al adoptar spools huérfanos: {e}")
+            self._stopping.wait(self.interval)
+
+    def start(self):
+        if fcntl is not None:
+            self._thread.start()
+
+    def stop(self):
+        """Detiene la adopción y cierra los spools adoptados; lo que quede lo adoptará otro proceso."""
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        for spool in self.adopted.values():
+            spool.close(remove=not spool.has_pending())
+        self.adopted.clear()
@@ -0,0 +1,190 @@
+# Importaciones de la biblioteca estándar
+import os
+import time
+import mmap
+import struct
+import logging
+import tempfile
+import threading
+
+# Constantes internas
+TELEMETRY_VARIABLE = 'MQTT_TELEMETRY_FILE'    # Variable de entorno con la ruta del tablero
+SLOTS_VARIABLE = 'MQTT_TELEMETRY_SLOTS'       # Variable de entorno con las casillas del proceso: "<servidor>:<casilla>,..."
+SLOT_SIZE = 128                               # Bytes por casilla (un servidor en un proceso)
+SEQUENCE = struct.Struct('<Q')                # Contador de versión de la casilla (impar mientras se escribe)
+FIELDS = struct.Struct('<QQQQQQQdddd')        # Campos de la casilla, tras el contador de versión
+FIELD_NAMES = (
+    'pid', 'received', 'forwarded', 'errors', 'reconnects', 'queue', 'spool',
+    'last_message', 'rate_in', 'rate_out', 'updated'
+)
+READ_ATTEMPTS = 5                             # Lecturas de una casilla mientras se está escribiendo
+PUBLISH_INTERVAL = 1                          # Segundos entre publicaciones de los clientes
+
+
+def default_path():
+    """Ruta del tablero en memoria compartida (/dev/shm si existe) propia de este gestor."""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f"mqtt_telemetry_{os.getpid()}")
+
+
+def format_slots(slots):
+    """Codifica {servidor: casilla} para la variable de entorno del proceso cliente."""
+    return ','.join(f"{server_id}:{slot}" for server_id, slot in slots.items())
+
+
+def parse_slots(value):
+    """Decodifica la variable de entorno de casillas en {servidor: casilla}."""
+    slots = {}
+    for entry in filter(None, value.split(',')):
+        server_id, slot = entry.rsplit(':', 1)
+        slots[server_id] = int(slot)
+    return slots
+
+
+class TelemetryBoard:
+    """
+    Tablero de telemetría en memoria compartida (fichero proyectado con mmap).
+    Cada servidor atendido por un proceso cliente tiene una casilla de tamaño fijo con sus contadores;
+    el cliente la escribe y el gestor la lee sin llamadas a la API ni lecturas de disco.
+    Cada casilla lleva un contador de versión (seqlock): el escritor lo deja impar mientras escribe
+    y el lector repite la lectura si lo encuentra impar o cambia durante la lectura.
+    """
+
+    def __init__(self, path, slots=None):
+        """Abre el tablero; con slots lo crea (vacío) con ese número de casillas."""
+        self.path = path
+        flags = os.O_RDWR | (os.O_CREAT | os.O_TRUNC if slots else 0)
+        fd = os.open(path, flags, 0o600)
+        try:
+            if slots:
+                os.ftruncate(fd, slots * SLOT_SIZE)
+            size = os.fstat(fd).st_size
+            self.buffer = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.slots = size // SLOT_SIZE
+
+    def write(self, slot, **values):
+        """Publica los valores de una casilla."""
+        offset = slot * SLOT_SIZE
+        sequence = SEQUENCE.unpack_from(self.buffer, offset)[0] | 1
+        SEQUENCE.pack_into(self.buffer, offset, sequence)
+        FIELDS.pack_into(self.buffer, offset + SEQUENCE.size, *(values.get(name, 0) for name in FIELD_NAMES))
+        SEQUENCE.pack_into(self.buffer, offset, sequence + 1)
+
+    def read(self, slot):
+        """Devuelve los valores de una casilla, o None si está vacía o no se pudo leer de forma consistente."""
+        offset = slot * SLOT_SIZE
+        for _ in range(READ_ATTEMPTS):
+            before = SEQUENCE.unpack_from(self.buffer, offset)[0]
+            if before & 1:
+                time.sleep(0)
+                continue
+            values = FIELDS.unpack_from(self.buffer, offset + SEQUENCE.size)
+            if SEQUENCE.unpack_from(self.buffer, offset)[0] == before:
+                return dict(zip(FIELD_NAMES, values)) if before else None
+        return None
+
+    def clear(self, slot):
+        """Vacía una casilla para reutilizarla."""
+        offset = slot * SLOT_SIZE
+        self.buffer[offset:offset + SLOT_SIZE] = bytes(SLOT_SIZE)
+
+    def close(self, unlink=False):
+        self.buffer.close()
+        if unlink:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def _per_server(counter):
+    """Suma las series de un contador por servidor."""
+    totals = {}
+    for labels, value in counter.samples():
+        server_id = str(dict(labels).get('server'))
+        totals[server_id] = totals.get(server_id, 0) + value
+    return totals
+
+
+def _gauge_total(metrics, name, server_id=None):
+    """Suma las muestras de un medidor, solo las de un servidor si se indica."""
+    return sum(
+        value for labels, value in metrics.gauge_values(name)
+        if server_id is None or str(dict(labels).get('server')) == server_id
+    )
+
+
+class TelemetryPublisher:
+    """
+    Publica periódicamente en el tablero los contadores de cada servidor del proceso,
+    calculados a partir de las métricas del cliente (sin coste en el procesamiento de cada mensaje).
+    """
+
+    def __init__(self, board, slots, metrics, interval=PUBLISH_INTERVAL):
+        self.board = board
+        self.slots = slots  # servidor -> casilla
+        self.metrics = metrics
+        self.interval = interval
+        self.previous = {}  # servidor -> (instante, recibidos, reenviados, último mensaje)
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+
+    @classmethod
+    def from_environment(cls, metrics):
+        """Crea el publicador con el tablero indicado por el gestor, o None si no lo hay."""
+        path = os.environ.get(TELEMETRY_VARIABLE)
+        if not path:
+            return None
+        try:
+            return cls(TelemetryBoard(path), parse_slots(os.environ.get(SLOTS_VARIABLE, '')), metrics)
+        except (OSError, ValueError) as e:
+            logging.warning(f"No se pudo abrir el tablero de telemetría {path}: {e}")
+            return None
+
+    def start(self):
+        self._thread.start()
+
+    def publish(self):
+        now = time.time()
+        metrics = self.metrics
+        received = _per_server(metrics.received)
+        invalid = _per_server(metrics.invalid)
+        suppressed = _per_server(metrics.suppressed)
+        dropped = _per_server(metrics.dropped)
+        aggregated = _per_server(metrics.aggregated)
+        duplicates = _per_server(metrics.duplicates)
+        connects = _per_server(metrics.connects)
+        queue = _gauge_total(metrics, 'mqtt_client_queue_depth')
+        for server_id, slot in self.slots.items():
+            server_received = received.get(server_id, 0)
+            errors = invalid.get(server_id, 0) + dropped.get(server_id, 0)
+            forwarded = (server_received - errors - suppressed.get(server_id, 0) - aggregated.get(server_id, 0)
+                         - duplicates.get(server_id, 0))
+            started, last_received, last_forwarded, last_message = self.previous.get(server_id, (now, 0, 0, 0.0))
+            elapsed = now - started
+            if server_received > last_received:
+                last_message = now
+            self.previous[server_id] = (now, server_received, forwarded, last_message)
+            self.board.write(
+                slot,
+                pid=os.getpid(),
+                received=server_received,
+                forwarded=forwarded,
+                errors=errors,
+                reconnects=max(connects.get(server_id, 0) - 1, 0),
+                queue=queue,
+                spool=_gauge_total(metrics, 'mqtt_client_spool_pending', server_id),
+                last_message=last_message,
+                rate_in=(server_received - last_received) / elapsed if elapsed > 0 else 0.0,
+                rate_out=(forwarded - last_forwarded) / elapsed if elapsed > 0 else 0.0,
+                updated=now
+            )
+
+    def _run(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                logging.debug(f"Error al publicar la telemetría: {e}")
+            time.sleep(self.interval)
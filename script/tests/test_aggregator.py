@@ -0,0 +1,75 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+from json_utils import RawJSON, dumps
+
+try:
+    from aggregator import EdgeAggregator, np
+except ImportError:  # Dependencia opcional, sin paho-mqtt no se puede importar el agregador
+    np = None
+
+
+@unittest.skipIf(np is None, "la agregación requiere numpy y paho-mqtt")
+class EdgeAggregatorTest(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = EdgeAggregator(60)
+        self.emitted = []
+        self.aggregator.emit = self.emitted.extend
+
+    def add(self, content):
+        return self.aggregator.add('ABC', '/key/ABC/attrs', RawJSON(dumps(content)), 'key', 1)
+
+    def content(self):
+        self.aggregator.flush()
+        self.assertEqual(len(self.emitted), 1)
+        return self.emitted[0][0]['content']
+
+    def test_non_numeric_fields_keep_last_value(self):
+        self.assertTrue(self.add({'temperature': 20, 'unit': 'C', 'status': 'ok'}))
+        self.assertTrue(self.add({'temperature': 22, 'status': 'warning', 'location': {'room': 3}}))
+        content = self.content()
+        self.assertEqual(content['unit'], 'C')
+        self.assertEqual(content['status'], 'warning')
+        self.assertEqual(content['location'], {'room': 3})
+        self.assertEqual(content['temperature']['mean'], 21)
+
+    def test_numeric_field_wins_over_occasional_text(self):
+        self.add({'temperature': 20})
+        self.add({'temperature': 'error'})
+        self.add({'temperature': 24})
+        self.assertEqual(self.content()['temperature']['count'], 2)
+
+    def test_non_finite_values_are_not_aggregated(self):
+        self.add({'temperature': 20, 'humidity': 'nan'})
+        self.add({'temperature': 'inf', 'humidity': 40})
+        self.add({'temperature': '-Infinity', 'humidity': 50})
+        content = self.content()
+        self.assertEqual(content['temperature'], {'min': 20, 'max': 20, 'mean': 20, 'count': 1, 'last': 20})
+        self.assertEqual(content['humidity']['mean'], 45)
+        self.assertEqual(content['humidity']['count'], 2)
+
+    def test_only_non_finite_values_pass_through(self):
+        self.assertFalse(self.add({'temperature': 'nan', 'unit': 'C'}))
+        self.aggregator.flush()
+        self.assertEqual(self.emitted, [])
+
+    def test_series_limit_applies_to_new_fields_of_existing_groups(self):
+        self.aggregator.max_series = 2
+        self.assertTrue(self.add({'temperature': 20, 'humidity': 40}))
+        # Un campo nuevo en el mismo grupo superaría el límite: el mensaje se reenvía sin agregar
+        self.assertFalse(self.add({'temperature': 21, 'pressure': 1000}))
+        self.assertTrue(self.add({'temperature': 22, 'humidity': 42}))
+        self.assertEqual(len(self.aggregator), 2)
+        self.assertFalse(self.aggregator.add('DEF', '/key/DEF/attrs', RawJSON(dumps({'t': 1})), 'key', 1))
+        content = self.content()
+        self.assertNotIn('pressure', content)
+        self.assertEqual(content['temperature']['count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+from mqtt_manager import MQTTManager
+
+
+class AutoscaleTest(unittest.TestCase):
+    def setUp(self):
+        # Gestor con un servidor de una réplica (PID 100) y sin procesos reales
+        self.manager = MQTTManager.__new__(MQTTManager)
+        self.manager.lock = threading.RLock()
+        self.manager.sharded = True
+        self.manager.min_replicas = 1
+        self.manager.max_replicas = 4
+        self.manager.replica_target_rate = 100
+        self.manager.replica_max_backlog = 5000
+        self.manager.scale_cooldown = 0
+        self.manager.restart_parallelism = 4
+        self.manager.restart_jitter = 0
+        self.manager.processes = {'1': [100]}
+        self.manager.replicas = {100: 0}
+        self.manager.paused_servers = set()
+        self.manager.last_scaled = {}
+        self.manager.scaling = {}
+        self.release = threading.Event()
+        self.started = []
+
+        def spawn(server_ids, verbose=True, replica=None):
+            self.started.append(replica)
+            self.release.wait(5)
+            return 'ready'
+
+        self.spawn = mock.patch.object(self.manager, '_spawn', side_effect=spawn)
+        self.spawn.start()
+        self.addCleanup(self.spawn.stop)
+        self.addCleanup(self.release.set)
+        load = mock.patch.object(self.manager, '_read_load', return_value=(350, 0))
+        load.start()
+        self.addCleanup(load.stop)
+
+    def scale_threads(self):
+        return [thread for thread in threading.enumerate() if thread.name == 'scale-1']
+
+    def test_scale_up_does_not_block_the_caller(self):
+        self.manager.autoscale(verbose=False)
+        # Las tres réplicas siguen esperando confirmación, pero autoscale ya ha vuelto
+        self.assertEqual(self.manager.scaling, {'1': {1, 2, 3}})
+        self.assertEqual(self.manager._free_replica('1'), 4)
+
+        # Mientras arrancan, el servidor no se vuelve a evaluar
+        self.manager.autoscale(verbose=False)
+        self.assertEqual(len(self.scale_threads()), 1)
+
+        self.release.set()
+        for thread in self.scale_threads():
+            thread.join(5)
+        self.assertEqual(sorted(self.started), [1, 2, 3])
+        self.assertEqual(self.manager.scaling, {})
+        self.assertIn('1', self.manager.last_scaled)
+
+
+if __name__ == '__main__':
+    unittest.main()
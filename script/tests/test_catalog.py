@@ -0,0 +1,74 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import mqtt_manager
+from mqtt_manager import MQTTManager, diff_catalogs
+
+
+def server(server_id, **fields):
+    return dict({'id': server_id, 'name': f'server {server_id}', 'endpoint': 'broker:1883', 'topicFormat': '/{apikey}/{serial}/{type}'}, **fields)
+
+
+def response(status_code, body=None, etag=None):
+    return mock.Mock(status_code=status_code, json=mock.Mock(return_value=body), headers={'ETag': etag} if etag else {}, text='')
+
+
+class DiffCatalogsTest(unittest.TestCase):
+    def test_added_removed_and_changed(self):
+        old = {'1': server(1), '2': server(2), '3': server(3)}
+        new = {'1': server(1), '3': server(3, topicFormat='/{apikey}/{serial}/attrs'), '4': server(4)}
+        self.assertEqual(diff_catalogs(old, new), (['4'], ['2'], ['3']))
+        self.assertEqual(diff_catalogs(new, new), ([], [], []))
+
+
+class RefreshCatalogTest(unittest.TestCase):
+    def setUp(self):
+        # Solo el estado que usa el catálogo: sin token de Keycloak, logs ni tablero de telemetría
+        self.manager = MQTTManager.__new__(MQTTManager)
+        self.manager.config = {'API_URL': 'http://api'}
+        self.manager.token = 'token'
+        self.manager.catalog = {}
+        self.manager.catalog_etag = None
+        self.manager.catalog_loaded = False
+
+    def refresh(self, reply):
+        with mock.patch.object(mqtt_manager.requests, 'get', return_value=reply) as get:
+            changes = self.manager.refresh_catalog()
+        return changes, get.call_args.kwargs['headers']
+
+    def test_conditional_requests(self):
+        changes, headers = self.refresh(response(200, [server(1), server(2)], etag='"v1"'))
+        self.assertEqual(changes, (['1', '2'], [], []))
+        self.assertNotIn('If-None-Match', headers)
+        self.assertEqual(self.manager.catalog_etag, '"v1"')
+
+        # Sin cambios: 304 sin cuerpo, se conserva la instantánea
+        changes, headers = self.refresh(response(304))
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertEqual(changes, ([], [], []))
+        self.assertEqual(sorted(self.manager.catalog), ['1', '2'])
+
+        changes, headers = self.refresh(response(200, [server(1, endpoint='other:1883')], etag='"v2"'))
+        self.assertEqual(changes, ([], ['2'], ['1']))
+        self.assertEqual(self.manager.catalog['1']['endpoint'], 'other:1883')
+        self.assertEqual(self.manager.catalog_etag, '"v2"')
+
+    def test_errors_keep_the_previous_snapshot(self):
+        self.refresh(response(200, [server(1)], etag='"v1"'))
+        with mock.patch('builtins.print'):
+            changes, _ = self.refresh(response(500))
+            with mock.patch.object(mqtt_manager.requests, 'get', side_effect=mqtt_manager.requests.ConnectionError()):
+                self.assertEqual(self.manager.refresh_catalog(), ([], [], []))
+        self.assertEqual(changes, ([], [], []))
+        self.assertEqual(list(self.manager.catalog), ['1'])
+        self.assertEqual(self.manager.catalog_etag, '"v1"')
+
+
+if __name__ == '__main__':
+    unittest.main()
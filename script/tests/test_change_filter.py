@@ -0,0 +1,76 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+from change_filter import ChangeFilter, parse_field_deadbands
+from json_utils import RawJSON, dumps
+
+
+def content(**fields):
+    return RawJSON(dumps(fields))
+
+
+class ChangeFilterTest(unittest.TestCase):
+    def forwarded(self, change_filter, *contents, serial='ABC', topic='/key/ABC/attrs'):
+        return [change_filter.should_forward(serial, topic, value) for value in contents]
+
+    def test_identical_content_is_suppressed(self):
+        change_filter = ChangeFilter(heartbeat=0)
+        self.assertEqual(self.forwarded(change_filter, content(t=20), content(t=20), content(t=21)), [True, False, True])
+
+    def test_keys_are_per_serial_and_topic(self):
+        change_filter = ChangeFilter(heartbeat=0)
+        self.assertTrue(change_filter.should_forward('A', '/key/A/attrs', content(t=20)))
+        self.assertTrue(change_filter.should_forward('B', '/key/B/attrs', content(t=20)))
+        self.assertTrue(change_filter.should_forward('A', '/key/A/cmd', content(t=20)))
+
+    def test_deadband_compares_with_last_forwarded_value(self):
+        change_filter = ChangeFilter(heartbeat=0, deadband=1)
+        # Una deriva lenta acaba reenviándose al superar el margen respecto al último reenviado
+        results = self.forwarded(change_filter, content(t=20), content(t=20.4), content(t=20.8), content(t=21.2), content(t=21.5))
+        self.assertEqual(results, [True, False, False, True, False])
+
+    def test_field_deadbands_and_non_numeric_changes(self):
+        change_filter = ChangeFilter(heartbeat=0, field_deadbands={'t': 0.5})
+        results = self.forwarded(
+            change_filter,
+            content(t=20, h=50, unit='C'),
+            content(t=20.2, h=50, unit='C'),   # t dentro de su margen
+            content(t=20.2, h=51, unit='C'),   # h sin margen
+            content(t=20.2, h=51, unit='F'),   # texto distinto
+            content(t=20.2, h=51)              # campos distintos
+        )
+        self.assertEqual(results, [True, False, True, True, True])
+
+    def test_heartbeat_forwards_unchanged_content(self):
+        change_filter = ChangeFilter(heartbeat=60)
+        with mock.patch('change_filter.time.monotonic', side_effect=[0, 30, 61, 90]):
+            results = self.forwarded(change_filter, *[content(t=20)] * 4)
+        self.assertEqual(results, [True, False, True, False])
+
+    def test_entries_are_bounded(self):
+        change_filter = ChangeFilter(heartbeat=0, max_entries=2)
+        for serial in ('A', 'B', 'C'):
+            change_filter.should_forward(serial, 'topic', content(t=1))
+        self.assertEqual(len(change_filter), 2)
+        # El menos usado (A) se ha olvidado y vuelve a reenviarse
+        self.assertTrue(change_filter.should_forward('A', 'topic', content(t=1)))
+
+
+class ParseFieldDeadbandsTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_field_deadbands('temperature=0.5, humidity=2'), {'temperature': 0.5, 'humidity': 2.0})
+        self.assertEqual(parse_field_deadbands(''), {})
+        for spec in ('temperature', '=1', 'temperature=x'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    parse_field_deadbands(spec)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import json
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+from control import ControlStream
+
+
+class ChunkedStream:
+    """Tubería simulada que escribe cada línea en trozos, cediendo el hilo entre uno y otro."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        for start in range(0, len(data), 8):
+            self.chunks.append(data[start:start + 8])
+            time.sleep(0)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class ControlStreamTest(unittest.TestCase):
+    def test_concurrent_commands_are_not_interleaved(self):
+        stream = ChunkedStream()
+        control = ControlStream(stream)
+
+        def send(sender):
+            for index in range(20):
+                control.send('token', token=f"{sender}-{index}-" + 'x' * 64)
+
+        threads = [threading.Thread(target=send, args=(sender,)) for sender in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        lines = ''.join(stream.chunks).splitlines()
+        self.assertEqual(len(lines), 80)
+        for line in lines:
+            self.assertEqual(json.loads(line)['command'], 'token')
+
+    def test_closed_channel(self):
+        control = ControlStream(ChunkedStream())
+        self.assertTrue(control.send('servers', servers=[]))
+        control.close()
+        self.assertFalse(control.send('servers', servers=[]))
+
+
+if __name__ == '__main__':
+    unittest.main()
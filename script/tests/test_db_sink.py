@@ -0,0 +1,98 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import db_sink
+from db_sink import DatabaseSink
+
+
+def batch(serial, count=3):
+    return [
+        ({'serial': serial, 'timestamp': '2024-01-01T00:00:00.000Z', 'topic': f'/key/{serial}/attrs', 'content': {'i': i}}, 'key', 1)
+        for i in range(count)
+    ]
+
+
+class DatabaseSinkPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sink = DatabaseSink(f"sqlite:///{self.directory.name}/sink.db", pool_size=1)
+
+    def tearDown(self):
+        self.sink.close()
+        self.directory.cleanup()
+
+    def test_transient_error_under_contention_does_not_block_waiters(self):
+        """Una conexión rota por un error transitorio libera su hueco del pool para los hilos en espera."""
+        insert = self.sink._insert
+        failed = threading.Event()
+
+        def failing_insert(cursor, prefix, rows, suffix=''):
+            if not failed.is_set():
+                failed.set()
+                time.sleep(0.2)  # Los demás hilos esperan a la única conexión del pool
+                raise sqlite3.OperationalError("database is locked")
+            return insert(cursor, prefix, rows, suffix)
+
+        self.sink._insert = failing_insert
+        results = []
+        threads = [threading.Thread(target=lambda serial=serial: results.append(self.sink.write(batch(serial))), daemon=True)
+                   for serial in ('a', 'b', 'c')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(sorted(results, key=str), [(3, 0), (3, 0), None])
+
+    def test_connection_failures_release_the_pool(self):
+        """Si no se puede abrir una conexión, el hueco queda libre para el siguiente intento."""
+        connect = self.sink._connect
+        attempts = []
+
+        def flaky_connect():
+            attempts.append(1)
+            if len(attempts) <= 2:
+                raise sqlite3.OperationalError("database is locked")
+            return connect()
+
+        self.sink._connect = flaky_connect
+        self.assertIsNone(self.sink.write(batch('a')))
+        self.assertIsNone(self.sink.write(batch('a')))
+        self.assertEqual(self.sink.write(batch('a')), (3, 0))
+
+
+    def test_schema_errors_are_permanent(self):
+        """Una tabla inexistente no se reintenta: el lote se cuenta como rechazado."""
+        connection = sqlite3.connect(f"{self.directory.name}/sink.db")
+        connection.execute("DROP TABLE Messages")
+        connection.close()
+        self.assertEqual(self.sink.write(batch('a')), (0, 3))
+
+    def test_error_classification(self):
+        self.assertTrue(db_sink.is_sqlite_transient(sqlite3.OperationalError("database is locked")))
+        self.assertFalse(db_sink.is_sqlite_transient(sqlite3.OperationalError("no such table: Messages")))
+        self.assertFalse(db_sink.is_sqlite_transient(sqlite3.OperationalError('near "INSERT": syntax error')))
+        self.assertFalse(db_sink.is_sqlite_transient(sqlite3.IntegrityError("database is locked")))
+
+    @unittest.skipIf(db_sink.pymysql is None, "requiere pymysql")
+    def test_mysql_error_classification(self):
+        errors = db_sink.pymysql.err
+        self.assertTrue(db_sink.is_mysql_transient(errors.OperationalError(2013, "Lost connection to MySQL server")))
+        self.assertTrue(db_sink.is_mysql_transient(errors.OperationalError(1213, "Deadlock found")))
+        self.assertTrue(db_sink.is_mysql_transient(errors.InterfaceError(0, "")))
+        self.assertFalse(db_sink.is_mysql_transient(errors.OperationalError(1054, "Unknown column")))
+        self.assertFalse(db_sink.is_mysql_transient(errors.OperationalError(1045, "Access denied")))
+
+
+if __name__ == '__main__':
+    unittest.main()
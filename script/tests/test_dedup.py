@@ -0,0 +1,165 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import dedup as dedup_module
+from dedup import DedupIndex, message_key
+from flow_control import InflightWindow
+
+
+class Clock:
+    """Reloj manual para dedup.time.time."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class DedupIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock(1000)
+        patcher = mock.patch.object(dedup_module.time, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rotate(self, index, now):
+        self.clock.now = now
+        with index._lock:
+            index._rotate(now)
+
+    def test_duplicates_within_the_window(self):
+        index = DedupIndex(40)  # Generaciones de 10 s
+        self.assertFalse(index.seen(1))
+        self.assertTrue(index.seen(1))
+        self.assertNotEqual(message_key('A', 't', b'x'), message_key('B', 't', b'x'))
+        self.assertNotEqual(message_key('A', 't', b'x'), message_key('A', 't2', b'x'))
+
+    def test_generation_rollover(self):
+        index = DedupIndex(40)
+        index.seen(1)
+        self.rotate(index, 1010)
+        index.seen(2)
+        self.rotate(index, 1020)
+        self.assertEqual(len(index._frozen), 2)
+        self.assertEqual(list(index._frozen[0][1]), [1])
+        # La generación de 1000 cubre hasta 1010: sigue dentro de la ventana hasta 1050
+        self.rotate(index, 1049)
+        self.assertEqual(len(index), 2)
+        self.rotate(index, 1050)
+        self.assertEqual(len(index), 1)
+        self.assertFalse(index.seen(1))
+        self.assertTrue(index.seen(2))
+
+    def test_frozen_key_is_renewed_when_seen(self):
+        index = DedupIndex(40)
+        index.seen(1)
+        self.rotate(index, 1010)
+        self.assertTrue(index.seen(1))
+        # Renovada en la generación de 1010: sobrevive a la caducidad de la generación original
+        self.rotate(index, 1050)
+        self.assertTrue(index.seen(1))
+
+    def test_forget_frozen_key(self):
+        index = DedupIndex(40)
+        index.seen(1)
+        self.rotate(index, 1010)
+        index.forget(1)
+        self.assertFalse(index.seen(1))  # La reentrega se acepta una vez
+        self.assertTrue(index.seen(1))
+
+    def test_max_entries_evicts_generations_early(self):
+        index = DedupIndex(40, max_entries=8)  # Generaciones de 2 claves como máximo
+        with self.assertLogs(level='WARNING'):
+            for key in range(12):
+                index.seen(key)
+        self.assertGreater(index.evicted, 0)
+        self.assertLessEqual(len(index), 8 + 2)
+        self.assertFalse(index.seen(0))
+
+
+class DedupSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock(1000)
+        patcher = mock.patch.object(dedup_module.time, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.path = os.path.join(directory, 'dedup', '1-0.bin')
+
+    def test_snapshot_reload(self):
+        index = DedupIndex(40, snapshot_path=self.path)
+        index.seen(1)
+        self.clock.now = 1010
+        index.seen(2)
+        index.stop()  # Congela la generación actual y guarda
+        self.clock.now = 1020
+        reloaded = DedupIndex(40, snapshot_path=self.path)
+        self.assertEqual(len(reloaded), 2)
+        self.assertTrue(reloaded.seen(1))
+        self.assertTrue(reloaded.seen(2))
+        self.assertFalse(reloaded.seen(3))
+
+    def test_expired_generations_are_not_loaded(self):
+        index = DedupIndex(40, snapshot_path=self.path)
+        index.seen(1)
+        index.stop()
+        self.clock.now = 1050
+        self.assertEqual(len(DedupIndex(40, snapshot_path=self.path)), 0)
+
+    def test_damaged_snapshots(self):
+        index = DedupIndex(40, snapshot_path=self.path)
+        for key in range(3):
+            index.seen(key)
+        index.stop()
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(data[:-4])
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(len(DedupIndex(40, snapshot_path=self.path)), 0)
+        with open(self.path, 'wb') as f:
+            f.write(b'other')
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(len(DedupIndex(40, snapshot_path=self.path)), 0)
+
+
+class UndeliveredTest(unittest.TestCase):
+    def setUp(self):
+        self.dedup = DedupIndex(60)
+        # Ventana sin límite ni confirmación manual: solo lleva la clave del mensaje hasta su entrega
+        self.window = InflightWindow(0)
+        self.window.on_undelivered = self.dedup.forget
+        self.msg = SimpleNamespace(mid=1, qos=1)
+
+    def receive(self):
+        key = message_key('ABC', '/key/ABC/attrs', b'{"t":1}')
+        delivery = self.window.track(None, self.msg)
+        self.assertFalse(self.dedup.seen(key))
+        delivery.key = key
+        return key, delivery
+
+    def test_dropped_message_is_forgotten(self):
+        key, delivery = self.receive()
+        delivery.done(durable=False)
+        self.assertFalse(self.dedup.seen(key))
+        self.assertEqual(len(self.window), 0)
+
+    def test_delivered_message_is_remembered(self):
+        key, delivery = self.receive()
+        delivery.done()
+        self.assertTrue(self.dedup.seen(key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import device_registry
+from device_registry import DeviceRegistry
+
+
+def response(status_code, body=None):
+    return mock.Mock(status_code=status_code, json=mock.Mock(return_value=body), text='')
+
+
+class DeviceRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(device_registry.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = mock.Mock()
+        self.session.get.side_effect = lambda url, **kwargs: response(200, {'id': int(url.rsplit('/', 1)[1][1:])})
+        self.session.patch.return_value = response(200)
+        self.registry = DeviceRegistry(self.session, 'http://api', ttl=60, max_size=2, flush_interval=10)
+
+    def communicate(self, serial, timestamp='2026-01-01T00:00:00Z'):
+        self.registry.update_or_create(serial, 'key', timestamp, 1)
+
+    def test_writes_are_throttled_per_device(self):
+        self.communicate('S1')
+        self.assertEqual(self.registry.flush(), 1)
+        self.communicate('S1')
+        self.now += 5
+        self.assertEqual(self.registry.flush(), 0)
+        self.now += 5
+        self.assertEqual(self.registry.flush(), 1)
+
+    def test_last_write_is_bounded_by_the_cache(self):
+        for serial in ('S1', 'S2', 'S3'):
+            self.communicate(serial)
+        self.registry.flush()
+        # S1 se desalojó por LRU antes de escribirse: no se recuerda su escritura
+        self.assertEqual(sorted(self.registry._last_write), ['S2', 'S3'])
+
+        # Al caducar por TTL también se olvida la última escritura
+        self.now += 61
+        self.assertFalse(self.registry.is_cached('S2'))
+        self.assertEqual(sorted(self.registry._last_write), ['S3'])
+
+        self.registry.invalidate('S3')
+        self.assertEqual(self.registry._last_write, {})
+
+    def test_warm_up_reports_cached_devices(self):
+        self.session.get.side_effect = None
+        self.session.get.return_value = response(200, [{'serial': f'S{i}', 'id': i} for i in range(5)])
+        with self.assertLogs(level='INFO') as logs:
+            self.assertEqual(self.registry.warm_up(1), 2)
+        self.assertIn('2 de 5', logs.output[0])
+        self.assertEqual(len(self.registry), 2)
+        self.assertTrue(self.registry.is_cached('S4'))
+        self.assertFalse(self.registry.is_cached('S0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
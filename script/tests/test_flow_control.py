@@ -0,0 +1,91 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+from flow_control import InflightWindow
+
+
+def message(mid, qos=1):
+    return SimpleNamespace(mid=mid, qos=qos)
+
+
+class ManualAckTest(unittest.TestCase):
+    def test_ack_only_on_durable_delivery(self):
+        client = mock.Mock()
+        window = InflightWindow(10, manual_ack=True)
+        window.track(client, message(1)).done()
+        window.track(client, message(2)).done(durable=False)
+        window.track(client, message(3, qos=0)).done()
+        client.ack.assert_called_once_with(1, 1)
+        self.assertEqual(window.unacked, 1)
+        self.assertEqual(len(window), 0)
+
+    def test_without_manual_ack_nothing_is_acked(self):
+        client = mock.Mock()
+        window = InflightWindow(10)
+        window.track(client, message(1)).done()
+        client.ack.assert_not_called()
+
+
+class BlockingWindowTest(unittest.TestCase):
+    def test_track_waits_for_a_free_slot(self):
+        window = InflightWindow(2)
+        deliveries = [window.track(None, message(mid)) for mid in (1, 2)]
+        tracked = threading.Event()
+        thread = threading.Thread(target=lambda: (window.track(None, message(3)), tracked.set()))
+        thread.start()
+        self.assertFalse(tracked.wait(0.1))
+        self.assertEqual(window.pauses, 1)
+        deliveries[0].done()
+        self.assertTrue(tracked.wait(1))
+        thread.join(1)
+        self.assertEqual(len(window), 2)
+
+    def test_pause_is_bounded(self):
+        window = InflightWindow(1, max_pause=0.05)
+        window.track(None, message(1))
+        with self.assertLogs(level='WARNING'):
+            window.track(None, message(2))
+        self.assertEqual(len(window), 2)
+
+
+class NonBlockingWindowTest(unittest.TestCase):
+    def setUp(self):
+        self.window = InflightWindow(4)
+        self.window.on_pause = mock.Mock()
+        self.window.on_resume = mock.Mock()
+
+    def test_pause_when_full_and_resume_below_half(self):
+        deliveries = [self.window.track(None, message(mid), block=False) for mid in range(4)]
+        self.window.on_pause.assert_called_once_with()
+        self.assertTrue(self.window.paused)
+        deliveries[0].done()
+        self.window.on_resume.assert_not_called()
+        deliveries[1].done()
+        self.window.on_resume.assert_called_once_with()
+        self.assertFalse(self.window.paused)
+        # Por encima del límite sigue aceptando mensajes (ya leídos del socket), sin volver a avisar
+        for mid in range(4, 8):
+            self.window.track(None, message(mid), block=False)
+        self.assertEqual(self.window.on_pause.call_count, 2)
+        self.assertEqual(len(self.window), 6)
+
+    def test_force_resume(self):
+        for mid in range(4):
+            self.window.track(None, message(mid), block=False)
+        with self.assertLogs(level='WARNING'):
+            self.window.force_resume()
+        self.window.on_resume.assert_called_once_with()
+        self.window.force_resume()  # Ya reanudada: no vuelve a avisar
+        self.window.on_resume.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import importlib.util
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import json_utils
+
+
+def stdlib_json_utils():
+    """Carga una copia de json_utils que usa el módulo json estándar aunque orjson esté instalado."""
+    with mock.patch.dict(sys.modules, {'orjson': None}):
+        spec = importlib.util.spec_from_file_location('json_utils_stdlib', json_utils.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+class NonFiniteValuesTest(unittest.TestCase):
+    PAYLOADS = [b'{"t": NaN}', b'{"t": Infinity}', b'{"t": -Infinity}', b'{"t": [1, NaN]}']
+
+    def check(self, module):
+        for payload in self.PAYLOADS:
+            with self.subTest(payload=payload):
+                with self.assertRaises(ValueError):
+                    module.validate_json_object(payload)
+        self.assertEqual(module.validate_json_object(b'{"t": 1.5}').value(), {'t': 1.5})
+
+    def test_default_parser_rejects_non_finite(self):
+        self.check(json_utils)
+
+    def test_stdlib_parser_rejects_non_finite(self):
+        module = stdlib_json_utils()
+        self.assertIsNone(module.orjson)
+        self.check(module)
+        with self.assertRaises(ValueError):
+            module.dumps({'t': float('nan')})
+
+
+if __name__ == '__main__':
+    unittest.main()
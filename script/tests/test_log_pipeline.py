@@ -0,0 +1,123 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import gzip
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import log_pipeline
+from log_pipeline import ClientLog, LogPipeline, parse_log_name
+
+
+class FakeDate(date):
+    """Fecha con un 'hoy' controlable desde las pruebas."""
+    current = date(2026, 3, 1)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+def wait_for_compression():
+    for thread in threading.enumerate():
+        if thread.name == 'log-compress':
+            thread.join(5)
+
+
+class LogPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        FakeDate.current = date(2026, 3, 1)
+        # Reloj a mediodía del día simulado: la rotación por día solo ocurre cuando la prueba lo fuerza
+        noon = time.mktime((2026, 3, 1, 12, 0, 0, 0, 0, -1))
+        for patcher in (mock.patch.object(log_pipeline, 'date', FakeDate),
+                        mock.patch.object(log_pipeline.time, 'time', return_value=noon)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def read(self, filename):
+        path = os.path.join(self.directory, filename)
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            return f.read()
+
+    def test_size_rotation_numbers_and_compresses_segments(self):
+        pipeline = LogPipeline(self.directory, max_bytes=10)
+        log = ClientLog(pipeline, 'a')
+        for chunk in (b'123456', b'789012', b'abcdef', b'ghijkl'):
+            log.write(chunk)
+        log.write(b'tail')
+        log.close()
+        wait_for_compression()
+        self.assertEqual(self.files(), [
+            'mqtt_client_a_20260301.1.log.gz', 'mqtt_client_a_20260301.2.log.gz', 'mqtt_client_a_20260301.log'
+        ])
+        self.assertEqual(self.read('mqtt_client_a_20260301.1.log.gz'), b'123456789012')
+        self.assertEqual(self.read('mqtt_client_a_20260301.2.log.gz'), b'abcdefghijkl')
+        self.assertEqual(self.read('mqtt_client_a_20260301.log'), b'tail')
+        # El índice sigue los renombrados y la compresión
+        self.assertEqual([os.path.basename(s.path) for s in pipeline.index['a']], self.files())
+        self.assertEqual(pipeline.current('a'), os.path.join(self.directory, 'mqtt_client_a_20260301.log'))
+
+    def test_day_rotation(self):
+        pipeline = LogPipeline(self.directory, max_bytes=1000)
+        log = ClientLog(pipeline, 'a')
+        log.write(b'day one\n')
+        FakeDate.current = date(2026, 3, 2)
+        with mock.patch.object(log_pipeline.time, 'time', return_value=log.rotate_at):
+            log.write(b'day two\n')
+        log.close()
+        wait_for_compression()
+        self.assertEqual(self.files(), ['mqtt_client_a_20260301.log.gz', 'mqtt_client_a_20260302.log'])
+        self.assertEqual(self.read('mqtt_client_a_20260301.log.gz'), b'day one\n')
+        self.assertEqual(self.read('mqtt_client_a_20260302.log'), b'day two\n')
+
+    def test_roll_over_without_output(self):
+        pipeline = LogPipeline(self.directory, max_bytes=1000, compress=False)
+        log = ClientLog(pipeline, 'a')
+        log.write(b'x')
+        FakeDate.current = date(2026, 3, 2)
+        with mock.patch.object(log_pipeline.time, 'time', return_value=log.rotate_at):
+            log.roll_over()
+        log.close()
+        self.assertEqual(self.files(), ['mqtt_client_a_20260301.log', 'mqtt_client_a_20260302.log'])
+
+    def test_scan_compresses_previous_days_and_cleanup(self):
+        for filename in ('mqtt_client_a_20260227.log', 'mqtt_client_a_20260228.1.log.gz',
+                         'mqtt_client_a_20260228.log.gz', 'mqtt_client_a_20260301.log', 'other.txt'):
+            with open(os.path.join(self.directory, filename), 'wb') as f:
+                f.write(b'x')
+        pipeline = LogPipeline(self.directory, max_bytes=1000)
+        wait_for_compression()
+        # Solo se comprime el segmento sin comprimir de un día anterior
+        self.assertEqual([os.path.basename(s.path) for s in pipeline.index['a']], [
+            'mqtt_client_a_20260227.log.gz', 'mqtt_client_a_20260228.1.log.gz',
+            'mqtt_client_a_20260228.log.gz', 'mqtt_client_a_20260301.log'
+        ])
+        pipeline.cleanup(date(2026, 3, 1))
+        self.assertEqual(self.files(), ['mqtt_client_a_20260301.log', 'other.txt'])
+
+
+class ParseLogNameTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_log_name('mqtt_client_1_2_20260301.log'), ('1_2', date(2026, 3, 1), 0))
+        self.assertEqual(parse_log_name('mqtt_client_a_20260301.3.log.gz'), ('a', date(2026, 3, 1), 3))
+        for filename in ('other.log', 'mqtt_client_a_2026.log', 'mqtt_client_a_20260301.txt', 'mqtt_client_20260301.log'):
+            with self.subTest(filename=filename):
+                self.assertIsNone(parse_log_name(filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import metrics
+from metrics import Counter, LatencyHistogram, Metrics
+
+
+class BucketTest(unittest.TestCase):
+    def test_every_value_falls_inside_its_bucket(self):
+        values = list(range(0, 5000)) + [2 ** bits + delta for bits in range(12, 32) for delta in (-1, 0, 1)]
+        for value in values:
+            index = metrics._bucket_index(value)
+            lower = metrics._bucket_upper_bound(index - 1) if index else 0
+            upper = metrics._bucket_upper_bound(index)
+            self.assertLessEqual(lower, value, value)
+            self.assertLess(value, upper, value)
+            # Precisión relativa constante: el intervalo mide menos de 1/8 de su límite inferior
+            if value >= 2 * metrics.SUB_BUCKETS:
+                self.assertLessEqual(upper - lower, lower / metrics.SUB_BUCKETS)
+
+    def test_bucket_indexes_are_contiguous(self):
+        previous = 0
+        for value in range(1, 100000):
+            index = metrics._bucket_index(value)
+            self.assertIn(index - previous, (0, 1))
+            previous = index
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for millis in range(1, 1001):
+            histogram.record(millis / 1000)
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.sum, 500.5)
+        for percent, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+            with self.subTest(percent=percent):
+                value = histogram.percentile(percent)
+                self.assertGreaterEqual(value, expected)
+                self.assertLessEqual(value, expected * 1.125)
+        self.assertEqual(histogram.percentile(100), 1.0)  # Acotado por el máximo registrado
+
+    def test_empty_and_out_of_range_values(self):
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(99), 0.0)
+        histogram.record(-1)
+        histogram.record(10 ** 6)  # Mayor que el último intervalo: se acota
+        self.assertEqual(histogram.count, 2)
+        self.assertEqual(sum(histogram.counts), 2)
+
+    def test_cumulative_buckets(self):
+        histogram = LatencyHistogram()
+        for seconds in (0.00001, 0.001, 0.001, 0.5, 100):
+            histogram.record(seconds)
+        buckets, total = histogram.cumulative()
+        self.assertEqual(total, 5)
+        counts = [count for _, count in buckets]
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(dict(buckets)[16 / 1_000_000], 1)
+        self.assertEqual(counts[-1], 4)  # 100 s supera el último límite exportado (~67 s)
+
+
+class CounterTest(unittest.TestCase):
+    def test_series_are_bounded(self):
+        counter = Counter('test_total', 'Prueba', max_series=2)
+        counter.inc(server='1')
+        counter.inc(server='2')
+        counter.inc(3, server='3')
+        counter.inc(server='1')
+        self.assertEqual(dict(counter.samples()), {
+            (('server', '1'),): 2, (('server', '2'),): 1, (('server', 'other'),): 3
+        })
+
+
+class MetricsTest(unittest.TestCase):
+    def test_prometheus_rendering(self):
+        registry = Metrics()
+        registry.observe('parse', 0.002)
+        registry.received.inc(server=1, shape='/{apikey}/{serial}/attrs')
+        registry.gauge('test_queue', 'Cola', lambda: {(('server', 1),): 7})
+        text = registry.render_prometheus()
+        self.assertIn('mqtt_client_stage_latency_seconds_count{stage="parse"} 1', text)
+        self.assertIn('mqtt_client_stage_latency_seconds_bucket{stage="parse",le="+Inf"} 1', text)
+        self.assertIn('mqtt_client_messages_received_total{server="1",shape="/{apikey}/{serial}/attrs"} 1', text)
+        self.assertIn('test_queue{server="1"} 7', text)
+
+    def test_failing_gauge_is_skipped(self):
+        registry = Metrics()
+        registry.gauge('test_broken', 'Roto', lambda: 1 / 0)
+        self.assertEqual(registry.gauge_values('test_broken'), [])
+        self.assertEqual(registry.snapshot()['gauges']['test_broken'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import subprocess
+import tempfile
+import unittest
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPT_DIR)
+
+ENCRYPTION_KEY = '00' * 32
+
+
+def run_client(**env):
+    """Ejecuta el cliente con una API inaccesible y devuelve (código de salida, salida)."""
+    env = dict(os.environ, API_URL='http://127.0.0.1:9', ENCRYPTION_KEY=ENCRYPTION_KEY, LOG_FORMAT='text', **env)
+    result = subprocess.run(
+        [sys.executable, os.path.join(SCRIPT_DIR, 'mqtt_client.py'), '1', 'token'],
+        env=env, capture_output=True, text=True, timeout=30
+    )
+    return result.returncode, result.stdout + result.stderr
+
+
+class ConfigurationTest(unittest.TestCase):
+    def test_manual_ack_with_aggregation_is_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            code, output = run_client(MANUAL_ACK='true', AGGREGATE='true', MQTT_QOS='1', SPOOL_DIR=directory)
+        self.assertEqual(code, 1)
+        self.assertIn("MANUAL_ACK y AGGREGATE no se pueden activar a la vez", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
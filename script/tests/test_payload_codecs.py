@@ -0,0 +1,108 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import payload_codecs
+from payload_codecs import CodecSelector, DecodedJSON, get_codec, parse_codec_rules
+
+
+def content(raw):
+    return json.loads(bytes(raw.data))
+
+
+class ParseCodecRulesTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_codec_rules(' /+/+/attrs/cbor=cbor , /+/+/pb/#=protobuf:sensores.Lectura,'),
+            [('/+/+/attrs/cbor', 'cbor'), ('/+/+/pb/#', 'protobuf:sensores.Lectura')]
+        )
+        self.assertEqual(parse_codec_rules(''), [])
+        for spec in ('cbor', '=cbor', '/+/+/attrs='):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    parse_codec_rules(spec)
+
+
+class CodecSelectorTest(unittest.TestCase):
+    def setUp(self):
+        # Códecs de prueba sin dependencias opcionales; la caché de códecs se aísla por prueba
+        codecs = {'upper': lambda options, descriptors: lambda payload: DecodedJSON({'value': payload.decode().upper()})}
+        for patcher in (mock.patch.dict(payload_codecs.CODECS, codecs), mock.patch.dict(payload_codecs._codecs, clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_first_matching_rule_wins(self):
+        selector = CodecSelector('json', parse_codec_rules('/+/+/raw=upper,/+/+/#=json'))
+        self.assertEqual(selector.for_topic('/key/ABC/raw').name, 'upper')
+        self.assertEqual(selector.for_topic('/key/ABC/attrs').name, 'json')
+        self.assertEqual(selector.for_topic('other').name, 'json')  # Sin regla: el del servidor
+        self.assertEqual(content(selector.for_topic('/key/ABC/raw').decode(b'abc')), {'value': 'ABC'})
+
+    def test_resolved_codecs_are_cached_per_topic(self):
+        selector = CodecSelector('upper', [('/+/+/attrs', 'json')])
+        with mock.patch.object(payload_codecs.mqtt, 'topic_matches_sub', wraps=payload_codecs.mqtt.topic_matches_sub) as matches:
+            selector.for_topic('/key/ABC/attrs')
+            selector.for_topic('/key/ABC/attrs')
+        self.assertEqual(matches.call_count, 1)
+
+    def test_json_keeps_original_bytes(self):
+        payload = b'{"t": 20.5}'
+        decoded = get_codec('json').decode(payload)
+        self.assertEqual(bytes(decoded.data), payload)
+        for invalid in (b'[1]', b'{', b'\xff'):
+            with self.subTest(payload=invalid):
+                with self.assertRaises(ValueError):
+                    get_codec('json').decode(invalid)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            CodecSelector('json', [('/+/+/x', 'xml')])
+
+    def test_missing_optional_package(self):
+        with mock.patch.object(payload_codecs, 'cbor2', None):
+            with self.assertRaisesRegex(ValueError, 'cbor2'):
+                get_codec('cbor')
+
+    def test_protobuf_needs_type_and_descriptors(self):
+        if payload_codecs.descriptor_pool is None:
+            self.skipTest('protobuf no instalado')
+        for spec, descriptors in (('protobuf', '/tmp/set.pb'), ('protobuf:sensores.Lectura', None)):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    get_codec(spec, descriptors)
+
+
+class BinaryCodecsTest(unittest.TestCase):
+    @unittest.skipIf(payload_codecs.cbor2 is None, 'cbor2 no instalado')
+    def test_cbor(self):
+        codec = get_codec('cbor')
+        decoded = codec.decode(payload_codecs.cbor2.dumps({'t': 20.5, 'on': True}))
+        self.assertIsInstance(decoded, DecodedJSON)
+        self.assertEqual(decoded.value(), {'t': 20.5, 'on': True})
+        self.assertEqual(content(decoded), {'t': 20.5, 'on': True})
+        for invalid in (payload_codecs.cbor2.dumps([1, 2]), b'\xff\xff'):
+            with self.subTest(payload=invalid):
+                with self.assertRaises(ValueError):
+                    codec.decode(invalid)
+
+    @unittest.skipIf(payload_codecs.msgpack is None, 'msgpack no instalado')
+    def test_msgpack(self):
+        codec = get_codec('msgpack')
+        self.assertEqual(codec.decode(payload_codecs.msgpack.packb({'t': 1})).value(), {'t': 1})
+        with self.assertRaises(ValueError):
+            codec.decode(payload_codecs.msgpack.packb('text'))
+
+    @unittest.skipIf(payload_codecs.cbor2 is None, 'cbor2 no instalado')
+    def test_values_without_json_representation(self):
+        with self.assertRaises(ValueError):
+            get_codec('cbor').decode(payload_codecs.cbor2.dumps({'raw': b'\x00\x01'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import time
+import tempfile
+import functools
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import spool
+from spool import Spool, SpoolAdopter, SpoolLocked
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@unittest.skipIf(spool.fcntl is None, "el bloqueo de directorios requiere fcntl")
+class SpoolAdoptionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sent = []
+        self.open_spool = functools.partial(
+            Spool, send=self.send, batch_size=10, segment_size=4096, max_bytes=65536, fsync='never', fsync_interval=0.01
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def send(self, items):
+        self.sent.extend(items)
+        return True
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def orphan(self, name, count):
+        """Deja un spool con mensajes pendientes, como el de una réplica retirada."""
+        orphan = self.open_spool(self.path(name), send=lambda items: False)
+        orphan.append([{'i': i} for i in range(count)])
+        orphan.stop()
+
+    def test_directory_is_locked_while_open(self):
+        own = self.open_spool(self.path('7'))
+        with self.assertRaises(SpoolLocked):
+            self.open_spool(self.path('7'))
+        own.stop()
+        self.open_spool(self.path('7')).stop()
+
+    def test_adopter_drains_and_removes_orphaned_spools(self):
+        self.orphan('7-2', 5)
+        self.orphan('7-3.1', 3)
+        self.orphan('70-1', 4)  # Otro servidor
+        own = self.open_spool(self.path('7'))
+        adopter = SpoolAdopter(self.directory.name, 7, self.open_spool)
+        adopter.scan()
+        self.assertEqual(sorted(os.path.basename(d) for d in adopter.adopted), ['7-2', '7-3.1'])
+        self.assertTrue(wait_until(lambda: len(self.sent) == 8))
+        adopter.scan()
+        adopter.stop()
+        own.stop()
+        self.assertEqual(adopter.adopted, {})
+        self.assertFalse(os.path.exists(self.path('7-2')))
+        self.assertFalse(os.path.exists(self.path('7-3.1')))
+        self.assertTrue(os.path.exists(self.path('7')))
+        self.assertTrue(os.path.exists(self.path('70-1')))
+
+
+class SpoolLimitsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_single_segment_is_refused(self):
+        with self.assertRaises(ValueError):
+            Spool(self.directory.name, lambda items: True, batch_size=10, segment_size=4096, max_bytes=8191)
+
+    def test_keeps_accepting_after_first_segment_is_replayed(self):
+        sent = []
+        spooled = Spool(self.directory.name, lambda items: sent.extend(items) or True, batch_size=10,
+                        segment_size=4096, max_bytes=8192, fsync='never', fsync_interval=0.01)
+        spooled.start()
+        try:
+            for i in range(200):
+                self.assertEqual(spooled.append([{'i': i, 'padding': 'x' * 100}]), 0)
+                self.assertTrue(wait_until(lambda: not spooled.has_pending()))
+        finally:
+            spooled.stop()
+        self.assertEqual(len(sent), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones locales
+import mqtt_manager
+from mqtt_manager import MQTTManager
+
+
+def manager(**settings):
+    """Gestor con solo el estado de supervisión (sin token, logs ni tablero de telemetría)."""
+    instance = MQTTManager.__new__(MQTTManager)
+    instance.lock = threading.RLock()
+    instance.failures = {}
+    instance.crashes = {}
+    instance.restarting = set()
+    instance.crash_looping = set()
+    instance.processes = {}
+    instance.replicas = {}
+    instance.handles = {}
+    instance.paused_servers = set()
+    instance.catalog = {'1': {'id': 1}, '2': {'id': 2}}
+    instance.backoff_base = settings.get('backoff_base', 1)
+    instance.backoff_max = settings.get('backoff_max', 8)
+    instance.crash_loop_limit = settings.get('crash_loop_limit', 100)
+    instance.crash_loop_window = settings.get('crash_loop_window', 60)
+    instance.crash_loop_hold = settings.get('crash_loop_hold', 300)
+    return instance
+
+
+class ScheduleRestartTest(unittest.TestCase):
+    def crash(self, instance, server_ids=('1',), runtime=0, replica=None):
+        """Programa el reinicio de una caída y devuelve la espera del temporizador."""
+        with mock.patch.object(mqtt_manager.threading, 'Timer') as timer, mock.patch('builtins.print'):
+            instance._schedule_restart(list(server_ids), replica, runtime)
+        delay, target = timer.call_args.args[:2]
+        self.assertEqual(target, instance._revive)
+        self.assertTrue(timer.return_value.start.called)
+        return delay
+
+    def test_exponential_backoff_is_capped(self):
+        instance = manager()
+        self.assertEqual([self.crash(instance) for _ in range(6)], [1, 2, 4, 8, 8, 8])
+        self.assertIn('1', instance.restarting)
+
+    def test_stable_runtime_resets_the_backoff(self):
+        instance = manager()
+        self.crash(instance)
+        self.crash(instance)
+        self.assertEqual(self.crash(instance, runtime=mqtt_manager.STABLE_RUNTIME), 1)
+
+    def test_shared_process_uses_the_worst_server(self):
+        instance = manager()
+        self.crash(instance, ['1'])
+        self.crash(instance, ['1'])
+        self.assertEqual(self.crash(instance, ['1', '2']), 4)
+
+    def test_crash_loop_holds_the_server(self):
+        instance = manager(crash_loop_limit=3, crash_loop_window=60, crash_loop_hold=300)
+        with mock.patch.object(mqtt_manager.time, 'monotonic', side_effect=[0, 10, 20]):
+            delays = [self.crash(instance) for _ in range(3)]
+        self.assertEqual(delays, [1, 2, 300])
+        self.assertIn('1', instance.crash_looping)
+
+    def test_crashes_outside_the_window_do_not_count(self):
+        instance = manager(crash_loop_limit=3, crash_loop_window=60)
+        with mock.patch.object(mqtt_manager.time, 'monotonic', side_effect=[0, 100, 200]):
+            self.crash(instance)
+            self.crash(instance)
+            self.crash(instance)
+        self.assertNotIn('1', instance.crash_looping)
+        self.assertEqual(len(instance.crashes['1']), 1)
+
+
+class ReviveTest(unittest.TestCase):
+    def test_revives_only_servers_still_needed(self):
+        instance = manager()
+        instance.restarting = {'1', '2', '3'}
+        instance.crash_looping = {'1'}
+        instance.paused_servers = {'2'}
+        with mock.patch.object(instance, '_spawn', return_value='ready') as spawn:
+            instance._revive(['1', '2', '3'], None)  # 2 pausado, 3 fuera del catálogo
+        spawn.assert_called_once_with(['1'], verbose=False, replica=None)
+        self.assertEqual(instance.restarting, set())
+        self.assertEqual(instance.crash_looping, set())
+
+    def test_failed_spawn_is_rescheduled(self):
+        instance = manager()
+        with mock.patch.object(instance, '_spawn', return_value='failed'), \
+                mock.patch.object(instance, '_schedule_restart') as schedule:
+            instance._revive(['1'], 2)
+        schedule.assert_called_once_with(['1'], 2, 0)
+
+    def test_replica_index_already_reused_is_not_revived(self):
+        instance = manager()
+        instance.processes = {'1': [100]}
+        instance.replicas = {100: 2}
+        with mock.patch.object(instance, '_spawn') as spawn:
+            instance._revive(['1'], 2)
+        spawn.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
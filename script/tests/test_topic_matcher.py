@@ -0,0 +1,85 @@
+# Importaciones de la biblioteca estándar
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importaciones de terceros
+import paho.mqtt.client as mqtt
+
+# Importaciones locales
+from mqtt_client import TopicMatcher
+
+
+class TopicMatcherTest(unittest.TestCase):
+    def assertAgreesWithFilters(self, matcher, topic):
+        """El formato coincide con los mismos topics que sus filtros de suscripción, salvo si serial o apikey están vacíos."""
+        by_filter = any(mqtt.topic_matches_sub(topic_filter, topic) for topic_filter in matcher.filters)
+        if matcher.match(topic) is not None:
+            self.assertTrue(by_filter, f"{topic} coincide con el formato pero no con {matcher.filters}")
+        elif by_filter:
+            lenient = TopicMatcher(matcher.format_str)
+            lenient.required = []
+            self.assertIsNotNone(lenient.match(topic), f"{topic} coincide con {matcher.filters} pero no con el formato")
+
+    def test_fields_and_literals(self):
+        matcher = TopicMatcher('/{apikey}/{serial}/attrs')
+        self.assertEqual(matcher.filters, ['/+/+/attrs', '+/+/attrs'])
+        self.assertEqual(matcher.match('/key/ABC/attrs'), {'apikey': 'key', 'serial': 'ABC'})
+        self.assertEqual(matcher.match('key/ABC/attrs'), {'apikey': 'key', 'serial': 'ABC'})
+        self.assertIsNone(matcher.match('/key/ABC/cmd'))
+        self.assertIsNone(matcher.match('/key/ABC/attrs/extra'))
+        self.assertIsNone(matcher.match('/key/ABC'))
+
+    def test_single_level_wildcard(self):
+        matcher = TopicMatcher('/{apikey}/+/{serial}')
+        self.assertEqual(matcher.filters, ['/+/+/+', '+/+/+'])
+        self.assertEqual(matcher.match('/key/anything/ABC'), {'apikey': 'key', 'serial': 'ABC'})
+        self.assertEqual(matcher.match('/key//ABC'), {'apikey': 'key', 'serial': 'ABC'})  # + acepta un nivel vacío
+        self.assertIsNone(matcher.match('/key/a/b/ABC'))
+
+    def test_multi_level_wildcard_matches_parent(self):
+        matcher = TopicMatcher('/{apikey}/{serial}/#')
+        self.assertEqual(matcher.filters, ['/+/+/#', '+/+/#'])
+        self.assertEqual(matcher.match('/key/ABC'), {'apikey': 'key', 'serial': 'ABC'})
+        self.assertEqual(matcher.match('/key/ABC/'), {'apikey': 'key', 'serial': 'ABC'})
+        self.assertEqual(matcher.match('/key/ABC/a/b/c'), {'apikey': 'key', 'serial': 'ABC'})
+        self.assertIsNone(matcher.match('/key'))
+
+    def test_empty_levels(self):
+        matcher = TopicMatcher('/{apikey}/{serial}/{type}')
+        # Barra final: último nivel vacío, que el broker entrega con el filtro /+/+/+
+        self.assertEqual(matcher.match('/key/ABC/'), {'apikey': 'key', 'serial': 'ABC', 'type': ''})
+        # serial y apikey no pueden estar vacíos
+        self.assertIsNone(matcher.match('/key//attrs'))
+        self.assertIsNone(matcher.match('//ABC/attrs'))
+        # Sin comodín final, una barra final es un nivel más
+        self.assertIsNone(TopicMatcher('/{apikey}/{serial}/attrs').match('/key/ABC/attrs/'))
+
+    def test_format_without_leading_slash(self):
+        matcher = TopicMatcher('devices/{apikey}/{serial}')
+        self.assertEqual(matcher.filters, ['devices/+/+'])
+        self.assertEqual(matcher.match('devices/key/ABC'), {'apikey': 'key', 'serial': 'ABC'})
+        self.assertIsNone(matcher.match('/devices/key/ABC'))
+
+    def test_invalid_formats(self):
+        for format_str in ('/{apikey}/#/{serial}', '/{apikey}/{serial}/a+b', '/{serial}/attrs'):
+            with self.subTest(format_str=format_str):
+                with self.assertRaises(ValueError):
+                    TopicMatcher(format_str)
+
+    def test_agrees_with_subscription_filters(self):
+        topics = ['/key/ABC/attrs', 'key/ABC/attrs', '/key/ABC/attrs/', '/key/ABC', '/key/ABC/', '//ABC/attrs',
+                  '/key//attrs', 'key/ABC', '/key/ABC/a/b', 'devices/key/ABC', '/devices/key/ABC', '/', '']
+        formats = ['/{apikey}/{serial}/attrs', '/{apikey}/{serial}/#', '/{apikey}/{serial}/{type}',
+                   '/{apikey}/+/{serial}', 'devices/{apikey}/{serial}', '{apikey}/{serial}/#']
+        for format_str in formats:
+            matcher = TopicMatcher(format_str)
+            for topic in topics:
+                with self.subTest(format_str=format_str, topic=topic):
+                    self.assertAgreesWithFilters(matcher, topic)
+
+
+if __name__ == '__main__':
+    unittest.main()